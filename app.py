@@ -1,18 +1,52 @@
 # app.py — Single-user SRN Envelope Wallet (no login / no register / no email)
 # Opens directly to Home and always uses one local user in the DB.
 
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from datetime import date
+from flask import (
+    Flask, Response, abort, g, jsonify, make_response, render_template, request, redirect, url_for, flash,
+    session, stream_with_context,
+)
+from datetime import date, datetime, time as dt_time, timezone
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup
+from pathlib import Path
 from functools import wraps
+from contextlib import nullcontext
 import os
 import io
-import base64
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt  # noqa: E402
-
-from db import get_conn, init_db, seed_defaults_for_user
+import hashlib
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+import click
+
+import archive
+import assets
+import backup
+import category_purge
+import css_build
+import db
+import group_commit
+import metrics
+from chart_cache import chart_cache, fragment_cache
+from report_aggregates import PERIOD_BUCKETS, aggregate_reports
+import ledger_io
+from money import CURRENCIES, format_amount, parse_amount, to_major
+from db import (
+    get_conn,
+    init_db,
+    seed_defaults_for_user,
+    record_transaction,
+    record_transactions,
+    bump_ledger_version,
+    ledger_version,
+    backfill_daily_totals,
+    rebuild_balances,
+    balance_drift,
+)
 
 
 app = Flask(__name__)
@@ -25,13 +59,64 @@ app.config.update(
 # (recommended) SECRET_KEY="some-long-random-string"
 app.secret_key = os.environ.get("SECRET_KEY", os.urandom(32))
 
-init_db()
+# Registered first so request timing covers every other hook.
+metrics.init_app(app)
+metrics.register(metrics.Gauge(
+    "srn_chart_cache_hits_total", "Chart cache hits.", lambda: chart_cache.hits, kind="counter"))
+metrics.register(metrics.Gauge(
+    "srn_chart_cache_misses_total", "Chart cache misses.", lambda: chart_cache.misses, kind="counter"))
+metrics.register(metrics.Gauge(
+    "srn_chart_cache_entries", "Charts currently cached.", lambda: len(chart_cache)))
+metrics.register(metrics.Gauge(
+    "srn_chart_cache_bytes", "Bytes of PNG currently cached.", lambda: chart_cache.size_bytes))
+metrics.register(metrics.Gauge(
+    "srn_fragment_cache_hits_total", "HTML fragment cache hits.", lambda: fragment_cache.hits, kind="counter"))
+metrics.register(metrics.Gauge(
+    "srn_fragment_cache_misses_total", "HTML fragment cache misses.", lambda: fragment_cache.misses,
+    kind="counter"))
+metrics.register(metrics.Gauge(
+    "srn_fragment_cache_entries", "HTML fragments currently cached.", lambda: len(fragment_cache)))
+
+# Amounts are integer minor units everywhere; templates format them with {{ cents|money(cur) }}.
+app.add_template_filter(format_amount, "money")
+app.add_template_global(assets.asset_url, "asset_url")
+
+# Compiled templates are kept on disk (keyed by a checksum of their source) and
+# shared by every worker and restart. Default: a per-OS-user temp directory; "off" disables.
+JINJA_CACHE_DIR = os.environ.get("SRN_JINJA_CACHE_DIR", "")
+if JINJA_CACHE_DIR != "off":
+    if JINJA_CACHE_DIR:
+        os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR or None)
+
+
+def create_app():
+    """
+    Returns the app with its once-per-deployment work done up front: the database
+    is created or migrated and every template compiled. Under
+    `gunicorn --preload "app:create_app()"` that happens once in the master and the
+    workers fork with it done, with no connection left open to cross the fork.
+    Importing app alone does neither; the database is then migrated on first use.
+    """
+    init_db()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    db.close_pooled_conns()
+    return app
+
 
-CURRENCIES = ["USD", "EUR", "TRY", "LBP"]
+# "client" draws report donuts in the browser; "server" embeds matplotlib PNGs.
+REPORTS_RENDER = os.environ.get("SRN_REPORTS_RENDER", "client")
 
 # Single-user identity (only used to find/create your one user row)
 SINGLE_USER_EMAIL = os.environ.get("SINGLE_USER_EMAIL", "sirine@local")
 
+# Multi-user hosting: SRN_MULTI_USER=1 takes each request's user from a header set by
+# an authenticating reverse proxy (e.g. oauth2-proxy's X-Forwarded-Email). Combine with
+# SRN_SHARD_DIR so each user's ledger gets its own SQLite file and write lock.
+MULTI_USER = os.environ.get("SRN_MULTI_USER", "0") == "1"
+USER_HEADER = os.environ.get("SRN_USER_HEADER", "X-Forwarded-Email")
+
 
 def current_user_id():
     return session.get("user_id")
@@ -48,6 +133,77 @@ def login_required(view):
     return wrapped
 
 
+def _build_fingerprint():
+    """
+    Hash and newest mtime of the code, templates and the static files pages link to,
+    identical in every worker: a deploy changes every page ETag even when no ledger changed.
+    """
+    root = Path(__file__).parent
+    digest = hashlib.sha1()
+    newest = 0.0
+    for path in sorted([
+        *root.glob("*.py"), *root.joinpath("templates").glob("*.html"),
+        *root.joinpath("static").glob("*.js"), assets.MANIFEST_PATH,
+    ]):
+        if not path.exists():
+            continue
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+        newest = max(newest, path.stat().st_mtime)
+    return digest.hexdigest()[:12], int(newest)
+
+
+BUILD_ID, BUILD_MTIME = _build_fingerprint()
+
+
+def ledger_conditional(view):
+    """
+    Conditional GET keyed by the user's ledger version: a repeat visit with a
+    matching If-None-Match (or If-Modified-Since) costs one primary-key lookup
+    and gets a 304. Otherwise the view runs and its response is stamped with
+    ETag/Last-Modified. The version is left in g.ledger_version for fragment caching.
+    """
+    @wraps(view)
+    def wrapped(*args, **kwargs):
+        uid = current_user_id()
+        with get_conn() as conn:
+            version, updated_at = ledger_version(conn, uid)
+        g.ledger_version = version
+
+        if session.get("_flashes"):
+            # A pending flash message makes this render one-off: never 304 it,
+            # and keep it out of every cache (the service worker included).
+            resp = make_response(view(*args, **kwargs))
+            resp.headers["Cache-Control"] = "no-store"
+            return resp
+
+        today = date.today()
+        raw = f"{BUILD_ID}:{db.DB_PATH}:{uid}:{version}:{today}:{REPORTS_RENDER}:{request.full_path}"
+        etag = hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
+        last_modified = datetime.fromtimestamp(
+            max(updated_at or 0, BUILD_MTIME, int(datetime.combine(today, dt_time.min).timestamp())),
+            timezone.utc,
+        )
+
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            not_modified = since is not None and last_modified <= since
+
+        if not_modified:
+            resp = Response(status=304)
+        else:
+            resp = make_response(view(*args, **kwargs))
+            if resp.status_code != 200:
+                return resp
+        resp.set_etag(etag)
+        resp.last_modified = last_modified
+        resp.headers["Cache-Control"] = "private, no-cache"
+        return resp
+    return wrapped
+
+
 def _users_table_columns(conn):
     # Works with SQLite
     rows = conn.execute("PRAGMA table_info(users)").fetchall()
@@ -62,108 +218,253 @@ def _users_table_columns(conn):
     return set([c for c in cols if c])
 
 
+# Introspected on the first insert, once per process; the users table layout does
+# not change at runtime. Not at import: that would open the database in a
+# preloading master and hand the connection to every forked worker.
+_users_columns = None
+
+# Process-level cache of resolved user ids, keyed by database path and email so
+# scratch databases (check-query-plans, benchmarks) never share an id.
+_user_ids = {}
+_user_ids_lock = threading.Lock()
+
+# Endpoints that must never touch SQLite (static files, service worker, health checks).
+BOOTSTRAP_EXEMPT_ENDPOINTS = {"static", "service_worker", "healthz", "readyz", "prometheus_metrics"}
+
+
 def ensure_single_user():
     """
     Ensures there is exactly one local user and returns its user_id.
     Creates user row if missing and seeds default categories for that user.
     This function is schema-tolerant: it adapts to your users table columns.
+    The id is cached per process, so only the first call touches the database.
     """
-    with get_conn() as conn:
-        u = conn.execute("SELECT id FROM users WHERE email=?", (SINGLE_USER_EMAIL,)).fetchone()
+    return ensure_user(SINGLE_USER_EMAIL)
+
+
+def ensure_user(email: str):
+    """Returns the user_id for email, creating the user (and their shard) on first sight."""
+    key = (str(db.DB_PATH), email)
+    user_id = _user_ids.get(key)
+    if user_id is not None:
+        return user_id
+
+    with _user_ids_lock:
+        user_id = _user_ids.get(key)
+        if user_id is None:
+            user_id = _user_ids[key] = _resolve_user(email)
+    return user_id
+
+
+def _resolve_user(email: str):
+    with db.directory_conn() as conn:
+        u = conn.execute("SELECT id FROM users WHERE email=?", (email,)).fetchone()
         if u:
-            return int(u["id"]) if isinstance(u, dict) or hasattr(u, "__getitem__") else int(u[0])
+            user_id = int(u["id"]) if isinstance(u, dict) or hasattr(u, "__getitem__") else int(u[0])
+        else:
+            user_id = _insert_user(conn, email)
+            if db.SHARD_DIR is None:
+                # Seed defaults (categories) for this user, in the same transaction
+                seed_defaults_for_user(user_id, conn)
+
+    if db.SHARD_DIR is not None:
+        # The ledger lives in the user's own file; the directory only maps email -> id.
+        db.init_shard(user_id, email)
+    return int(user_id)
 
-        cols = _users_table_columns(conn)
 
-        # Build a safe INSERT that matches your actual schema
-        insert_cols = []
-        insert_vals = []
+def _insert_user(conn, email: str):
+    global _users_columns
+    if _users_columns is None:
+        _users_columns = frozenset(_users_table_columns(conn))
+    cols = _users_columns
 
-        if "email" in cols:
-            insert_cols.append("email")
-            insert_vals.append(SINGLE_USER_EMAIL)
+    # Build a safe INSERT that matches your actual schema
+    insert_cols = []
+    insert_vals = []
 
-        # Optional columns often present in your earlier code
-        if "is_verified" in cols:
-            insert_cols.append("is_verified")
-            insert_vals.append(1)
+    if "email" in cols:
+        insert_cols.append("email")
+        insert_vals.append(email)
 
-        if "password_hash" in cols:
-            insert_cols.append("password_hash")
-            insert_vals.append("")  # not used in single-user mode
+    # Optional columns often present in your earlier code
+    if "is_verified" in cols:
+        insert_cols.append("is_verified")
+        insert_vals.append(1)
 
-        # If your schema has created_at, etc., rely on defaults; do not invent values.
+    if "password_hash" in cols:
+        insert_cols.append("password_hash")
+        insert_vals.append("")  # not used: identity comes from SINGLE_USER_EMAIL or the proxy header
 
-        if not insert_cols:
-            # Extremely unlikely, but prevents silent breakage
-            raise RuntimeError("Could not detect usable columns in users table (expected at least 'email').")
+    # If your schema has created_at, etc., rely on defaults; do not invent values.
 
-        sql = f"INSERT INTO users({', '.join(insert_cols)}) VALUES ({', '.join(['?'] * len(insert_cols))})"
-        cur = conn.execute(sql, tuple(insert_vals))
-        user_id = cur.lastrowid
+    if not insert_cols:
+        # Extremely unlikely, but prevents silent breakage
+        raise RuntimeError("Could not detect usable columns in users table (expected at least 'email').")
 
-    # Seed defaults (categories) for this user
-    seed_defaults_for_user(user_id)
-    return int(user_id)
+    sql = f"INSERT INTO users({', '.join(insert_cols)}) VALUES ({', '.join(['?'] * len(insert_cols))})"
+    return conn.execute(sql, tuple(insert_vals)).lastrowid
+
+
+@app.teardown_appcontext
+def release_db_conn(exc):
+    db.release_conn()
 
 
 @app.before_request
 def auto_login_single_user():
     # Always keep a user_id in session so app opens to home without auth.
-    if "user_id" not in session:
+    if request.endpoint in BOOTSTRAP_EXEMPT_ENDPOINTS:
+        return
+    if MULTI_USER:
+        # Authentication is done by the fronting proxy; trust its header only.
+        email = (request.headers.get(USER_HEADER) or "").strip().lower()
+        if not email:
+            abort(401)
+        user_id = ensure_user(email)
+        if session.get("user_id") != user_id:
+            session["user_id"] = user_id
+    elif "user_id" not in session:
         session["user_id"] = ensure_single_user()
+    db.use_user(session["user_id"])
+    category_purge.purger.resume(session["user_id"])
+    backup.scheduler.ensure_started()
 
 
-def category_balance(conn, category_id: int, user_id: int):
-    rows = conn.execute("""
-        SELECT currency,
-               SUM(CASE WHEN type='deposit' THEN amount ELSE -amount END) AS bal
-        FROM transactions
-        WHERE category_id=? AND user_id=?
-        GROUP BY currency
-    """, (category_id, user_id)).fetchall()
-
-    balances = {c: 0.0 for c in CURRENCIES}
-    for r in rows:
-        balances[r["currency"]] = float(r["bal"] or 0.0)
-    return balances
+# Hashed static files the service worker precaches; their URLs are injected into sw.js.
+SW_PRECACHE_ASSETS = ["css/app.css", "reports.js", "transactions.js"]
+SW_BUILD_PLACEHOLDER = 'const BUILD = { version: "dev", assets: [] };'
 
 
-def global_balances(conn, user_id: int):
-    rows = conn.execute("""
-        SELECT currency,
-               SUM(CASE WHEN type='deposit' THEN amount ELSE -amount END) AS bal
-        FROM transactions
+@app.get("/sw.js")
+def service_worker():
+    """
+    Serves static/sw.js from the site root so the worker's scope covers every page,
+    with the current hashed asset URLs filled in: a new build changes the worker's
+    bytes, so browsers install it and drop the caches holding the old assets.
+    """
+    urls = [assets.asset_url(name) for name in SW_PRECACHE_ASSETS]
+    build = {"version": assets.content_hash("\n".join(urls).encode("utf-8")), "assets": urls}
+    source = Path(app.static_folder, "sw.js").read_text(encoding="utf-8")
+    resp = Response(
+        source.replace(SW_BUILD_PLACEHOLDER, f"const BUILD = {json.dumps(build)};"),
+        mimetype="text/javascript",
+    )
+    resp.headers["Cache-Control"] = "no-cache"
+    resp.headers["Service-Worker-Allowed"] = "/"
+    resp.set_etag(assets.content_hash(resp.get_data()))
+    return resp.make_conditional(request)
+
+
+@app.after_request
+def cache_static_assets(resp):
+    """Hashed asset URLs never change content: let browsers keep them for a year."""
+    if request.endpoint == "static" and resp.status_code in (200, 304):
+        if assets.is_immutable(request.view_args["filename"], request.args.get("v")):
+            resp.headers["Cache-Control"] = f"public, max-age={assets.IMMUTABLE_MAX_AGE}, immutable"
+    return resp
+
+
+@app.get("/healthz")
+def healthz():
+    """Liveness check for load balancers; never touches SQLite."""
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    """Readiness: the database answers and the schema is at the expected version."""
+    try:
+        with get_conn() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+    except sqlite3.Error as e:
+        return {"status": "unavailable", "error": str(e)}, 503
+    return {"status": "ready", "schema_version": version}
+
+
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+def _empty_balances():
+    return {c: 0 for c in CURRENCIES}
+
+
+def balance_sheet(conn, user_id: int, category_id: int | None = None):
+    """
+    Reads per-category and global balances from the materialized balances
+    table (one row per envelope and currency, so cost is O(categories)).
+    Returns (by_category, totals) where by_category maps
+    category_id -> {currency: balance in minor units}.
+    Pass category_id to restrict the read to one envelope (totals then only
+    cover that envelope).
+    """
+    sql = """
+        SELECT category_id, currency, amount_cents AS bal
+        FROM balances
         WHERE user_id=?
-        GROUP BY currency
-    """, (user_id,)).fetchall()
+    """
+    params = [user_id]
+    if category_id is not None:
+        sql += " AND category_id=?"
+        params.append(category_id)
+
+    by_category = {}
+    totals = _empty_balances()
+    for r in conn.execute(sql, params).fetchall():
+        cur = r["currency"]
+        if cur not in totals:
+            continue
+        bal = r["bal"] or 0
+        by_category.setdefault(r["category_id"], _empty_balances())[cur] = bal
+        totals[cur] += bal
+    return by_category, totals
 
-    balances = {c: 0.0 for c in CURRENCIES}
-    for r in rows:
-        balances[r["currency"]] = float(r["bal"] or 0.0)
-    return balances
+
+def category_balance(conn, category_id: int, user_id: int):
+    by_category, _ = balance_sheet(conn, user_id, category_id)
+    return by_category.get(category_id) or _empty_balances()
+
+
+def global_balances(conn, user_id: int):
+    _, totals = balance_sheet(conn, user_id)
+    return totals
 
 
 @app.get("/")
+@ledger_conditional
 def home():
     uid = current_user_id()
     if not uid:
         uid = ensure_single_user()
         session["user_id"] = uid
 
+    key = fragment_cache.key("home", db.DB_PATH, uid)
+    ledger_html = fragment_cache.get(key, g.ledger_version)
+    if ledger_html is None:
+        ledger_html = _render_home_ledger(uid)
+        fragment_cache.put(key, g.ledger_version, ledger_html)
+
+    return render_template("home.html", ledger_html=Markup(ledger_html))
+
+
+def _render_home_ledger(uid: int):
     with get_conn() as conn:
         cats = conn.execute("""
             SELECT * FROM categories
-            WHERE user_id=?
+            WHERE user_id=? AND deleted_at IS NULL
             ORDER BY is_default DESC, name ASC
         """, (uid,)).fetchall()
 
+        by_category, totals = balance_sheet(conn, uid)
+
         cat_cards = []
         for c in cats:
-            bals = category_balance(conn, c["id"], uid)
+            bals = by_category.get(c["id"]) or _empty_balances()
 
             primary_currency = next(
-                (cur for cur in CURRENCIES if abs(bals[cur]) > 1e-9),
+                (cur for cur in CURRENCIES if bals[cur] != 0),
                 "USD"
             )
 
@@ -176,9 +477,7 @@ def home():
                 "is_default": c["is_default"],
             })
 
-        g = global_balances(conn, uid)
-
-    return render_template("home.html", global_balances=g, cat_cards=cat_cards)
+    return render_template("_home_ledger.html", global_balances=totals, cat_cards=cat_cards)
 
 
 @app.get("/category/<int:category_id>/deposit")
@@ -196,7 +495,7 @@ def tx_form(category_id: int, tx_type: str):
 
     with get_conn() as conn:
         cat = conn.execute(
-            "SELECT * FROM categories WHERE id=? AND user_id=?",
+            "SELECT * FROM categories WHERE id=? AND user_id=? AND deleted_at IS NULL",
             (category_id, uid)
         ).fetchone()
 
@@ -221,10 +520,72 @@ def tx_form(category_id: int, tx_type: str):
         tx_type=tx_type,
         currencies=available_currencies,
         today=date.today().isoformat(),
-        balances=balances
+        balances=balances,
+        idempotency_key=uuid.uuid4().hex
     )
 
 
+class TxValidationError(ValueError):
+    pass
+
+
+def validate_tx_fields(tx_type, currency, raw_amount, tx_date):
+    """
+    Validation rules for one ledger entry, shared by save_tx and the bulk importer.
+    Returns the amount in minor units or raises TxValidationError with a user-facing message.
+    """
+    if tx_type not in ("deposit", "withdraw"):
+        raise TxValidationError("Invalid transaction type.")
+
+    if currency not in CURRENCIES:
+        raise TxValidationError("Invalid currency.")
+
+    try:
+        amount = parse_amount(raw_amount or "", currency)
+    except ValueError as e:
+        if "decimal places" in str(e):
+            raise TxValidationError(f"Amount can have {e} for {currency}.")
+        if str(e).startswith("at most"):
+            raise TxValidationError(f"Amount can be {e} {currency}.")
+        raise TxValidationError("Amount must be a number.")
+
+    if amount <= 0:
+        raise TxValidationError("Amount must be greater than 0.")
+
+    try:
+        date.fromisoformat(tx_date)
+    except (TypeError, ValueError):
+        raise TxValidationError("Date must be YYYY-MM-DD.")
+
+    return amount
+
+
+IDEMPOTENCY_KEY_MAX = 64
+
+
+def _idempotency_key(raw):
+    """
+    The form's one-time key (minted by the page on submit; the uuid4 rendered into
+    the form is the fallback without JavaScript). Anything malformed is ignored.
+    """
+    key = (raw or "").strip()
+    if not key or len(key) > IDEMPOTENCY_KEY_MAX or not all(c.isascii() and (c.isalnum() or c == "-") for c in key):
+        return None
+    return key
+
+
+# Set by the service worker when it replays a save queued offline: the outcome then
+# comes back as a status code and message it can act on, not a redirect and a flash.
+REPLAY_HEADER = "X-SRN-Replay"
+
+
+def _save_outcome(message: str, category: str, location: str, status: int):
+    if request.headers.get(REPLAY_HEADER):
+        return {"message": message, "category": category}, status
+    flash(message, category)
+    return redirect(location)
+
+
 @app.post("/category/<int:category_id>/save")
 def save_tx(category_id):
     tx_type = request.form.get("tx_type")  # deposit / withdraw
@@ -233,62 +594,336 @@ def save_tx(category_id):
     note = (request.form.get("note") or "").strip()
     uid = current_user_id()
 
-    raw_amount = (request.form.get("amount") or "").strip()
     try:
-        amount = float(raw_amount)
-    except ValueError:
-        flash("Amount must be a number.", "error")
-        return redirect(request.referrer or url_for("home"))
-
-    if amount <= 0:
-        flash("Amount must be greater than 0.", "error")
-        return redirect(request.referrer or url_for("home"))
-
-    if tx_type not in ("deposit", "withdraw"):
-        flash("Invalid transaction type.", "error")
-        return redirect(url_for("home"))
-
-    if currency not in CURRENCIES:
-        flash("Invalid currency.", "error")
-        return redirect(request.referrer or url_for("home"))
+        amount = validate_tx_fields(tx_type, currency, request.form.get("amount"), tx_date)
+    except TxValidationError as e:
+        return _save_outcome(str(e), "error", request.referrer or url_for("home"), 422)
 
     with get_conn() as conn:
         cat = conn.execute(
-            "SELECT * FROM categories WHERE id=? AND user_id=?",
+            "SELECT * FROM categories WHERE id=? AND user_id=? AND deleted_at IS NULL",
             (category_id, uid)
         ).fetchone()
         if not cat:
-            flash("Category not found.", "error")
-            return redirect(url_for("home"))
+            return _save_outcome("Category not found.", "error", url_for("home"), 404)
+
+        # Balance check, ledger INSERT and balance update happen in one write transaction
+        # (shared with concurrent requests when group commit is on).
+        fields = (uid, category_id, tx_type, amount, currency, tx_date,
+                  note if note else None, _idempotency_key(request.form.get("idempotency_key")))
+        if group_commit.ENABLED:
+            status = group_commit.writer.submit(*fields)
+        else:
+            status = record_transaction(conn, *fields)
+
+        if status == "insufficient":
+            available = category_balance(conn, category_id, uid).get(currency, 0)
+            return _save_outcome(
+                f"Insufficient funds in {currency}. Available: {format_amount(available, currency)}", "error",
+                url_for("withdraw_form", category_id=category_id), 409,
+            )
+
+    if status == "duplicate":
+        # Retry / double submit of a form that was already stored.
+        return _save_outcome("Already saved.", "success", url_for("home"), 200)
+
+    chart_cache.invalidate(uid, currency, tx_date)
+
+    return _save_outcome("Saved.", "success", url_for("home"), 201)
+
+
+def _allocate_page(uid: int, values=None, errors=None, status=200):
+    with get_conn() as conn:
+        cats = conn.execute("""
+            SELECT id, name FROM categories
+            WHERE user_id=? AND deleted_at IS NULL
+            ORDER BY is_default DESC, name ASC
+        """, (uid,)).fetchall()
+        by_category, _ = balance_sheet(conn, uid)
+
+    return render_template(
+        "allocate.html",
+        cats=cats,
+        balances={c["id"]: by_category.get(c["id"]) or _empty_balances() for c in cats},
+        currencies=CURRENCIES,
+        values=values or {},
+        errors=errors or [],
+        today=date.today().isoformat(),
+        idempotency_key=(values or {}).get("idempotency_key") or uuid.uuid4().hex,
+    ), status
+
+
+@app.get("/allocate")
+def allocate_form():
+    return _allocate_page(current_user_id())
+
+
+@app.post("/allocate")
+def allocate_post():
+    """
+    Deposits into (or withdraws from) many envelopes at once: every row is
+    validated first, then all of them are written in one transaction.
+    Fields: tx_type, tx_date, note, and amount-<category_id> / currency-<category_id> per row.
+    """
+    uid = current_user_id()
+    form = request.form
+    tx_type = form.get("tx_type")
+    tx_date = form.get("tx_date") or date.today().isoformat()
+    note = (form.get("note") or "").strip() or None
 
-        if tx_type == "withdraw":
-            bals = category_balance(conn, category_id, uid)
-            if amount > (bals.get(currency, 0.0) + 1e-9):
-                flash(f"Insufficient funds in {currency}. Available: {bals.get(currency, 0.0):.2f}", "error")
-                return redirect(url_for("withdraw_form", category_id=category_id))
+    with get_conn() as conn:
+        names = {r["id"]: r["name"] for r in conn.execute(
+            "SELECT id, name FROM categories WHERE user_id=? AND deleted_at IS NULL", (uid,)
+        )}
+
+    entries = []
+    errors = []
+    for field, raw in form.items():
+        if not field.startswith("amount-") or not raw.strip():
+            continue
+        category_id = int(field[len("amount-"):]) if field[len("amount-"):].isdigit() else None
+        if category_id not in names:
+            errors.append("Category not found.")
+            continue
+        currency = form.get(f"currency-{category_id}")
+        try:
+            amount = validate_tx_fields(tx_type, currency, raw, tx_date)
+        except TxValidationError as e:
+            errors.append(f"{names[category_id]}: {e}")
+            continue
+        entries.append((category_id, tx_type, amount, currency, tx_date, note))
+
+    if not entries and not errors:
+        errors.append("Enter an amount for at least one category.")
+    if errors:
+        return _allocate_page(uid, form, errors, 400)
+
+    with get_conn() as conn:
+        status, shortfalls = record_transactions(
+            conn, uid, entries, _idempotency_key(form.get("idempotency_key"))
+        )
 
-        conn.execute("""
-            INSERT INTO transactions(user_id, category_id, type, amount, currency, tx_date, note)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (uid, category_id, tx_type, amount, currency, tx_date, note if note else None))
+    if status == "insufficient":
+        errors = [
+            f"{names[category_id]}: insufficient funds in {currency}. "
+            f"Available: {format_amount(available, currency)}"
+            for category_id, currency, available, _ in shortfalls
+        ]
+        return _allocate_page(uid, form, errors, 409)
 
-    flash("Saved.", "success")
+    if status == "duplicate":
+        flash("Already saved.", "success")
+        return redirect(url_for("home"))
+
+    for currency in {e[3] for e in entries}:
+        chart_cache.invalidate(uid, currency, tx_date)
+
+    flash(f"Saved {len(entries)} transactions.", "success")
     return redirect(url_for("home"))
 
 
+TX_PAGE_SIZE = 50
+TX_PAGE_SIZE_MAX = 200
+
+
+def _tx_filters():
+    """Reads the /transactions filters from the query string, dropping invalid values."""
+    filters = {}
+    category_id = request.args.get("category", type=int)
+    if category_id:
+        filters["category_id"] = category_id
+    currency = (request.args.get("currency") or "").upper()
+    if currency in CURRENCIES:
+        filters["currency"] = currency
+    tx_type = request.args.get("type")
+    if tx_type in ("deposit", "withdraw"):
+        filters["type"] = tx_type
+    for key in ("from", "to"):
+        day = _iso_date(request.args.get(key))
+        if day:
+            filters[key] = day
+    return filters
+
+
+def _iso_date(raw):
+    """raw if it is a YYYY-MM-DD date, else None."""
+    try:
+        return date.fromisoformat(raw).isoformat() if raw else None
+    except ValueError:
+        return None
+
+
+def _parse_cursor(raw):
+    """Cursor is "<tx_date>:<id>" of the last row already shown."""
+    if not raw:
+        return None
+    tx_date, _, tx_id = raw.rpartition(":")
+    if not _iso_date(tx_date) or not tx_id.isdigit():
+        return None
+    return tx_date, int(tx_id)
+
+
+def fetch_transactions_page(conn, user_id: int, filters: dict, cursor=None, limit: int = TX_PAGE_SIZE):
+    """
+    Keyset pagination over ORDER BY tx_date DESC, id DESC: each page seeks
+    straight past the cursor, so page N costs the same as page 1. Archived years
+    are read (newest first) only once the page runs past the hot rows.
+    Returns (rows, next_cursor).
+    """
+    where = ["t.user_id=?"]
+    params = [user_id]
+    for col in ("category_id", "currency", "type"):
+        if col in filters:
+            where.append(f"t.{col}=?")
+            params.append(filters[col])
+    if cursor is not None:
+        where.append("(t.tx_date, t.id) < (?, ?)")
+        params.extend(cursor)
+    end = filters.get("to")
+    if cursor is not None and (end is None or cursor[0] < end):
+        end = cursor[0]
+
+    rows = []
+    for lo, hi, year in reversed(db.ledger_segments(conn, filters.get("from"), end)):
+        bounds, bound_params = [], []
+        if lo is not None:
+            bounds.append("t.tx_date >= ?")
+            bound_params.append(lo)
+        if hi is not None:
+            bounds.append("t.tx_date <= ?")
+            bound_params.append(hi)
+        with db.ledger_sources(conn, year) as sources:
+            found = []
+            for source in sources:
+                found += conn.execute(f"""
+                    SELECT t.*, c.name AS category_name
+                    FROM {source} t
+                    JOIN categories c ON c.id = t.category_id AND c.deleted_at IS NULL
+                    WHERE {" AND ".join(where + bounds)}
+                    ORDER BY t.tx_date DESC, t.id DESC
+                    LIMIT ?
+                """, (*params, *bound_params, limit + 1 - len(rows))).fetchall()
+        if len(sources) > 1:
+            # Hot rows dated in an archived year; a batch mid-move is in both files.
+            found = sorted({r["id"]: r for r in found}.values(), key=lambda r: (r["tx_date"], r["id"]), reverse=True)
+        rows += found[:limit + 1 - len(rows)]
+        if len(rows) > limit:
+            break
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = f"{rows[-1]['tx_date']}:{rows[-1]['id']}"
+    return rows, next_cursor
+
+
+def _tx_page_request():
+    uid = current_user_id()
+    filters = _tx_filters()
+    cursor = _parse_cursor(request.args.get("cursor"))
+    limit = max(1, min(request.args.get("limit", TX_PAGE_SIZE, type=int), TX_PAGE_SIZE_MAX))
+    with get_conn() as conn:
+        rows, next_cursor = fetch_transactions_page(conn, uid, filters, cursor, limit)
+    return filters, rows, next_cursor
+
+
 @app.get("/transactions")
+@ledger_conditional
 def transactions():
+    filters, rows, next_cursor = _tx_page_request()
+    with get_conn() as conn:
+        cats = conn.execute(
+            "SELECT id, name FROM categories WHERE user_id=? AND deleted_at IS NULL "
+            "ORDER BY is_default DESC, name ASC",
+            (current_user_id(),)
+        ).fetchall()
+
+    next_url = None
+    if next_cursor:
+        args = request.args.to_dict()
+        args["cursor"] = next_cursor
+        next_url = url_for("transactions", **args)
+    return render_template(
+        "transactions.html",
+        rows=rows,
+        filters=filters,
+        categories=cats,
+        currencies=CURRENCIES,
+        next_url=next_url,
+        api_url=url_for("api_transactions", **{k: v for k, v in request.args.items() if k != "cursor"}),
+        next_cursor=next_cursor,
+    )
+
+
+@app.get("/api/transactions")
+def api_transactions():
+    """JSON page of history for infinite scroll; pass next_cursor back as ?cursor=."""
+    _, rows, next_cursor = _tx_page_request()
+    return jsonify({
+        "rows": [
+            {
+                "id": r["id"],
+                "tx_date": r["tx_date"],
+                "type": r["type"],
+                "amount": to_major(r["amount_cents"], r["currency"]),
+                "amount_cents": r["amount_cents"],
+                "currency": r["currency"],
+                "note": r["note"],
+                "category_id": r["category_id"],
+                "category_name": r["category_name"],
+            }
+            for r in rows
+        ],
+        "next_cursor": next_cursor,
+    })
+
+
+EXPORT_MIMETYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+@app.get("/export/transactions.<fmt>")
+def export_transactions(fmt):
+    """Streams the whole ledger as CSV or JSONL in constant memory."""
+    if fmt not in ledger_io.FORMATS:
+        abort(404)
     uid = current_user_id()
+    writer = ledger_io.export_csv if fmt == "csv" else ledger_io.export_jsonl
+
+    @stream_with_context
+    def generate():
+        # The body streams after teardown has unbound the user: name the shard explicitly.
+        with get_conn(uid) as conn:
+            yield from writer(conn, uid)
+
+    resp = Response(generate(), mimetype=EXPORT_MIMETYPES[fmt])
+    resp.headers["Content-Disposition"] = f"attachment; filename=srn-wallet-{date.today().isoformat()}.{fmt}"
+    return resp
+
+
+def _import_format(filename: str, fmt: str | None = None):
+    fmt = (fmt or os.path.splitext(filename or "")[1].lstrip(".")).lower()
+    return fmt if fmt in ledger_io.FORMATS else None
+
+
+@app.post("/import")
+def import_transactions_post():
+    uid = current_user_id()
+    upload = request.files.get("file")
+    fmt = _import_format(upload.filename if upload else "")
+    if not upload or not fmt:
+        flash("Choose a .csv or .jsonl file to import.", "error")
+        return redirect(url_for("transactions"))
+
+    stream = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
     with get_conn() as conn:
-        rows = conn.execute("""
-            SELECT t.*, c.name AS category_name
-            FROM transactions t
-            JOIN categories c ON c.id = t.category_id
-            WHERE t.user_id=?
-            ORDER BY t.tx_date DESC, t.id DESC
-            LIMIT 200
-        """, (uid,)).fetchall()
-    return render_template("transactions.html", rows=rows)
+        summary = ledger_io.import_transactions(
+            conn, uid, ledger_io.read_records(stream, fmt), validate_tx_fields
+        )
+
+    chart_cache.invalidate(uid)
+    flash(f"Imported {summary['imported']} transactions, skipped {summary['skipped']}.",
+          "success" if not summary["skipped"] else "error")
+    return redirect(url_for("transactions"))
 
 
 @app.get("/categories/new")
@@ -323,6 +958,7 @@ def add_category_post():
             "INSERT INTO categories(user_id, name, is_default) VALUES (?, ?, 0)",
             (uid, name)
         )
+        bump_ledger_version(conn, uid)
 
     flash("Category added.", "success")
     return redirect(url_for("home"))
@@ -334,7 +970,7 @@ def delete_category(category_id):
 
     with get_conn() as conn:
         cat = conn.execute(
-            "SELECT * FROM categories WHERE id=? AND user_id=?",
+            "SELECT * FROM categories WHERE id=? AND user_id=? AND deleted_at IS NULL",
             (category_id, uid)
         ).fetchone()
 
@@ -342,90 +978,110 @@ def delete_category(category_id):
             flash("Category not found.", "error")
             return redirect(url_for("home"))
 
+        # Soft delete: a few rows touched however long the envelope's history is.
+        # Its transactions are removed in the background (category_purge.py); the
+        # rename frees UNIQUE(user_id, name) for a new envelope in the meantime.
         conn.execute(
-            "DELETE FROM categories WHERE id=? AND user_id=?",
+            "DELETE FROM balances WHERE category_id=? AND user_id=?",
             (category_id, uid)
         )
+        conn.execute(
+            """
+            UPDATE categories SET deleted_at = datetime('now'), name = name || ' (deleted #' || id || ')'
+            WHERE id=? AND user_id=?
+            """,
+            (category_id, uid)
+        )
+        bump_ledger_version(conn, uid)
 
+    category_purge.purger.kick(uid)
+    chart_cache.invalidate(uid)
     flash("Category deleted.", "success")
     return redirect(url_for("home"))
 
 
-@app.get("/reports")
-def reports():
-    uid = current_user_id()
+def _report_range():
     today = date.today()
-    start_default = today.replace(day=1).isoformat()
-    end_default = today.isoformat()
+    start = _iso_date(request.args.get("from")) or today.replace(day=1).isoformat()
+    end = _iso_date(request.args.get("to")) or today.isoformat()
+    return start, end
+
+
+def fetch_income_expense(conn, user_id: int, start: str, end: str, currency: str):
+    totals = aggregate_reports(conn, user_id, start, end, [currency])["totals"][currency]
+    return totals["income"], totals["expense"]
+
 
-    start = request.args.get("from", start_default)
-    end = request.args.get("to", end_default)
+def chart_version(user_id: int, currency: str, start: str, end: str, income: int, expense: int):
+    """Fingerprint of the data behind one chart; doubles as its ETag."""
+    raw = f"{user_id}:{currency}:{start}:{end}:{income!r}:{expense!r}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:20]
 
+
+def donut_chart_png(title: str, income: int, expense: int):
+    if income <= 0 and expense <= 0:
+        return None
+
+    # matplotlib is optional and heavy: only PNG exports pay for importing it.
+    # The object-oriented Figure API avoids pyplot's global state across threads.
+    try:
+        from matplotlib.figure import Figure
+    except ImportError:
+        abort(501, "PNG export needs matplotlib installed.")
+
+    t0 = time.perf_counter()
+    fig = Figure(figsize=(6, 6), dpi=150)
+    ax = fig.subplots()
+    values = [income, expense]
+    labels = ["Income", "Expenses"]
+
+    ax.pie(
+        values,
+        labels=labels,
+        autopct=lambda pct: f"{pct:.1f}%" if sum(values) > 0 else "",
+        startangle=90,
+        wedgeprops={"width": 0.45},
+    )
+    ax.set_title(title)
+
+    buf = io.BytesIO()
+    fig.tight_layout()
+    fig.savefig(buf, format="png")
+    metrics.CHART_RENDER_SECONDS.observe(time.perf_counter() - t0)
+    return buf.getvalue()
+
+
+def _report_currency():
     selected_currency = request.args.get("currency", "ALL").upper()
     if selected_currency != "ALL" and selected_currency not in CURRENCIES:
         selected_currency = "ALL"
+    return selected_currency
 
-    def fetch_income_expense(conn, currency: str):
-        rows = conn.execute("""
-            SELECT type, SUM(amount) AS total
-            FROM transactions
-            WHERE user_id = ?
-              AND tx_date >= ?
-              AND tx_date <= ?
-              AND currency = ?
-            GROUP BY type
-        """, (uid, start, end, currency)).fetchall()
-
-        income = 0.0
-        expense = 0.0
-        for r in rows:
-            t = r["type"]
-            total = float(r["total"] or 0.0)
-            if t == "deposit":
-                income = total
-            elif t == "withdraw":
-                expense = total
-        return income, expense
-
-    def donut_chart_data_url(title: str, income: float, expense: float):
-        if income <= 0 and expense <= 0:
-            return None
-
-        fig = plt.figure(figsize=(6, 6), dpi=150)
-        values = [income, expense]
-        labels = ["Income", "Expenses"]
-
-        plt.pie(
-            values,
-            labels=labels,
-            autopct=lambda pct: f"{pct:.1f}%" if sum(values) > 0 else "",
-            startangle=90,
-            wedgeprops={"width": 0.45},
-        )
-        plt.title(title)
-
-        buf = io.BytesIO()
-        plt.tight_layout()
-        fig.savefig(buf, format="png")
-        plt.close(fig)
-        buf.seek(0)
 
-        return "data:image/png;base64," + base64.b64encode(buf.getvalue()).decode("utf-8")
+@app.get("/reports")
+@ledger_conditional
+def reports():
+    uid = current_user_id()
+    start, end = _report_range()
+    selected_currency = _report_currency()
+    render_mode = request.args.get("render", REPORTS_RENDER)
+    if render_mode not in ("client", "server"):
+        render_mode = "client"
 
+    wanted = CURRENCIES if selected_currency == "ALL" else [selected_currency]
     charts = {}
 
     with get_conn() as conn:
-        if selected_currency == "ALL":
-            for cur in CURRENCIES:
-                inc, exp = fetch_income_expense(conn, cur)
-                url = donut_chart_data_url(f"Income vs Expenses ({cur})", inc, exp)
-                if url:
-                    charts[cur] = {"income": inc, "expense": exp, "url": url}
-        else:
-            inc, exp = fetch_income_expense(conn, selected_currency)
-            url = donut_chart_data_url(f"Income vs Expenses ({selected_currency})", inc, exp)
-            if url:
-                charts[selected_currency] = {"income": inc, "expense": exp, "url": url}
+        totals = aggregate_reports(conn, uid, start, end, wanted)["totals"]
+        for cur in wanted:
+            inc, exp = totals[cur]["income"], totals[cur]["expense"]
+            if inc <= 0 and exp <= 0:
+                continue
+            url = url_for(
+                "report_chart", currency=cur, v=chart_version(uid, cur, start, end, inc, exp),
+                **{"from": start, "to": end}
+            )
+            charts[cur] = {"income": inc, "expense": exp, "url": url}
 
     return render_template(
         "reports.html",
@@ -434,9 +1090,400 @@ def reports():
         selected_currency=selected_currency,
         currencies=CURRENCIES,
         charts=charts,
+        render_mode=render_mode,
     )
 
 
+def _major_totals(totals):
+    """{currency: {"income", "expense"}} in minor units -> major-unit numbers for JSON."""
+    return {
+        cur: {side: to_major(v, cur) for side, v in sides.items()}
+        for cur, sides in totals.items()
+    }
+
+
+@app.get("/api/reports")
+def api_reports():
+    """
+    Income/expense totals per currency for the range, for client-side charts.
+    Optional breakdowns (same single pass): ?by=category and ?period=day|week|month.
+    """
+    uid = current_user_id()
+    start, end = _report_range()
+    selected_currency = _report_currency()
+    wanted = CURRENCIES if selected_currency == "ALL" else [selected_currency]
+
+    by_category = request.args.get("by") == "category"
+    period = request.args.get("period")
+    if period not in PERIOD_BUCKETS:
+        period = None
+
+    with get_conn() as conn:
+        agg = aggregate_reports(conn, uid, start, end, wanted, by_category=by_category, period=period)
+
+        payload = {"from": start, "to": end, "currency": selected_currency, "totals": _major_totals(agg["totals"])}
+        if by_category:
+            names = {
+                r["id"]: r["name"]
+                for r in conn.execute("SELECT id, name FROM categories WHERE user_id=?", (uid,)).fetchall()
+            }
+            payload["by_category"] = [
+                {"category_id": cid, "name": names.get(cid), "totals": _major_totals(totals)}
+                for cid, totals in agg["by_category"].items()
+            ]
+        if period:
+            payload["period"] = period
+            payload["by_period"] = {bucket: _major_totals(t) for bucket, t in agg["by_period"].items()}
+
+    return jsonify(payload)
+
+
+@app.get("/reports/chart/<currency>.png")
+def report_chart(currency):
+    uid = current_user_id()
+    start, end = _report_range()
+    if currency not in CURRENCIES:
+        abort(404)
+
+    with get_conn() as conn:
+        inc, exp = fetch_income_expense(conn, uid, start, end, currency)
+    version = chart_version(uid, currency, start, end, inc, exp)
+
+    if version in request.if_none_match:
+        resp = Response(status=304)
+    else:
+        key = (uid, currency, start, end)
+        png = chart_cache.get(key, version)
+        if png is None:
+            png = donut_chart_png(f"Income vs Expenses ({currency})", inc, exp)
+            if png is None:
+                abort(404)
+            chart_cache.put(key, version, png)
+        resp = Response(png, mimetype="image/png")
+
+    resp.set_etag(version)
+    # The reports page links charts with ?v=<version>: a matching URL can never change.
+    if request.args.get("v") == version:
+        resp.cache_control.max_age = 31536000
+        resp.cache_control.immutable = True
+    else:
+        resp.cache_control.no_cache = True
+    resp.cache_control.private = True
+    return resp
+
+
+def _ledger_shards():
+    """get_conn() arguments reaching every ledger: one user per shard, or None for DB_PATH alone."""
+    return [int(p.stem.split("_", 1)[1]) for p in db.shard_paths()] if db.SHARD_DIR else [None]
+
+
+@app.cli.command("verify-balances")
+@click.option("--rebuild", is_flag=True, help="Recompute the balances table from transactions.")
+def verify_balances_command(rebuild):
+    """Report drift between the balances table and the transactions ledger (every shard)."""
+    drift = []
+    for shard_user in _ledger_shards():
+        with get_conn(shard_user) as conn:
+            if rebuild:
+                rebuild_balances(conn)
+            drift += balance_drift(conn)
+    if rebuild:
+        click.echo("Balances rebuilt from transactions.")
+
+    if not drift:
+        click.echo("Balances OK: no drift.")
+        return
+
+    for user_id, category_id, currency, stored, expected in drift:
+        click.echo(
+            f"user={user_id} category={category_id} {currency}: "
+            f"stored={format_amount(stored, currency)} expected={format_amount(expected, currency)}"
+        )
+    raise SystemExit(1)
+
+
+@app.cli.command("backfill-daily-totals")
+@click.option("--chunk-days", default=92, show_default=True, help="Days rolled up per transaction.")
+@click.option("--rebuild", is_flag=True, help="Recompute the whole rollup, not just pending history.")
+def backfill_daily_totals_command(chunk_days, rebuild):
+    """Roll up existing transactions into daily_totals (resumable; safe while the app runs)."""
+    pending = 0
+    for shard_user in _ledger_shards():
+        with get_conn(shard_user) as conn:
+            if rebuild:
+                conn.execute("""
+                    INSERT OR REPLACE INTO daily_totals_backfill(user_id, pending_before)
+                    SELECT id, '9999-12-31' FROM users
+                """)
+            user_ids = [r["user_id"] for r in conn.execute("SELECT user_id FROM daily_totals_backfill")]
+        for user_id in user_ids:
+            chunks = backfill_daily_totals(
+                conn, user_id, chunk_days,
+                progress=lambda uid, start, before: click.echo(f"user={uid}: rolled up days from {start}"),
+            )
+            click.echo(f"user={user_id}: done ({chunks} chunks).")
+        pending += len(user_ids)
+    if not pending:
+        click.echo("daily_totals already covers every user's history.")
+
+
+@app.cli.command("build-css")
+@click.option("--check", is_flag=True,
+              help="Only report whether the committed stylesheet is stale or misses a utility.")
+@click.option("--verbose", is_flag=True, help="List every class that got a rule.")
+def build_css_command(check, verbose):
+    """Build the purged, minified, content-hashed stylesheet into static/css/."""
+    filename, size, used, changed, unknown = css_build.build(write=not check)
+    if verbose:
+        click.echo(" ".join(used))
+    if unknown:
+        click.echo(f"No rule for {len(unknown)} Tailwind-style classes (add them to css_build.py): "
+                   + " ".join(unknown), err=True)
+    if check:
+        if changed:
+            click.echo(f"Stylesheet is stale: run `flask --app app build-css` (would write {filename}).")
+        if changed or unknown:
+            raise SystemExit(1)
+        click.echo(f"Stylesheet up to date: static/{filename}.")
+        return
+    state = "Wrote" if changed else "Unchanged:"
+    click.echo(f"{state} static/{filename} ({size:,} bytes, {len(used)} classes).")
+
+
+@app.cli.command("purge-categories")
+@click.option("--batch", default=category_purge.BATCH, show_default=True, help="Rows deleted per transaction.")
+@click.option("--pause-ms", default=category_purge.PAUSE_SECONDS * 1000, show_default=True,
+              help="Sleep between batches.")
+def purge_categories_command(batch, pause_ms):
+    """Finish purging deleted categories in every database (resumable; safe while the app runs)."""
+    total = 0
+    for user_id in _ledger_shards():
+        total += category_purge.purge_pending(
+            get_conn(user_id), batch, pause_ms / 1000,
+            progress=lambda cid, rows: click.echo(f"category={cid}: purged ({rows:,} rows)."),
+        )
+    click.echo(f"{total} deleted categories purged." if total else "No deleted categories pending.")
+
+
+@app.cli.command("archive-ledger")
+@click.option("--through", type=int, required=True, help="Last year to move out of the hot database.")
+@click.option("--batch", default=archive.BATCH, show_default=True, help="Rows moved per transaction.")
+@click.option("--pause-ms", default=archive.PAUSE_SECONDS * 1000, show_default=True, help="Sleep between batches.")
+@click.option("--vacuum", is_flag=True,
+              help="VACUUM each hot database afterwards so the file shrinks (blocks writers while it runs).")
+def archive_ledger_command(through, batch, pause_ms, vacuum):
+    """Move closed years of transactions into per-year archive files (resumable; safe while the app runs)."""
+    if through >= date.today().year:
+        raise click.UsageError(f"{through} is not closed yet; archive {date.today().year - 1} or earlier.")
+    total = 0
+    for shard_user in _ledger_shards():
+        conn = get_conn(shard_user)
+        for user_id in [r["id"] for r in conn.execute("SELECT id FROM users ORDER BY id").fetchall()]:
+            for year in archive.closed_years(conn, user_id, through):
+                moved = archive.archive_year(conn, user_id, year, batch, pause_ms / 1000)
+                click.echo(f"user={user_id} {year}: moved {moved:,} rows to {db.archive_path(conn, year)}.")
+                total += moved
+        if vacuum:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")  # VACUUM rewrote every page through the WAL
+    click.echo(f"Archived {total:,} transactions." if total else f"Nothing left to archive through {through}.")
+
+
+def _snapshot_path(snapshot, directory):
+    root = Path(directory) if directory else backup.backup_dir()
+    if snapshot is None:
+        found = backup.snapshots(root)
+        if not found:
+            raise click.ClickException(f"No snapshots in {root}.")
+        return found[-1]
+    path = Path(snapshot) if Path(snapshot).is_dir() else root / snapshot
+    if not (path / backup.MANIFEST).exists():
+        raise click.ClickException(f"{path} is not a complete snapshot.")
+    return path
+
+
+@app.cli.command("backup")
+@click.option("--dir", "directory", type=click.Path(file_okay=False),
+              help="Default: SRN_BACKUP_DIR, or backups/ next to the database.")
+@click.option("--pages", default=backup.PAGES, show_default=True, help="Pages copied per step (-1: all at once).")
+@click.option("--pause-ms", default=backup.PAUSE_SECONDS * 1000, show_default=True, help="Sleep between steps.")
+@click.option("--keep", default=backup.KEEP, show_default=True, help="Snapshots kept; older ones are deleted.")
+def backup_command(directory, pages, pause_ms, keep):
+    """Take a compressed, checksummed snapshot of every database (online; safe while the app runs)."""
+    manifest = backup.take(directory, pages, pause_ms / 1000, keep)
+    if manifest is None:
+        raise click.ClickException("Another backup is running.")
+    for f in manifest["files"]:
+        how = f"unchanged since {f['reused']}" if f.get("reused") else f"{f['steps']} steps"
+        click.echo(f"{f['name']}: {f['bytes']:,} -> {f['gz_bytes']:,} bytes ({how}).")
+    click.echo(f"Snapshot {manifest['snapshot']} written in {manifest['seconds']:.1f}s.")
+
+
+@app.cli.command("backup-verify")
+@click.argument("snapshot", required=False)
+@click.option("--dir", "directory", type=click.Path(file_okay=False), help="Where snapshots are kept.")
+def backup_verify_command(snapshot, directory):
+    """Check a snapshot's checksums and database integrity (default: the newest)."""
+    path = _snapshot_path(snapshot, directory)
+    problems = backup.verify(path)
+    for problem in problems:
+        click.echo(problem)
+    if problems:
+        raise SystemExit(1)
+    click.echo(f"Snapshot {path.name} OK: {len(backup.read_manifest(path)['files'])} files verified.")
+
+
+@app.cli.command("backup-restore")
+@click.argument("snapshot")
+@click.option("--dir", "directory", type=click.Path(file_okay=False), help="Where snapshots are kept.")
+@click.option("--target", type=click.Path(file_okay=False),
+              help="Restore under this directory instead of over the live databases.")
+@click.option("--yes", is_flag=True, help="Do not ask before replacing the live databases.")
+def backup_restore_command(snapshot, directory, target, yes):
+    """Verify a snapshot and write it back (over the live databases unless --target is given)."""
+    path = _snapshot_path(snapshot, directory)
+    if not target and not yes:
+        click.confirm(f"Replace the live databases with snapshot {path.name}?", abort=True)
+    try:
+        restored = backup.restore(path, target, progress=lambda name, dest: click.echo(f"{name} -> {dest}"))
+    except ValueError as e:
+        raise click.ClickException(f"Snapshot failed verification, nothing restored: {e}")
+    click.echo(f"Restored {len(restored)} files from {path.name}.")
+
+
+@app.cli.command("import-transactions")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(ledger_io.FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", default=ledger_io.IMPORT_BATCH, show_default=True)
+@click.option("--dry-run", is_flag=True, help="Validate only; write nothing.")
+@click.option("--defer-indexes", is_flag=True,
+              help="Drop transaction indexes during the load and rebuild them after (fastest for big files; "
+                   "stop the web app first).")
+def import_transactions_command(path, fmt, batch_size, dry_run, defer_indexes):
+    """Bulk-import transactions for the single user from CSV or JSONL."""
+    fmt = _import_format(path, fmt)
+    if not fmt:
+        raise click.UsageError("Cannot tell the format; pass --format csv|jsonl.")
+
+    uid = ensure_single_user()
+    t0 = time.perf_counter()
+    with open(path, encoding="utf-8-sig", newline="") as stream, get_conn(uid) as conn:
+        with db.deferred_indexes(conn, "transactions") if defer_indexes and not dry_run else nullcontext():
+            summary = ledger_io.import_transactions(
+                conn, uid, ledger_io.read_records(stream, fmt), validate_tx_fields,
+                batch_size=batch_size, dry_run=dry_run,
+            )
+    elapsed = time.perf_counter() - t0
+
+    for line_no, message in summary["errors"]:
+        click.echo(f"line {line_no}: {message}")
+    verb = "Validated" if dry_run else "Imported"
+    click.echo(
+        f"{verb} {summary['imported']} rows in {elapsed:.1f}s "
+        f"({summary['skipped']} skipped, {summary['categories_created']} new categories)."
+    )
+    if summary["skipped"]:
+        raise SystemExit(1)
+
+
+# Route requests exercised by `check-query-plans`; {cid} is a seeded category id.
+_PLAN_CHECK_REQUESTS = [
+    ("GET", "/", None),
+    ("GET", "/category/{cid}/deposit", None),
+    ("POST", "/category/{cid}/save", {"tx_type": "deposit", "amount": "10", "currency": "USD",
+                                  "idempotency_key": "plan-check-1"}),
+    ("GET", "/category/{cid}/withdraw", None),
+    ("POST", "/category/{cid}/save", {"tx_type": "withdraw", "amount": "1", "currency": "USD"}),
+    ("GET", "/allocate", None),
+    ("POST", "/allocate", {"tx_type": "deposit", "amount-{cid}": "5", "currency-{cid}": "EUR",
+                           "idempotency_key": "plan-check-2"}),
+    ("GET", "/transactions", None),
+    ("GET", "/export/transactions.csv", None),
+    ("GET", "/transactions?cursor=2999-01-01:999999", None),
+    ("GET", "/api/transactions?category={cid}&currency=USD&type=deposit&from=2000-01-01&to=2999-01-01", None),
+    ("GET", "/reports", None),
+    ("GET", "/reports?currency=USD", None),
+    ("GET", "/reports/chart/USD.png", None),
+    ("GET", "/api/reports?by=category&period=week", None),
+    ("POST", "/categories/new", {"name": "Plan check"}),
+    ("POST", "/category/{cid}/delete", None),
+]
+
+# Read past the archive boundary once the check has moved year 2000 out (see archive.py).
+_PLAN_CHECK_ARCHIVE_REQUESTS = [
+    "/transactions?cursor=2001-01-01:1",
+    "/api/transactions?from=2000-01-01&to=2000-12-31",
+    "/export/transactions.csv",
+    "/api/reports?from=1999-01-01&to=2001-12-31&by=category&period=month",
+]
+
+
+def _full_scans(conn, sql):
+    plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+    # "SCAN t USING [COVERING] INDEX ..." is an index walk; a bare "SCAN t" reads the whole table.
+    return [r["detail"] for r in plan if r["detail"].startswith("SCAN") and " USING " not in r["detail"]]
+
+
+@app.cli.command("check-query-plans")
+def check_query_plans_command():
+    """Run every route on a scratch database and fail if any query does a full table scan."""
+    statements = []
+    saved_path, saved_trace, saved_shards = db.DB_PATH, db.SQL_TRACE, db.SHARD_DIR
+    with tempfile.TemporaryDirectory() as tmp:
+        db.DB_PATH = os.path.join(tmp, "plans.sqlite3")
+        if saved_shards is not None:
+            db.SHARD_DIR = Path(tmp) / "shards"
+        try:
+            init_db()
+            with app.test_client() as client:
+                client.environ_base["HTTP_" + USER_HEADER.upper().replace("-", "_")] = SINGLE_USER_EMAIL
+                client.get("/")
+                with get_conn() as conn:
+                    cid = conn.execute("SELECT id FROM categories ORDER BY id LIMIT 1").fetchone()["id"]
+                db.SQL_TRACE = statements.append
+                for method, path, form in _PLAN_CHECK_REQUESTS:
+                    client.open(path.format(cid=cid), method=method,
+                                data={k.format(cid=cid): v for k, v in form.items()} if form else None)
+                # The deleted category's purge may already have run in the background:
+                # check its statements (parameters bound to 1) whichever thread ran them.
+                category_purge.purge_pending(get_conn(), pause=0)
+                statements.extend(sql.replace("?", "1") for sql in category_purge.BATCH_DELETES)
+
+                # Archive a back-dated entry, then read it back with the rollup pending
+                # (raw report rows) and roll it up again.
+                client.post(f"/category/{cid + 1}/save", data={"tx_type": "deposit", "amount": "1",
+                                                               "currency": "USD", "tx_date": "2000-01-15"})
+                conn = get_conn()
+                uid = conn.execute("SELECT user_id FROM categories WHERE id=?", (cid + 1,)).fetchone()["user_id"]
+                archive.archive_year(conn, uid, 2000, pause=0)
+                with conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO daily_totals_backfill(user_id, pending_before) VALUES (?, '9999-12-31')",
+                        (uid,)
+                    )
+                for path in _PLAN_CHECK_ARCHIVE_REQUESTS:
+                    client.get(path)
+                backfill_daily_totals(conn, uid)
+            db.SQL_TRACE = None
+
+            failures = []
+            with get_conn() as conn, db.attached_archive(conn, 2000):
+                for sql in dict.fromkeys(statements):
+                    if not sql.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE", "DELETE")):
+                        continue
+                    for detail in _full_scans(conn, sql):
+                        failures.append((detail, " ".join(sql.split())))
+        finally:
+            db.close_pooled_conns()
+            db.DB_PATH, db.SQL_TRACE, db.SHARD_DIR = saved_path, saved_trace, saved_shards
+
+    if not failures:
+        click.echo(f"Query plans OK: {len(set(statements))} statements, no full scans.")
+        return
+    for detail, sql in failures:
+        click.echo(f"{detail}: {sql}")
+    raise SystemExit(1)
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,130 @@
+# archive.py — Moves closed years of the ledger out of the hot database.
+#
+# `flask --app app archive-ledger --through 2023` moves every transaction dated
+# 2023 or earlier into one SQLite file per year next to the database
+# (srn_wallet_archive/2023.sqlite3; user_<id>_archive/ beside each shard), so the
+# file every request reads and writes, its page cache and its backups only carry
+# the recent years. Balances and the daily_totals rollup stay in the hot file as
+# they are (they already summarise the moved rows, and reports read the rollup);
+# the net of the moved rows is added to opening_balances, one carry-forward row per
+# envelope and currency, which is what verify-balances now starts from.
+# Readers that need the old rows themselves (/transactions paging past the boundary,
+# exports, reports and backfills over days the rollup does not cover) ATTACH the
+# year's file for the duration of the query: see db.ledger_segments / ledger_sources.
+#
+# Rows move in batches: each batch is committed into the archive first and only
+# then deleted from the hot file (with its opening-balance update), so a run cut
+# short loses nothing and the next run continues where it stopped. A batch caught
+# between the two commits is in both files until then; /transactions and exports
+# skip the duplicate.
+
+import time
+
+import db
+
+BATCH = 2000
+PAUSE_SECONDS = 0.02
+
+ARCHIVE_COLUMNS = "id, user_id, category_id, type, amount_cents, currency, tx_date, note, idempotency_key, created_at"
+
+# Same columns as the hot table (constraints were checked on the way in); no
+# foreign keys, categories stay in the hot file.
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS {schema}.transactions (
+      id INTEGER PRIMARY KEY,
+      user_id INTEGER NOT NULL,
+      category_id INTEGER NOT NULL,
+      type TEXT NOT NULL,
+      amount_cents INTEGER NOT NULL,
+      currency TEXT NOT NULL,
+      tx_date TEXT NOT NULL,
+      note TEXT,
+      idempotency_key TEXT,
+      created_at TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_user_date
+      ON transactions(user_id, tx_date, id)
+    """,
+    # For category_purge: a purged envelope's archived rows go too.
+    """
+    CREATE INDEX IF NOT EXISTS {schema}.idx_transactions_category
+      ON transactions(category_id)
+    """,
+]
+
+
+def closed_years(conn, user_id: int, through: int):
+    """Years up to `through` in which the user still has transactions in the hot file, oldest first."""
+    years = []
+    after = "0000-12-31"
+    while True:
+        first = conn.execute("""
+            SELECT MIN(tx_date) AS d FROM transactions
+            WHERE user_id=? AND tx_date > ? AND tx_date <= ?
+        """, (user_id, after, f"{int(through):04d}-12-31")).fetchone()["d"]
+        if first is None:
+            return years
+        years.append(int(first[:4]))
+        after = f"{first[:4]}-12-31"
+
+
+def archive_year(conn, user_id: int, year: int, batch: int = BATCH, pause: float = PAUSE_SECONDS, progress=None):
+    """
+    Moves the user's transactions dated in `year` from conn's database into the
+    year's archive file, `batch` rows per pair of transactions. Returns the number of rows moved.
+    """
+    first, last = f"{int(year):04d}-01-01", f"{int(year):04d}-12-31"
+    moved = copied = 0
+    with db.attached_archive(conn, year, create=True) as schema:
+        with conn:
+            for sql in ARCHIVE_SCHEMA:
+                conn.execute(sql.format(schema=schema))
+        # Registered before the first row leaves, so readers look in the file from then on.
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO ledger_archives(year) VALUES (?)", (year,))
+
+        # The rollup must cover these days before their rows leave the hot file.
+        db.backfill_daily_totals(conn, user_id)
+        while True:
+            ids = [r["id"] for r in conn.execute("""
+                SELECT id FROM transactions
+                WHERE user_id=? AND tx_date >= ? AND tx_date <= ?
+                  AND category_id IN (SELECT id FROM categories WHERE user_id=? AND deleted_at IS NULL)
+                ORDER BY tx_date, id
+                LIMIT ?
+            """, (user_id, first, last, user_id, batch))]
+            if not ids:
+                break
+            marks = ", ".join("?" * len(ids))
+            with conn:
+                copied += conn.execute(f"""
+                    INSERT OR IGNORE INTO {schema}.transactions({ARCHIVE_COLUMNS})
+                    SELECT {ARCHIVE_COLUMNS} FROM main.transactions WHERE id IN ({marks})
+                """, ids).rowcount
+            with conn:
+                conn.execute(f"""
+                    INSERT INTO opening_balances(user_id, category_id, currency, amount_cents)
+                    SELECT user_id, category_id, currency,
+                           SUM(CASE WHEN type='deposit' THEN amount_cents ELSE -amount_cents END)
+                    FROM main.transactions
+                    WHERE id IN ({marks})
+                    GROUP BY user_id, category_id, currency
+                    ON CONFLICT(user_id, category_id, currency)
+                    DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents
+                """, ids)
+                moved += conn.execute(f"DELETE FROM main.transactions WHERE id IN ({marks})", ids).rowcount
+            if progress:
+                progress(user_id, year, moved)
+            if len(ids) < batch:
+                break
+            time.sleep(pause)
+
+        with conn:
+            conn.execute(
+                "UPDATE ledger_archives SET rows = rows + ?, archived_at = datetime('now') WHERE year = ?",
+                (copied, year)
+            )
+    return moved
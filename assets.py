@@ -0,0 +1,67 @@
+# assets.py — Content-hashed URLs for files under static/.
+#
+# Built files are looked up in static/css/manifest.json (written by css_build.py),
+# so {{ asset_url('css/app.css') }} becomes /static/css/app.<hash>.css; any other
+# file gets /static/<name>?v=<hash of its bytes>. Either way the URL changes whenever
+# the content does, which is what lets app.cache_static_assets serve a matching URL
+# with a one-year immutable Cache-Control.
+
+import hashlib
+import json
+import re
+import threading
+from pathlib import Path
+
+from flask import url_for
+
+STATIC_DIR = Path(__file__).parent / "static"
+MANIFEST_PATH = STATIC_DIR / "css" / "manifest.json"
+IMMUTABLE_MAX_AGE = 31536000
+HASHED_NAME = re.compile(r"\.[0-9a-f]{10}\.[a-z]+$")
+
+# name -> (mtime_ns, value): re-read only when the file on disk changes, so a
+# rebuild or a dev edit is picked up without a restart.
+_cache = {}
+_lock = threading.Lock()
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:10]
+
+
+def _cached(path: Path, load):
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = str(path)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != mtime:
+        entry = (mtime, load(path))
+        with _lock:
+            _cache[key] = entry
+    return entry[1]
+
+
+def load_manifest() -> dict:
+    return _cached(MANIFEST_PATH, lambda p: json.loads(p.read_text(encoding="utf-8"))) or {}
+
+
+def file_hash(name: str):
+    return _cached(STATIC_DIR / name, lambda p: content_hash(p.read_bytes()))
+
+
+def asset_url(name: str) -> str:
+    """URL for static/<name> that changes with its content (template global)."""
+    built = load_manifest().get(name)
+    if built:
+        return url_for("static", filename=built)
+    version = file_hash(name)
+    return url_for("static", filename=name, v=version) if version else url_for("static", filename=name)
+
+
+def is_immutable(filename: str, version=None) -> bool:
+    """True when this URL can only ever serve the bytes it serves now."""
+    if HASHED_NAME.search(filename) and filename in load_manifest().values():
+        return True
+    return version is not None and version == file_hash(filename)
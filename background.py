@@ -0,0 +1,40 @@
+# background.py — One lazily started daemon thread per process.
+#
+# The group commit writer, the category purger and the backup scheduler each own
+# a thread. It is started on first use, not at import: a thread does not survive
+# gunicorn's fork, so each worker forked from a preloaded master starts its own
+# (and restarts it if it ever died).
+
+import os
+import threading
+
+
+class ProcessThread:
+    """Base for an object whose _run() loops forever on a thread of its own."""
+
+    thread_name = "srn-background"
+
+    def __init__(self):
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def started_here(self) -> bool:
+        """True once the thread has been started in this process."""
+        return self._pid == os.getpid()
+
+    def _ensure_thread(self):
+        if self.started_here() and self._thread.is_alive():
+            return
+        with self._lock:
+            if not self.started_here() or not self._thread.is_alive():
+                self._reset()
+                self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+                self._thread.start()
+                self._pid = os.getpid()
+
+    def _reset(self):
+        """Drops state inherited from the parent process (or a dead thread) before a start."""
+
+    def _run(self):
+        raise NotImplementedError
@@ -0,0 +1,394 @@
+# backup.py — Online, compressed, checksummed snapshots of the wallet databases.
+#
+# Copying srn_wallet.sqlite3 by hand is unsafe under WAL (the file alone misses
+# whatever is still in -wal) and means stopping the app. A snapshot instead copies
+# every database (DB_PATH, each shard, their yearly archive files) with SQLite's
+# online backup API, SRN_BACKUP_PAGES pages per step with SRN_BACKUP_PAUSE_MS of
+# sleep in between, so save_tx in the workers keeps committing while it runs.
+# Each copy is gzipped into SRN_BACKUP_DIR/<UTC time>/ (default: backups/ next
+# to the database) with a manifest.json recording the SHA-256 of the database and
+# of the .gz; the manifest is written last, so a directory without one is an
+# unfinished snapshot. Files unchanged since the previous snapshot (idle shards,
+# archives) are hard-linked from it instead of copied again.
+#
+# `flask --app app backup` takes one now, `backup-verify` re-checks the checksums
+# and runs PRAGMA integrity_check on a snapshot, `backup-restore` puts one back.
+# With SRN_BACKUP_INTERVAL_MIN set, every worker also runs a scheduler thread; a
+# lock file in the backup directory lets only one of them take each snapshot.
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: the CLI still works, without the cross-process lock
+    fcntl = None
+
+import db
+import metrics
+from background import ProcessThread
+
+INTERVAL_SECONDS = float(os.environ.get("SRN_BACKUP_INTERVAL_MIN", "0")) * 60  # 0: no schedule
+KEEP = int(os.environ.get("SRN_BACKUP_KEEP", "14"))
+PAGES = int(os.environ.get("SRN_BACKUP_PAGES", "256"))
+PAUSE_SECONDS = float(os.environ.get("SRN_BACKUP_PAUSE_MS", "5")) / 1000
+GZIP_LEVEL = int(os.environ.get("SRN_BACKUP_GZIP_LEVEL", "1"))  # compression is most of a snapshot's CPU
+CHUNK_BYTES = 1024 * 1024
+MANIFEST = "manifest.json"
+
+FAILURES = metrics.register(metrics.Counter(
+    "srn_backup_failures_total", "Scheduled snapshots that stopped on an error.",
+))
+
+
+def backup_dir() -> Path:
+    if os.environ.get("SRN_BACKUP_DIR"):
+        return Path(os.environ["SRN_BACKUP_DIR"])
+    return Path(db.DB_PATH).with_name("backups")
+
+
+def database_files():
+    """[(name inside a snapshot, path, kind)] for every database file; kind is "ledger" or "archive"."""
+    main = Path(db.DB_PATH)
+    files = [(main.name, main, "ledger")]
+    files += [(f"{db.archive_dir(main).name}/{p.name}", p, "archive")
+              for p in sorted(db.archive_dir(main).glob("*.sqlite3"))]
+    for shard in db.shard_paths():
+        name = f"shards/{shard.relative_to(db.SHARD_DIR).as_posix()}"
+        files.append((name, shard, "ledger"))
+        files += [(f"{name.rsplit('/', 1)[0]}/{db.archive_dir(shard).name}/{p.name}", p, "archive")
+                  for p in sorted(db.archive_dir(shard).glob("*.sqlite3"))]
+    return files
+
+
+def copy_database(src_path, dest_path, pages: int = PAGES, pause: float = PAUSE_SECONDS):
+    """
+    Copies a live database to dest_path with the backup API, `pages` pages per step.
+    The source keeps one read transaction open for the whole copy: under WAL that
+    pins a single snapshot without blocking writers, so the copy is one point in
+    time and never restarts (a backup whose source changes between steps starts
+    over, and under a steady write load would never finish). Returns the step count.
+    """
+    steps = 0
+
+    def step(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if remaining:
+            time.sleep(pause)
+
+    src = sqlite3.connect(src_path, timeout=10, isolation_level=None)
+    dst = sqlite3.connect(dest_path)
+    try:
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+        src.backup(dst, pages=pages, progress=step)
+        src.execute("COMMIT")
+    finally:
+        src.close()
+        dst.close()
+    return steps
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stat(path: Path):
+    """Size and mtime of the file and its -wal: unchanged means the content is too."""
+    stat = []
+    for p in (path, Path(f"{path}-wal")):
+        try:
+            st = p.stat()
+            stat += [st.st_size, st.st_mtime_ns]
+        except FileNotFoundError:
+            stat += [0, 0]
+    return stat
+
+
+def _write_snapshot_file(path: Path, target: Path, pages: int, pause: float):
+    copy = target.with_name(target.name + ".tmp")
+    try:
+        t0 = time.perf_counter()
+        steps = copy_database(path, copy, pages, pause)
+        copy_seconds = time.perf_counter() - t0
+        conn = sqlite3.connect(copy)
+        try:
+            user_version = conn.execute("PRAGMA user_version").fetchone()[0]
+        finally:
+            conn.close()
+        raw = hashlib.sha256()
+        partial = target.with_name(target.name + ".part")
+        with open(copy, "rb") as f, gzip.open(partial, "wb", compresslevel=GZIP_LEVEL) as gz:
+            for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                raw.update(chunk)
+                gz.write(chunk)
+        os.replace(partial, target)
+        return {
+            "bytes": copy.stat().st_size,
+            "sha256": raw.hexdigest(),
+            "gz_bytes": target.stat().st_size,
+            "gz_sha256": _sha256(target),
+            "user_version": user_version,
+            "steps": steps,
+            "copy_seconds": round(copy_seconds, 3),
+        }
+    finally:
+        copy.unlink(missing_ok=True)
+
+
+def snapshots(root=None):
+    """Directories of the complete snapshots under root, oldest first."""
+    root = Path(root or backup_dir())
+    return sorted(p.parent for p in root.glob(f"*/{MANIFEST}"))
+
+
+def read_manifest(path: Path) -> dict:
+    return json.loads((Path(path) / MANIFEST).read_text(encoding="utf-8"))
+
+
+def latest(root=None):
+    """Manifest of the newest complete snapshot, or None."""
+    found = snapshots(root)
+    return read_manifest(found[-1]) if found else None
+
+
+def created_at(path: Path) -> float:
+    """Unix time a snapshot was started, from its directory name."""
+    return datetime.strptime(Path(path).name, "%Y%m%dT%H%M%S%fZ").replace(tzinfo=timezone.utc).timestamp()
+
+
+@contextmanager
+def _exclusive(root: Path):
+    """Yields True while this process holds the backup directory's lock, False if another does."""
+    root.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        yield True
+        return
+    with open(root / ".lock", "w") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def take(root=None, pages: int = PAGES, pause: float = PAUSE_SECONDS, keep: int = KEEP, if_older_than=None):
+    """
+    Writes a snapshot of every database into root/<UTC time>/ and deletes all but
+    the newest `keep`. With if_older_than (seconds), does nothing while the newest
+    snapshot is younger than that. Returns the manifest, or None when another
+    process holds the lock or no snapshot was due.
+    """
+    root = Path(root or backup_dir())
+    with _exclusive(root) as locked:
+        if not locked:
+            return None
+        previous = latest(root)
+        if previous and if_older_than is not None and time.time() - previous["created_at"] < if_older_than:
+            return None
+        reusable = {f["name"]: f for f in previous["files"]} if previous else {}
+
+        t0 = time.perf_counter()
+        now = datetime.now(timezone.utc)
+        stamp = f"{now:%Y%m%dT%H%M%S}{now.microsecond // 1000:03d}Z"
+        out = root / stamp
+        out.mkdir()
+        files = []
+        for name, path, kind in database_files():
+            target = out / f"{name}.gz"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            stat = _stat(path)
+            prev = reusable.get(name)
+            if prev and prev["stat"] == stat:
+                _link(root / previous["snapshot"] / f"{name}.gz", target)
+                entry = dict(prev, reused=prev.get("reused") or previous["snapshot"])
+            else:
+                entry = _write_snapshot_file(path, target, pages, pause)
+            files.append(dict(entry, name=name, source=str(path), kind=kind, stat=stat))
+
+        manifest = {
+            "snapshot": stamp,
+            "created_at": now.timestamp(),
+            "seconds": round(time.perf_counter() - t0, 3),
+            "files": files,
+        }
+        partial = out / (MANIFEST + ".part")
+        partial.write_text(json.dumps(manifest, indent=1), encoding="utf-8")
+        os.replace(partial, out / MANIFEST)
+        _prune(root, keep)
+    return manifest
+
+
+def _link(src: Path, dest: Path):
+    try:
+        os.link(src, dest)
+    except OSError:  # no hard links on this filesystem
+        shutil.copyfile(src, dest)
+
+
+def _prune(root: Path, keep: int):
+    """Deletes all but the newest `keep` snapshots, and unfinished ones (only called under the lock)."""
+    complete = snapshots(root)
+    for path in complete[:max(len(complete) - keep, 0)]:
+        shutil.rmtree(path, ignore_errors=True)
+    for path in root.iterdir():
+        if path.is_dir() and not (path / MANIFEST).exists():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def _unpack(snapshot: Path, entry: dict, dest: Path):
+    """Decompresses one snapshot file to dest; returns a list of problems found on the way."""
+    name = entry["name"]
+    gz_path = snapshot / f"{name}.gz"
+    if not gz_path.exists():
+        return [f"{name}: missing"]
+    if _sha256(gz_path) != entry["gz_sha256"]:
+        return [f"{name}: compressed file checksum mismatch"]
+    raw = hashlib.sha256()
+    try:
+        with gzip.open(gz_path, "rb") as gz, open(dest, "wb") as f:
+            for chunk in iter(lambda: gz.read(CHUNK_BYTES), b""):
+                raw.update(chunk)
+                f.write(chunk)
+    except (OSError, EOFError) as e:
+        return [f"{name}: cannot decompress ({e})"]
+    if raw.hexdigest() != entry["sha256"]:
+        return [f"{name}: database checksum mismatch"]
+    conn = sqlite3.connect(dest)
+    try:
+        result = [r[0] for r in conn.execute("PRAGMA integrity_check").fetchall()]
+    finally:
+        conn.close()
+    return [] if result == ["ok"] else [f"{name}: {line}" for line in result]
+
+
+def verify(snapshot):
+    """
+    Checks every file of a snapshot: the .gz and the database against their
+    SHA-256 in the manifest, then PRAGMA integrity_check. Returns a list of
+    problems (empty: the snapshot is good).
+    """
+    snapshot = Path(snapshot)
+    problems = []
+    for entry in read_manifest(snapshot)["files"]:
+        dest = snapshot / f"{entry['name']}.verify"
+        try:
+            problems += _unpack(snapshot, entry, dest)
+        finally:
+            dest.unlink(missing_ok=True)
+    return problems
+
+
+def restore(snapshot, target=None, progress=None):
+    """
+    Verifies a snapshot, then writes each database back with the backup API:
+    over the file it was taken from, or under `target` by its snapshot name.
+    A live file is replaced in one write transaction that running workers simply
+    wait for, and they read the restored content on their next query. Ledger
+    files are migrated to the current schema and their ledger versions moved past
+    anything served before, so no cached page or ETag is reused for other content.
+    Returns the restored paths; raises ValueError (nothing written) if verification fails.
+    """
+    snapshot = Path(snapshot)
+    problems = verify(snapshot)
+    if problems:
+        raise ValueError("; ".join(problems))
+
+    restored = []
+    for entry in read_manifest(snapshot)["files"]:
+        dest = Path(target) / entry["name"] if target else Path(entry["source"])
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        unpacked = snapshot / f"{entry['name']}.restore"
+        try:
+            _unpack(snapshot, entry, unpacked)
+            served = _ledger_versions(dest) if entry["kind"] == "ledger" else {}
+            src = sqlite3.connect(unpacked)
+            live = sqlite3.connect(dest, timeout=30)
+            try:
+                live.execute("PRAGMA busy_timeout=30000")
+                src.backup(live)
+                if entry["kind"] == "ledger":
+                    db._init_schema(live)
+                    with live:
+                        live.executemany("""
+                            UPDATE ledger_versions SET version = MAX(version, ?) + 1,
+                                                       updated_at = CAST(strftime('%s', 'now') AS INTEGER)
+                            WHERE user_id = ?
+                        """, [(version, user_id) for user_id, version in served.items()])
+            finally:
+                src.close()
+                live.close()
+        finally:
+            unpacked.unlink(missing_ok=True)
+        restored.append(dest)
+        if progress:
+            progress(entry["name"], dest)
+    return restored
+
+
+def _ledger_versions(path: Path):
+    """user_id -> ledger version currently in the file at path ({} if there is none)."""
+    if not path.exists():
+        return {}
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        return dict(conn.execute("SELECT user_id, version FROM ledger_versions").fetchall())
+    except sqlite3.OperationalError:  # no such table: not a wallet database (yet)
+        return {}
+    finally:
+        conn.close()
+
+
+def _newest_created_at():
+    found = snapshots()
+    return created_at(found[-1]) if found else 0
+
+
+metrics.register(metrics.Gauge(
+    "srn_backup_last_snapshot_timestamp_seconds", "Unix time of the newest complete snapshot.",
+    _newest_created_at,
+))
+
+
+class BackupScheduler(ProcessThread):
+    """One background thread per process taking a snapshot every INTERVAL_SECONDS."""
+
+    thread_name = "srn-backup"
+
+    def ensure_started(self):
+        if INTERVAL_SECONDS:
+            self._ensure_thread()
+
+    def _run(self):
+        while True:
+            try:
+                due_in = _newest_created_at() + INTERVAL_SECONDS - time.time()
+                if due_in > 0:
+                    time.sleep(due_in)
+                    continue
+                # None: another worker holds the lock (or just finished one); look again later.
+                if take(if_older_than=INTERVAL_SECONDS) is None:
+                    time.sleep(60)
+            except (OSError, sqlite3.Error, ValueError):
+                FAILURES.inc()
+                time.sleep(60)
+
+
+scheduler = BackupScheduler()
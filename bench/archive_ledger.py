@@ -0,0 +1,126 @@
+# bench/archive_ledger.py — Hot database size and route latency before and after archiving.
+#
+# Seeds --rows transactions over --years years, measures the hot file and a few
+# routes, then runs `archive-ledger --through <last year> --vacuum` (all closed
+# years move to per-year files) and measures again:
+#   /                       balances only
+#   /transactions           first page (hot rows)
+#   /transactions (old)     a page two years back (attaches that year's archive)
+#   /reports                current month from the rollup
+#   export                  the whole ledger as CSV (merges every archive in)
+# Then deletes and purges an envelope that has archived rows, and asserts that its
+# archived rows are gone: reports over the archived years, a full rollup rebuild,
+# another archive-ledger run and verify-balances all come out clean.
+# Runs against a throwaway database.
+# Usage: python bench/archive_ledger.py [--rows 300000] [--years 5] [--repeat 30]
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300_000)
+    ap.add_argument("--years", type=float, default=5)
+    ap.add_argument("--repeat", type=int, default=30, help="requests per route")
+    return ap.parse_args()
+
+
+args = _parse_args()
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+import category_purge  # noqa: E402
+import db  # noqa: E402
+import seed  # noqa: E402
+
+OLD_PAGE = f"/transactions?cursor={date.today().year - 2}-06-30:999999999"
+ROUTES = ["/", "/transactions", OLD_PAGE, "/reports"]
+
+
+def _file_mib(path):
+    return sum(p.stat().st_size for p in Path(path).parent.glob(Path(path).name + "*")) / 2**20
+
+
+def measure(label):
+    client = wallet.app.test_client()
+    for route in ROUTES:
+        assert client.get(route).status_code == 200
+    cells = []
+    for route in ROUTES:
+        times = []
+        for _ in range(args.repeat):
+            t0 = time.perf_counter()
+            client.get(route)
+            times.append(time.perf_counter() - t0)
+        cells.append(statistics.median(times) * 1000)
+    t0 = time.perf_counter()
+    size = len(client.get("/export/transactions.csv").data)
+    export_s = time.perf_counter() - t0
+    print(f"{label:>8}  {_file_mib(db.DB_PATH):>8.1f}  " + "  ".join(f"{c:>9.2f}" for c in cells)
+          + f"  {export_s:>9.2f}  ({size / 2**20:.1f} MiB)")
+
+
+def check_purge(conn, uid, through):
+    client = wallet.app.test_client()
+    runner = wallet.app.test_cli_runner()
+    category_id = conn.execute(
+        "SELECT category_id FROM opening_balances WHERE user_id=? LIMIT 1", (uid,)
+    ).fetchone()["category_id"]
+    before = conn.execute("SELECT SUM(rows) FROM ledger_archives").fetchone()[0]
+    assert client.post(f"/category/{category_id}/delete").status_code == 302
+    t0 = time.perf_counter()
+    category_purge.purge_pending(conn, pause=0)
+    purge_s = time.perf_counter() - t0
+    after = conn.execute("SELECT SUM(rows) FROM ledger_archives").fetchone()[0]
+
+    report = client.get(f"/api/reports?from=1900-01-01&to={through}-12-31&by=category").get_json()
+    assert category_id not in {c["category_id"] for c in report["by_category"]}, report
+    for command in (["backfill-daily-totals", "--rebuild"],
+                    ["archive-ledger", "--through", str(through), "--pause-ms", "0"],
+                    ["verify-balances"]):
+        result = runner.invoke(args=command)
+        assert result.exit_code == 0, (command, result.output, result.exception)
+    print(f"purged envelope {category_id}: {before - after:,} archived rows removed in {purge_s:.1f}s; "
+          f"reports, rollup rebuild, archive-ledger and verify-balances clean")
+
+
+def main():
+    wallet.app.test_client().get("/")
+    conn = db.get_conn()
+    uid = conn.execute("SELECT id FROM users").fetchone()["id"]
+    seed.generate(conn, uid, transactions=args.rows, categories=30, years=args.years, seed=11)
+    # Compare like with like: archive-ledger --vacuum compacts the other side too.
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    print(f"{args.rows:,} rows over {args.years:g} years; median of {args.repeat} requests")
+    print(f"{'':>8}  {'hot MiB':>8}  {'/ ms':>9}  {'/tx ms':>9}  {'old tx ms':>9}  {'reports':>9}  {'export s':>9}")
+    measure("before")
+
+    through = date.today().year - 1
+    t0 = time.perf_counter()
+    result = wallet.app.test_cli_runner().invoke(
+        args=["archive-ledger", "--through", str(through), "--pause-ms", "0", "--vacuum"]
+    )
+    assert result.exit_code == 0, result.output
+    print(f"archive-ledger --through {through}: {time.perf_counter() - t0:.1f}s, "
+          f"{conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]:,} rows left hot")
+    measure("after")
+    check_purge(conn, uid, through)
+    db.close_pooled_conns()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+# bench/backup.py — Snapshot duration and save_tx latency during an online backup.
+#
+# Seeds --rows transactions, then keeps a writer thread posting deposits through
+# the real save_tx route while a snapshot is taken, three ways:
+#   idle      no backup running (baseline for the writer, same duration as "stepped")
+#   stepped   backup.take(): --pages pages per step, --pause-ms between steps
+#   one-step  backup.take(pages=-1): the whole file in a single backup step
+# Reports the snapshot time (and the part of it spent in the backup API copy, the
+# rest is gzip), the compressed size, and the writer's p50/p99/max meanwhile;
+# then how long `backup-verify` and a restore into a scratch directory take.
+# Runs against throwaway databases.
+# Usage: python bench/backup.py [--rows 2000000] [--pages 256] [--pause-ms 5]
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=2_000_000)
+    ap.add_argument("--pages", type=int, default=256, help="SRN_BACKUP_PAGES")
+    ap.add_argument("--pause-ms", type=float, default=5, help="SRN_BACKUP_PAUSE_MS")
+    return ap.parse_args()
+
+
+args = _parse_args()
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+import backup  # noqa: E402
+import db  # noqa: E402
+import seed  # noqa: E402
+
+BACKUP_DIR = Path(_tmpdir) / "backups"
+
+
+def with_writer(action):
+    """Runs action() while a thread keeps posting deposits; returns (result, seconds, latencies)."""
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        client = wallet.app.test_client()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            resp = client.post("/category/1/save", data={"tx_type": "deposit", "amount": "1.00", "currency": "USD"})
+            assert resp.status_code == 302
+            latencies.append(time.perf_counter() - t0)
+        db.close_pooled_conns()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.5)
+    del latencies[:]
+    t0 = time.perf_counter()
+    result = action()
+    seconds = time.perf_counter() - t0
+    stop.set()
+    thread.join()
+    return result, seconds, sorted(latencies)
+
+
+def main():
+    wallet.app.test_client().get("/")
+    conn = db.get_conn()
+    t0 = time.perf_counter()
+    seed.generate(conn, 1, transactions=args.rows, categories=30, years=5, seed=5)
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    size = Path(db.DB_PATH).stat().st_size
+    print(f"{args.rows:,} rows, {size / 2**20:.0f} MiB database (seeded in {time.perf_counter() - t0:.0f}s); "
+          f"steps of {args.pages} pages, {args.pause_ms:g} ms pause")
+    print(f"{'mode':>9}  {'backup s':>8}  {'copy s':>7}  {'gz MiB':>7}  {'writes':>6}  "
+          f"{'p50 ms':>7}  {'p99 ms':>7}  {'max ms':>7}")
+
+    stepped_s = None
+    modes = [
+        ("stepped", lambda: backup.take(BACKUP_DIR, args.pages, args.pause_ms / 1000)),
+        ("idle", lambda: time.sleep(stepped_s)),
+        ("one-step", lambda: backup.take(BACKUP_DIR, -1, 0)),
+    ]
+    for label, action in modes:
+        manifest, seconds, lat = with_writer(action)
+        if label == "stepped":
+            stepped_s = seconds
+        if manifest:
+            gz = f"{sum(f['gz_bytes'] for f in manifest['files']) / 2**20:>7.1f}"
+            took = f"{seconds:>8.2f}  {sum(f['copy_seconds'] for f in manifest['files']):>7.2f}"
+        else:
+            gz, took = f"{'-':>7}", f"{'-':>8}  {'-':>7}"
+        p99 = statistics.quantiles(lat, n=100, method="inclusive")[98] if len(lat) > 1 else lat[-1]
+        print(f"{label:>9}  {took}  {gz}  {len(lat):>6}  {statistics.median(lat) * 1000:>7.2f}  "
+              f"{p99 * 1000:>7.2f}  {lat[-1] * 1000:>7.2f}")
+
+    newest = backup.snapshots(BACKUP_DIR)[-1]
+    t0 = time.perf_counter()
+    assert backup.verify(newest) == []
+    verify_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    backup.restore(newest, target=Path(_tmpdir) / "restored")
+    print(f"backup-verify {verify_s:.2f}s, restore into a scratch directory {time.perf_counter() - t0:.2f}s")
+    db.close_pooled_conns()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
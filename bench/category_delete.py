@@ -0,0 +1,115 @@
+# bench/category_delete.py — save_tx latency while a large envelope is being deleted.
+#
+# One envelope gets --rows transactions; a writer thread keeps posting deposits to
+# another envelope through the real save_tx route while the big one is deleted:
+#   cascade   the old delete: one DELETE FROM categories, ON DELETE CASCADE in a
+#             single write transaction
+#   soft      POST /category/<id>/delete (soft delete) plus the background purger
+# Reports the delete request's own time, how long until the rows were gone, and the
+# writer's p50/p99/max latency meanwhile. Runs against throwaway databases.
+# Usage: python bench/category_delete.py [--rows 300000] [--batch 500] [--pause-ms 50]
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=300_000, help="transactions in the deleted envelope")
+    ap.add_argument("--batch", type=int, default=500, help="SRN_PURGE_BATCH")
+    ap.add_argument("--pause-ms", type=float, default=50, help="SRN_PURGE_PAUSE_MS")
+    return ap.parse_args()
+
+
+args = _parse_args()
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+os.environ["SRN_PURGE_BATCH"] = str(args.batch)
+os.environ["SRN_PURGE_PAUSE_MS"] = str(args.pause_ms)
+
+import app as wallet  # noqa: E402
+import category_purge  # noqa: E402
+import db  # noqa: E402
+import seed  # noqa: E402
+
+
+def _prepare():
+    """Fills the user's first envelope with args.rows transactions; returns (its id, another envelope's id)."""
+    wallet.app.test_client().get("/")
+    conn = db.get_conn()
+    uid = conn.execute("SELECT id FROM users").fetchone()["id"]
+    big, other = [r["id"] for r in conn.execute(
+        "SELECT id FROM categories WHERE user_id=? AND deleted_at IS NULL ORDER BY is_default DESC, id LIMIT 2", (uid,)
+    )]
+    seed.generate(conn, uid, transactions=args.rows, categories=1, years=3, seed=7)  # fills `big`
+    return big, other
+
+
+def run(mode):
+    big, other = _prepare()
+    latencies = []
+    stop = threading.Event()
+
+    def writer():
+        client = wallet.app.test_client()
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            resp = client.post(f"/category/{other}/save", data={
+                "tx_type": "deposit", "amount": "1.00", "currency": "USD",
+            })
+            assert resp.status_code == 302
+            latencies.append(time.perf_counter() - t0)
+        db.close_pooled_conns()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    time.sleep(0.5)
+    del latencies[:]
+
+    t0 = time.perf_counter()
+    if mode == "cascade":
+        with db.get_conn() as conn:
+            conn.execute("DELETE FROM balances WHERE category_id=?", (big,))
+            conn.execute("DELETE FROM categories WHERE id=?", (big,))
+        request_s = time.perf_counter() - t0
+    else:
+        assert wallet.app.test_client().post(f"/category/{big}/delete").status_code == 302
+        request_s = time.perf_counter() - t0
+        while category_purge.pending_categories(db.get_conn()):
+            time.sleep(0.01)
+    gone_s = time.perf_counter() - t0
+
+    stop.set()
+    thread.join()
+    with db.get_conn() as conn:
+        assert not conn.execute("SELECT 1 FROM transactions WHERE category_id=?", (big,)).fetchone()
+    lat = sorted(latencies)
+    # Inclusive quantiles stay within the samples (the cascade run only gets a few writes in).
+    p99 = statistics.quantiles(lat, n=100, method="inclusive")[98] if len(lat) > 1 else lat[-1]
+    return request_s, gone_s, len(lat), statistics.median(lat), p99, lat[-1]
+
+
+def main():
+    print(f"{args.rows:,} rows; purge batch {args.batch}, pause {args.pause_ms:g} ms")
+    print(f"{'mode':>8}  {'delete req ms':>13}  {'rows gone ms':>12}  {'writes':>6}  "
+          f"{'p50 ms':>7}  {'p99 ms':>7}  {'max ms':>7}")
+    for mode in ("cascade", "soft"):
+        request_s, gone_s, n, p50, p99, worst = run(mode)
+        print(f"{mode:>8}  {request_s * 1000:>13.1f}  {gone_s * 1000:>12.1f}  {n:>6}  "
+              f"{p50 * 1000:>7.2f}  {p99 * 1000:>7.2f}  {worst * 1000:>7.2f}")
+    db.close_pooled_conns()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
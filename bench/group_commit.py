@@ -0,0 +1,91 @@
+# bench/group_commit.py — save_tx inserts/sec with group commit off and on.
+#
+# N request threads (like a threaded gunicorn worker) post deposits through the real
+# save_tx route; with group commit on, one writer thread commits them in batches.
+# PRAGMA synchronous decides what a commit costs: FULL syncs the WAL on every commit,
+# which is where batching pays off most. Runs against a throwaway database; use
+# --dir to put it on the disk you deploy to (tmpfs makes syncs free).
+# Usage: python bench/group_commit.py [--threads 1,8,32] [--writes 200] [--synchronous FULL] [--dir PATH]
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def _parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", default="1,8,32", help="comma-separated concurrent request threads")
+    ap.add_argument("--writes", type=int, default=200, help="deposits per thread")
+    ap.add_argument("--synchronous", default="FULL", help="PRAGMA synchronous for the run")
+    ap.add_argument("--dir", help="directory for the scratch database")
+    return ap.parse_args()
+
+
+args = _parse_args()
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_", dir=args.dir)
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+os.environ["SRN_DB_SYNCHRONOUS"] = args.synchronous
+
+import app as wallet  # noqa: E402
+import db  # noqa: E402
+import group_commit  # noqa: E402
+
+
+def run(threads, writes):
+    def worker():
+        client = wallet.app.test_client()
+        for i in range(writes):
+            resp = client.post("/category/1/save", data={
+                "tx_type": "deposit", "amount": f"{i % 50 + 1}.10", "currency": "USD",
+            })
+            assert resp.status_code == 302
+        db.close_pooled_conns()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return threads * writes / (time.perf_counter() - t0)
+
+
+def main():
+    wallet.app.test_client().get("/")  # creates the single user + default categories
+
+    print(f"synchronous={args.synchronous}, db in {_tmpdir}")
+    print(f"{'threads':>7}  {'off ins/s':>10}  {'on ins/s':>10}  {'speedup':>8}  {'mean batch':>10}")
+    for threads in (int(t) for t in args.threads.split(",")):
+        group_commit.ENABLED = False
+        off = run(threads, args.writes)
+
+        group_commit.ENABLED = True
+        before = group_commit.BATCH_SIZE.render()
+        on = run(threads, args.writes)
+        batches = _count(group_commit.BATCH_SIZE.render()) - _count(before)
+        print(f"{threads:>7}  {off:>10,.0f}  {on:>10,.0f}  {on / off:>7.2f}x  "
+              f"{threads * args.writes / max(batches, 1):>10.1f}")
+
+    with db.get_conn() as conn:
+        assert not db.balance_drift(conn), "balances drifted"
+    db.close_pooled_conns()
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+def _count(lines):
+    for line in lines:
+        if line.startswith(f"{group_commit.BATCH_SIZE.name}_count"):
+            return int(line.rsplit(" ", 1)[1])
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# bench/home_latency.py — Home page latency vs. number of categories.
+#
+# "GET / ms" is a full render, as after a write: the ledger version is bumped
+# before every request, so the fragment cache and ETag never answer it.
+# "cached ms" is the same page with the envelope list served from fragment_cache.
+# Runs against a throwaway database, so your real srn_wallet.sqlite3 is untouched.
+# Usage: python bench/home_latency.py [--tx-per-category 20] [--runs 20]
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+from db import bump_ledger_version, get_conn, rebuild_balances  # noqa: E402
+
+STEPS = [10, 100, 250, 500, 1000]
+
+
+def legacy_home_balances(conn, uid):
+    """The old N+1 shape: one balance query per category plus a global one."""
+    cats = conn.execute("SELECT id FROM categories WHERE user_id=?", (uid,)).fetchall()
+    for c in cats:
+        conn.execute("""
+            SELECT currency,
+                   SUM(CASE WHEN type='deposit' THEN amount_cents ELSE -amount_cents END) AS bal
+            FROM transactions
+            WHERE category_id=? AND user_id=?
+            GROUP BY currency
+        """, (c["id"], uid)).fetchall()
+    conn.execute("""
+        SELECT currency,
+               SUM(CASE WHEN type='deposit' THEN amount_cents ELSE -amount_cents END) AS bal
+        FROM transactions
+        WHERE user_id=?
+        GROUP BY currency
+    """, (uid,)).fetchall()
+
+
+def grow_to(uid, n_categories, tx_per_category):
+    with get_conn() as conn:
+        have = conn.execute("SELECT COUNT(*) FROM categories WHERE user_id=?", (uid,)).fetchone()[0]
+        for i in range(have, n_categories):
+            cur = conn.execute(
+                "INSERT INTO categories(user_id, name, is_default) VALUES (?, ?, 0)",
+                (uid, f"Bench {i:05d}")
+            )
+            cid = cur.lastrowid
+            conn.executemany("""
+                INSERT INTO transactions(user_id, category_id, type, amount_cents, currency, tx_date)
+                VALUES (?, ?, 'deposit', ?, ?, '2024-01-01')
+            """, [(uid, cid, 100 * (j + 1), wallet.CURRENCIES[j % len(wallet.CURRENCIES)])
+                  for j in range(tx_per_category)])
+        rebuild_balances(conn)
+
+
+def timed(fn, runs, before=None):
+    samples = []
+    for _ in range(runs):
+        if before is not None:
+            before()
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tx-per-category", type=int, default=20)
+    ap.add_argument("--runs", type=int, default=20)
+    args = ap.parse_args()
+
+    client = wallet.app.test_client()
+    client.get("/")  # creates the single user + default categories
+    uid = wallet.ensure_single_user()
+
+    def home():
+        assert client.get("/").status_code == 200
+
+    def ledger_changed():
+        with get_conn() as conn:
+            bump_ledger_version(conn, uid)
+
+    print(f"{'categories':>10}  {'GET / ms':>10}  {'cached ms':>10}  {'batched ms':>10}  {'N+1 ms':>10}")
+    for n in STEPS:
+        grow_to(uid, n, args.tx_per_category)
+        render = timed(home, args.runs, before=ledger_changed)
+        cached = timed(home, args.runs)
+
+        with get_conn() as conn:
+            batched = timed(lambda: wallet.balance_sheet(conn, uid), args.runs)
+            legacy = timed(lambda: legacy_home_balances(conn, uid), args.runs)
+        print(f"{n:>10}  {render:>10.2f}  {cached:>10.2f}  {batched:>10.2f}  {legacy:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench/import_export.py — Bulk import and streaming export throughput.
+#
+# Generates a CSV ledger, imports it with ledger_io (same path as
+# `flask import-transactions`), then streams it back out as CSV and JSONL.
+# Runs against a throwaway database, so your real srn_wallet.sqlite3 is untouched.
+# Usage: python bench/import_export.py [--rows 1000000] [--categories 50]
+
+import argparse
+import csv
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import nullcontext
+from datetime import date, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+import ledger_io  # noqa: E402
+from db import get_conn, balance_drift, deferred_indexes  # noqa: E402
+
+
+def write_csv(path, rows, categories):
+    rnd = random.Random(42)
+    start = date(2015, 1, 1)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["tx_date", "type", "amount", "currency", "category", "note"])
+        for i in range(rows):
+            w.writerow([
+                (start + timedelta(days=rnd.randrange(3650))).isoformat(),
+                "deposit" if rnd.random() < 0.6 else "withdraw",
+                f"{rnd.uniform(1, 500):.2f}",
+                rnd.choice(wallet.CURRENCIES),
+                f"Envelope {rnd.randrange(categories)}",
+                "" if i % 5 else "receipt",
+            ])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--categories", type=int, default=50)
+    ap.add_argument("--keep-indexes", action="store_true",
+                    help="Maintain indexes row by row instead of rebuilding them after the load.")
+    args = ap.parse_args()
+
+    uid = wallet.ensure_single_user()
+    src = os.path.join(_tmpdir, "ledger.csv")
+    write_csv(src, args.rows, args.categories)
+
+    t0 = time.perf_counter()
+    with open(src, encoding="utf-8", newline="") as stream, get_conn() as conn:
+        with deferred_indexes(conn, "transactions") if not args.keep_indexes else nullcontext():
+            summary = ledger_io.import_transactions(
+                conn, uid, ledger_io.read_records(stream, "csv"), wallet.validate_tx_fields
+            )
+    t_import = time.perf_counter() - t0
+    print(f"import: {summary['imported']} rows in {t_import:.1f}s "
+          f"({summary['imported'] / t_import:,.0f} rows/s, {summary['skipped']} skipped)")
+
+    with get_conn() as conn:
+        assert not balance_drift(conn), "balances drifted during import"
+
+        for fmt, writer in (("csv", ledger_io.export_csv), ("jsonl", ledger_io.export_jsonl)):
+            t0 = time.perf_counter()
+            size = sum(len(chunk) for chunk in writer(conn, uid))
+            elapsed = time.perf_counter() - t0
+            print(f"export {fmt}: {size / 1e6:.0f} MB in {elapsed:.1f}s ({args.rows / elapsed:,.0f} rows/s)")
+
+    rss_mib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS: {rss_mib:.0f} MiB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# bench/pool_throughput.py — Requests/sec with and without the per-thread connection pool.
+#
+# Runs against a throwaway database, so your real srn_wallet.sqlite3 is untouched.
+# Usage: python bench/pool_throughput.py [--requests 2000] [--threads 4] [--path /]
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+import db  # noqa: E402
+
+
+def run(path, total, threads):
+    per_thread = total // threads
+
+    def worker():
+        client = wallet.app.test_client()
+        for _ in range(per_thread):
+            assert client.get(path).status_code == 200
+        db.close_pooled_conns()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    t0 = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return per_thread * threads / (time.perf_counter() - t0)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--path", default="/")
+    args = ap.parse_args()
+
+    client = wallet.app.test_client()
+    client.get("/")  # creates the single user + default categories
+    for i in range(50):
+        client.post("/category/1/save", data={"tx_type": "deposit", "amount": str(i + 1), "currency": "USD"})
+
+    print(f"{'mode':>10}  {'threads':>7}  {'req/s':>10}")
+    for pooled in (False, True):
+        db.POOL_CONNECTIONS = pooled
+        for threads in sorted({1, args.threads}):
+            rps = run(args.path, args.requests, threads)
+            print(f"{'pool' if pooled else 'no pool':>10}  {threads:>7}  {rps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
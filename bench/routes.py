@@ -0,0 +1,164 @@
+# bench/routes.py — Latency/throughput harness over the real Flask routes.
+#
+# Seeds a throwaway database with seed.py's synthetic ledger (or copies --db),
+# then drives home, deposit/withdraw forms, save_tx, transactions and reports
+# round-robin through the test client, like a user clicking around. Prints
+# p50/p95/p99 per route and writes the results as JSON (bench/results/ by
+# default) so runs can be compared; --compare OLD.json prints the p95 change.
+# Usage: python bench/routes.py [--transactions 100000] [--categories 30] [--requests 200]
+#                               [--db PATH] [--out FILE] [--compare OLD.json]
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+_tmpdir = tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+
+def _parse_args():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--transactions", type=int, default=100000)
+    ap.add_argument("--categories", type=int, default=30)
+    ap.add_argument("--requests", type=int, default=200, help="requests per route")
+    ap.add_argument("--warmup", type=int, default=5, help="unmeasured rounds first")
+    ap.add_argument("--db", help="benchmark a copy of this database instead of generating one")
+    ap.add_argument("--out", help="results file (default bench/results/routes-<utc time>.json)")
+    ap.add_argument("--compare", help="earlier results file to diff against")
+    return ap.parse_args()
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def _scenario(conn, uid):
+    """Returns [(name, method, path factory, form factory, expected status)]."""
+    cats = [r["category_id"] for r in conn.execute(
+        "SELECT DISTINCT category_id FROM balances WHERE user_id=? AND currency='USD' AND amount_cents > 100",
+        (uid,)
+    )]
+    if not cats:
+        cats = [r["id"] for r in conn.execute("SELECT id FROM categories WHERE user_id=?", (uid,))]
+    pick = lambda i: cats[i % len(cats)]  # noqa: E731
+
+    return [
+        ("home", "GET", lambda i: "/", None, 200),
+        ("deposit_form", "GET", lambda i: f"/category/{pick(i)}/deposit", None, 200),
+        ("withdraw_form", "GET", lambda i: f"/category/{pick(i)}/withdraw", None, 200),
+        ("save_tx", "POST", lambda i: f"/category/{pick(i)}/save",
+         lambda i: {"tx_type": "withdraw" if i % 2 else "deposit", "amount": "1.00", "currency": "USD",
+                    "idempotency_key": uuid.uuid4().hex}, 302),
+        ("transactions", "GET", lambda i: "/transactions", None, 200),
+        ("transactions_filtered", "GET", lambda i: f"/transactions?category={pick(i)}&currency=USD", None, 200),
+        ("reports", "GET", lambda i: "/reports", None, 200),
+        ("reports_by_category", "GET", lambda i: "/api/reports?by=category&period=month", None, 200),
+    ]
+
+
+def run(client, scenario, rounds, record):
+    timings = {name: [] for name, *_ in scenario}
+    t_start = time.perf_counter()
+    for i in range(rounds):
+        for name, method, path, form, expected in scenario:
+            t0 = time.perf_counter()
+            resp = client.open(path(i), method=method, data=form(i) if form else None)
+            resp.get_data()
+            elapsed = time.perf_counter() - t0
+            assert resp.status_code == expected, f"{name}: HTTP {resp.status_code}"
+            if record:
+                timings[name].append(elapsed)
+    return timings, time.perf_counter() - t_start
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = _parse_args()
+    if args.db:
+        shutil.copyfile(args.db, os.environ["SRN_DB_PATH"])
+
+    import app as wallet
+    import seed
+    from db import get_conn
+
+    uid = wallet.ensure_single_user()
+    conn = get_conn()
+    dataset = {"source": args.db} if args.db else seed.generate(conn, uid, args.transactions, args.categories)
+    dataset["rows"] = conn.execute("SELECT COUNT(*) FROM transactions WHERE user_id=?", (uid,)).fetchone()[0]
+
+    scenario = _scenario(conn, uid)
+    client = wallet.app.test_client()
+    run(client, scenario, args.warmup, record=False)
+    timings, wall = run(client, scenario, args.requests, record=True)
+
+    routes = {}
+    print(f"{'route':<24}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    for name, values in timings.items():
+        values.sort()
+        routes[name] = {
+            "count": len(values),
+            "p50_ms": round(percentile(values, 50) * 1000, 3),
+            "p95_ms": round(percentile(values, 95) * 1000, 3),
+            "p99_ms": round(percentile(values, 99) * 1000, 3),
+            "mean_ms": round(sum(values) / len(values) * 1000, 3),
+            "rps": round(len(values) / sum(values), 1),
+        }
+        r = routes[name]
+        print(f"{name:<24}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['rps']:>9.1f}")
+    total = sum(len(v) for v in timings.values())
+    print(f"overall: {total} requests in {wall:.1f}s ({total / wall:,.0f} req/s)")
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "dataset": dataset,
+        "requests_per_route": args.requests,
+        "throughput_rps": round(total / wall, 1),
+        "routes": routes,
+    }
+    out = Path(args.out) if args.out else (
+        ROOT / "bench" / "results" / f"routes-{datetime.now(timezone.utc):%Y%m%dT%H%M%SZ}.json")
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"results: {out}")
+
+    if args.compare:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        print(f"\np95 vs {args.compare} ({old.get('git_commit')}):")
+        for name, r in routes.items():
+            before = old.get("routes", {}).get(name)
+            if before and before["p95_ms"]:
+                change = (r["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+                print(f"{name:<24}{before['p95_ms']:>9.2f} -> {r['p95_ms']:>9.2f} ms  ({change:+.0f}%)")
+
+    shutil.rmtree(_tmpdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# bench/shard_writes.py — Write throughput vs concurrent users: one database vs per-user shards.
+#
+# Each process is a different user (SRN_MULTI_USER with the proxy header) posting
+# deposits through the real save_tx route. With one database every commit queues on
+# the same SQLite write lock; with SRN_SHARD_DIR each user has their own file and lock.
+# Each user posts to their own default envelope, and the run asserts afterwards that
+# every user's ledger holds exactly the rows they posted.
+# Runs against throwaway databases.
+# Usage: python bench/shard_writes.py [--users 1,2,4,8] [--writes 500] [--synchronous NORMAL]
+
+import argparse
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def worker(args):
+    email, writes, start_at = args
+    import app as wallet  # imported here so the spawned process sees the mode's environment
+
+    client = wallet.app.test_client()
+    headers = {wallet.USER_HEADER: email}
+    assert client.get("/", headers=headers).status_code == 200  # creates the user (and shard)
+    uid = wallet.ensure_user(email)
+    conn = wallet.get_conn(uid)
+    category_id = conn.execute(
+        "SELECT id FROM categories WHERE user_id=? AND deleted_at IS NULL ORDER BY is_default DESC, id LIMIT 1",
+        (uid,)
+    ).fetchone()["id"]
+    while time.time() < start_at:
+        time.sleep(0.001)
+
+    t0 = time.perf_counter()
+    for i in range(writes):
+        resp = client.post(f"/category/{category_id}/save", headers=headers, data={
+            "tx_type": "deposit", "amount": f"{i % 50 + 1}.25", "currency": "USD",
+        })
+        assert resp.status_code == 302
+    elapsed = time.perf_counter() - t0
+
+    stored = conn.execute("SELECT COUNT(*) FROM transactions WHERE user_id=?", (uid,)).fetchone()[0]
+    assert stored == writes, f"{email}: {stored} rows stored, {writes} posted"
+    return elapsed
+
+
+def run(mode, users, writes, synchronous):
+    tmp = tempfile.mkdtemp(prefix="srn_bench_")
+    os.environ.update({
+        "SRN_MULTI_USER": "1",
+        "SRN_DB_PATH": os.path.join(tmp, "directory.sqlite3"),
+        "SRN_DB_SYNCHRONOUS": synchronous,
+    })
+    if mode == "sharded":
+        os.environ["SRN_SHARD_DIR"] = os.path.join(tmp, "shards")
+    else:
+        os.environ.pop("SRN_SHARD_DIR", None)
+
+    # Create the directory schema once, before workers race to do it.
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        pool.map(worker, [("warmup@bench", 1, 0)])
+
+    start_at = time.time() + 2.0
+    jobs = [(f"user{n}@bench", writes, start_at) for n in range(users)]
+    with ctx.Pool(users) as pool:
+        elapsed = pool.map(worker, jobs)
+    shutil.rmtree(tmp, ignore_errors=True)
+    return users * writes / max(elapsed)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--users", default="1,2,4,8", help="comma-separated concurrent user counts")
+    ap.add_argument("--writes", type=int, default=500, help="deposits per user")
+    ap.add_argument("--synchronous", default="NORMAL", help="PRAGMA synchronous (FULL = fsync every commit)")
+    args = ap.parse_args()
+
+    print(f"{'users':>5}  {'single db w/s':>14}  {'sharded w/s':>12}  {'speedup':>8}")
+    for users in (int(u) for u in args.users.split(",")):
+        single = run("single", users, args.writes, args.synchronous)
+        sharded = run("sharded", users, args.writes, args.synchronous)
+        print(f"{users:>5}  {single:>14,.0f}  {sharded:>12,.0f}  {sharded / single:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# bench/startup_footprint.py — Worker cold start time and RSS, with and without eager matplotlib.
+#
+# Each measurement runs in a fresh interpreter (like a new gunicorn worker):
+# import app, serve GET /reports once, then report timings and peak RSS.
+# "eager matplotlib" reproduces the old module-level `import matplotlib.pyplot`.
+# Usage: python bench/startup_footprint.py [--runs 3]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+CHILD = r"""
+import json, resource, sys, time
+t0 = time.perf_counter()
+if EAGER:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot  # noqa: F401
+sys.path.insert(0, ROOT)
+import app as wallet
+t_import = time.perf_counter() - t0
+client = wallet.app.test_client()
+assert client.get("/reports").status_code == 200
+t_first = time.perf_counter() - t0
+rss_kib = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"import_ms": t_import * 1000, "first_response_ms": t_first * 1000, "rss_mib": rss_kib / 1024}))
+"""
+
+
+def measure(eager: bool, db_path: str):
+    code = f"EAGER = {eager!r}\nROOT = {str(ROOT)!r}\n" + CHILD
+    env = dict(os.environ, SRN_DB_PATH=db_path)
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=3)
+    args = ap.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix="srn_bench_"), "bench.sqlite3")
+    measure(False, db_path)  # create the schema once so every run starts equal
+
+    print(f"{'mode':>18}  {'import ms':>10}  {'first resp ms':>13}  {'RSS MiB':>8}")
+    for eager in (True, False):
+        runs = [measure(eager, db_path) for _ in range(args.runs)]
+        label = "eager matplotlib" if eager else "lazy (current)"
+        print(
+            f"{label:>18}  "
+            f"{statistics.median(r['import_ms'] for r in runs):>10.1f}  "
+            f"{statistics.median(r['first_response_ms'] for r in runs):>13.1f}  "
+            f"{statistics.median(r['rss_mib'] for r in runs):>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# bench/withdraw_race.py — Multi-process withdraw stress check.
+#
+# Several processes (like gunicorn workers) hammer POST /category/<id>/save on one
+# envelope with withdrawals, some deposits and deliberate duplicate submits that
+# reuse an idempotency key. Afterwards it asserts the envelope never went negative
+# (replaying the ledger in commit order), balances match the ledger and no key was
+# stored twice. Runs against a throwaway database.
+# Usage: python bench/withdraw_race.py [--workers 8] [--requests 300]
+
+import argparse
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# Spawned workers re-run this module top: share one scratch directory through the environment.
+_tmpdir = os.environ.get("SRN_BENCH_TMP") or tempfile.mkdtemp(prefix="srn_bench_")
+os.environ["SRN_BENCH_TMP"] = _tmpdir
+os.environ["SRN_DB_PATH"] = os.path.join(_tmpdir, "bench.sqlite3")
+
+import app as wallet  # noqa: E402
+from db import get_conn, balance_drift  # noqa: E402
+
+START_CENTS = 100_00
+
+
+def worker(args):
+    seed, category_id, requests, start_at = args
+    rnd = random.Random(seed)
+    client = wallet.app.test_client()
+    while time.time() < start_at:  # line every worker up on the same instant
+        time.sleep(0.001)
+
+    statuses = {}
+    last_key = None
+    for _ in range(requests):
+        if last_key and rnd.random() < 0.2:
+            key = last_key  # double tap / retried submit
+        else:
+            key = last_key = uuid.uuid4().hex
+        tx_type = "deposit" if rnd.random() < 0.25 else "withdraw"
+        resp = client.post(f"/category/{category_id}/save", data={
+            "tx_type": tx_type,
+            "amount": f"{rnd.randint(1, 2500) / 100:.2f}",
+            "currency": "USD",
+            "idempotency_key": key,
+        })
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+    return statuses
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=8)
+    ap.add_argument("--requests", type=int, default=300, help="POSTs per worker")
+    args = ap.parse_args()
+
+    uid = wallet.ensure_single_user()
+    with get_conn() as conn:
+        cid = conn.execute("SELECT id FROM categories WHERE user_id=? ORDER BY id LIMIT 1", (uid,)).fetchone()["id"]
+    assert wallet.app.test_client().post(f"/category/{cid}/save", data={
+        "tx_type": "deposit", "amount": f"{START_CENTS / 100:.2f}", "currency": "USD",
+    }).status_code == 302
+
+    start_at = time.time() + 1.0
+    jobs = [(seed, cid, args.requests, start_at) for seed in range(args.workers)]
+    t0 = time.perf_counter()
+    with mp.get_context("spawn").Pool(args.workers) as pool:
+        results = pool.map(worker, jobs)
+    elapsed = time.perf_counter() - t0 - 1.0
+
+    statuses = {}
+    for r in results:
+        for code, n in r.items():
+            statuses[code] = statuses.get(code, 0) + n
+    total = args.workers * args.requests
+
+    with get_conn() as conn:
+        rows = conn.execute("""
+            SELECT type, amount_cents FROM transactions
+            WHERE user_id=? AND category_id=? AND currency='USD' ORDER BY id
+        """, (uid, cid)).fetchall()
+        running = lowest = 0
+        for r in rows:
+            running += r["amount_cents"] if r["type"] == "deposit" else -r["amount_cents"]
+            lowest = min(lowest, running)
+        stored = conn.execute(
+            "SELECT amount_cents FROM balances WHERE user_id=? AND category_id=? AND currency='USD'", (uid, cid)
+        ).fetchone()["amount_cents"]
+        dup_keys = conn.execute("""
+            SELECT COUNT(*) FROM (SELECT idempotency_key FROM transactions
+                                  WHERE idempotency_key IS NOT NULL GROUP BY idempotency_key HAVING COUNT(*) > 1)
+        """).fetchone()[0]
+        drift = balance_drift(conn)
+
+    withdrawals = sum(1 for r in rows if r["type"] == "withdraw")
+    print(f"{total} POSTs from {args.workers} processes in {elapsed:.1f}s ({total / elapsed:,.0f} req/s), "
+          f"statuses {statuses}")
+    print(f"stored: {len(rows)} rows ({withdrawals} withdrawals), final balance {stored / 100:.2f} USD, "
+          f"lowest running balance {lowest / 100:.2f} USD")
+
+    assert set(statuses) == {302}, f"unexpected statuses: {statuses}"
+    assert lowest >= 0, "an envelope went negative"
+    assert stored == running, "balances table disagrees with the ledger"
+    assert not drift, drift
+    assert dup_keys == 0, f"{dup_keys} idempotency keys stored more than once"
+    print("OK: no overdraft, no drift, no duplicate submits stored")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# bench/worker_startup.py — Import-to-first-response time of a new worker, three ways.
+#
+#   cold        fresh interpreter, no Jinja bytecode cache: import app, then serve
+#   bytecode    fresh interpreter reading templates compiled by an earlier worker
+#   preload     gunicorn --preload: the master imported app and ran create_app();
+#               the worker is forked from it and only serves
+#
+# Each worker serves /, /transactions and /reports once. Runs against a throwaway
+# database that is created (and its user bootstrapped) before the first measurement.
+# Usage: python bench/worker_startup.py [--workers 5]
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ["/", "/transactions", "/reports"]
+
+CHILD = r"""
+import json, sys, time
+t0 = time.perf_counter()
+sys.path.insert(0, ROOT)
+import app as wallet
+t_import = time.perf_counter() - t0
+client = wallet.app.test_client()
+for page in PAGES:
+    assert client.get(page).status_code == 200
+t_first = time.perf_counter() - t0
+print(json.dumps({"import_ms": t_import * 1000, "first_response_ms": t_first * 1000}))
+"""
+
+PRELOAD = r"""
+import json, os, sys, time
+sys.path.insert(0, ROOT)
+import app as wallet
+wallet.create_app()
+for _ in range(WORKERS):
+    r, w = os.pipe()
+    t0 = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(r)
+        client = wallet.app.test_client()
+        for page in PAGES:
+            assert client.get(page).status_code == 200
+        os.write(w, json.dumps({"import_ms": 0.0, "first_response_ms": (time.perf_counter() - t0) * 1000}).encode())
+        os._exit(0)
+    os.close(w)
+    with os.fdopen(r) as f:
+        print(f.read())
+    os.waitpid(pid, 0)
+"""
+
+
+def _run(code, env):
+    out = subprocess.run([sys.executable, "-c", code], env=env, check=True, capture_output=True, text=True)
+    return [json.loads(line) for line in out.stdout.splitlines() if line.startswith("{")]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--workers", type=int, default=5, help="workers started per mode")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="srn_bench_")
+    prelude = f"ROOT = {str(ROOT)!r}\nPAGES = {PAGES!r}\nWORKERS = {args.workers}\n"
+    base_env = dict(os.environ, SRN_DB_PATH=os.path.join(tmp, "bench.sqlite3"))
+    cache_env = dict(base_env, SRN_JINJA_CACHE_DIR=os.path.join(tmp, "jinja"))
+    _run(prelude + CHILD, cache_env)  # creates the schema and user, and fills the bytecode cache
+
+    modes = {
+        "cold": lambda: [r for _ in range(args.workers)
+                         for r in _run(prelude + CHILD, dict(base_env, SRN_JINJA_CACHE_DIR="off"))],
+        "bytecode": lambda: [r for _ in range(args.workers) for r in _run(prelude + CHILD, cache_env)],
+        "preload": lambda: _run(prelude + PRELOAD, cache_env),
+    }
+    print(f"{'mode':>9}  {'import ms':>10}  {'import->first responses ms':>27}")
+    for label, measure in modes.items():
+        runs = measure()
+        print(
+            f"{label:>9}  "
+            f"{statistics.median(r['import_ms'] for r in runs):>10.1f}  "
+            f"{statistics.median(r['first_response_ms'] for r in runs):>27.1f}"
+        )
+    shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
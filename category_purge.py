@@ -0,0 +1,159 @@
+# category_purge.py — Background removal of deleted envelopes' ledger rows.
+#
+# delete_category only stamps categories.deleted_at (one short write), and every
+# read already skips deleted envelopes. The purger then deletes their transactions
+# and daily_totals rows SRN_PURGE_BATCH at a time, one committed transaction per
+# batch with SRN_PURGE_PAUSE_MS of sleep in between, so save_tx in other workers
+# gets the write lock between batches instead of waiting for one giant cascade.
+# Rows of the envelope in archived years are deleted from each year's file the same
+# way. The category row itself goes last. Progress is the data itself: a purge cut
+# short by a crash or restart continues where it stopped the next time it runs
+# (every worker resumes a database's pending purges on its first request there;
+# `flask --app app purge-categories` covers every shard at once).
+
+import os
+import queue
+import sqlite3
+import time
+
+import archive
+import db
+import metrics
+from background import ProcessThread
+
+BATCH = int(os.environ.get("SRN_PURGE_BATCH", "500"))
+PAUSE_SECONDS = float(os.environ.get("SRN_PURGE_PAUSE_MS", "50")) / 1000
+
+PURGED_ROWS = metrics.register(metrics.Counter(
+    "srn_category_purge_rows_total", "Rows removed by the category purger.",
+))
+FAILURES = metrics.register(metrics.Counter(
+    "srn_category_purge_failures_total", "Purge passes that stopped on a database error.",
+))
+
+# Each statement deletes at most one batch of a category's rows, and only while
+# the category is still marked deleted.
+BATCH_DELETES = [
+    """
+    DELETE FROM transactions WHERE id IN (
+        SELECT id FROM transactions
+        WHERE category_id = (SELECT id FROM categories WHERE id = ? AND deleted_at IS NOT NULL)
+        LIMIT ?
+    )
+    """,
+    """
+    DELETE FROM daily_totals WHERE (user_id, day, currency, category_id) IN (
+        SELECT user_id, day, currency, category_id FROM daily_totals
+        WHERE category_id = (SELECT id FROM categories WHERE id = ? AND deleted_at IS NOT NULL)
+        LIMIT ?
+    )
+    """,
+]
+
+ARCHIVE_BATCH_DELETE = """
+    DELETE FROM {schema}.transactions WHERE id IN (
+        SELECT id FROM {schema}.transactions
+        WHERE category_id = (SELECT id FROM main.categories WHERE id = ? AND deleted_at IS NOT NULL)
+        LIMIT ?
+    )
+"""
+
+
+def pending_categories(conn):
+    """Ids of deleted categories whose rows have not been purged yet."""
+    return [r["id"] for r in conn.execute(
+        "SELECT id FROM categories WHERE deleted_at IS NOT NULL ORDER BY user_id"
+    ).fetchall()]
+
+
+def purge_category(conn, category_id: int, batch: int = BATCH, pause: float = PAUSE_SECONDS):
+    """
+    Deletes one soft-deleted category and everything that references it, in
+    committed batches of `batch` rows. Returns the number of rows removed.
+    """
+    removed = 0
+    for sql in BATCH_DELETES:
+        removed += _delete_in_batches(conn, sql, category_id, batch, pause)
+    for year in db.archived_years(conn):
+        with db.attached_archive(conn, year) as schema:
+            with conn:
+                for sql in archive.ARCHIVE_SCHEMA:
+                    conn.execute(sql.format(schema=schema))
+            n = _delete_in_batches(conn, ARCHIVE_BATCH_DELETE.format(schema=schema), category_id, batch, pause)
+        if n:
+            with conn:
+                conn.execute("UPDATE ledger_archives SET rows = rows - ? WHERE year = ?", (n, year))
+        removed += n
+    # Anything written to the envelope while the batches ran (and its balances)
+    # goes with the row through ON DELETE CASCADE.
+    with conn:
+        removed += conn.execute(
+            "DELETE FROM categories WHERE id=? AND deleted_at IS NOT NULL", (category_id,)
+        ).rowcount
+    return removed
+
+
+def _delete_in_batches(conn, sql: str, category_id: int, batch: int, pause: float):
+    removed = 0
+    while True:
+        with conn:
+            n = conn.execute(sql, (category_id, batch)).rowcount
+        removed += n
+        PURGED_ROWS.inc(amount=n)
+        if n < batch:
+            return removed
+        time.sleep(pause)
+
+
+def purge_pending(conn, batch: int = BATCH, pause: float = PAUSE_SECONDS, progress=None):
+    """Purges every pending category in conn's database. Returns the number of categories purged."""
+    purged = 0
+    for category_id in pending_categories(conn):
+        rows = purge_category(conn, category_id, batch, pause)
+        purged += 1
+        if progress:
+            progress(category_id, rows)
+    return purged
+
+
+class CategoryPurger(ProcessThread):
+    """One background thread per process that runs purge_pending when kicked."""
+
+    thread_name = "srn-category-purge"
+
+    def __init__(self):
+        super().__init__()
+        self._queue = queue.Queue()
+        self._resumed = set()
+
+    def kick(self, user_id=None):
+        """Queues a purge pass over the database holding user_id's ledger (DB_PATH when not sharded)."""
+        self._ensure_thread()
+        self._queue.put(user_id)
+
+    def resume(self, user_id=None):
+        """Kick, but once per database per process: picks up purges a crash or restart cut short."""
+        key = str(db.shard_path(user_id)) if db.SHARD_DIR is not None and user_id is not None else ""
+        if self.started_here() and key in self._resumed:
+            return
+        self._ensure_thread()
+        self._resumed.add(key)
+        self._queue.put(user_id)
+
+    def _reset(self):
+        self._queue = queue.Queue()
+        self._resumed = set()
+
+    def _run(self):
+        while True:
+            user_id = self._queue.get()
+            try:
+                purge_pending(db.get_conn(user_id))
+            except (sqlite3.Error, OSError):
+                # Nothing is lost (a missing archive file included): the categories stay marked and the next pass resumes them.
+                FAILURES.inc()
+            finally:
+                db.release_conn()
+
+
+purger = CategoryPurger()
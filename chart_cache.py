@@ -0,0 +1,96 @@
+# chart_cache.py — In-process LRU cache for rendered report charts.
+#
+# Entries are keyed by (user_id, currency, from, to) and stamped with a data
+# version (a fingerprint of the aggregates the chart was drawn from), so a
+# stale entry is never served even if another gunicorn worker did the write.
+# save_tx / delete_category also invalidate matching entries eagerly to free memory.
+# fragment_cache is the same versioned LRU holding rendered HTML fragments, keyed by
+# (fragment name, database path, user_id) and stamped with the user's ledger version
+# (db.ledger_version); a write moves the version on, so it needs no invalidation.
+
+import os
+import threading
+from collections import OrderedDict
+
+CHART_CACHE_MAX_BYTES = int(os.environ.get("SRN_CHART_CACHE_BYTES", str(32 * 1024 * 1024)))
+FRAGMENT_CACHE_MAX_BYTES = int(os.environ.get("SRN_FRAGMENT_CACHE_BYTES", str(8 * 1024 * 1024)))
+
+
+class VersionedLRU:
+    """LRU of values stamped with a version; a lookup with another version is a miss."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (version, bytes or str)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, version, value):
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            self._drop(key)
+            self._entries[key] = (version, value)
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    @property
+    def size_bytes(self):
+        return self._bytes
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class ChartCache(VersionedLRU):
+    """PNG charts keyed by (user_id, currency, from, to)."""
+
+    def __init__(self, max_bytes: int = CHART_CACHE_MAX_BYTES):
+        super().__init__(max_bytes)
+
+    def invalidate(self, user_id: int, currency: str | None = None, tx_date: str | None = None):
+        """Drops a user's entries, optionally only those for currency whose range covers tx_date."""
+        with self._lock:
+            for key in list(self._entries):
+                uid, cur, start, end = key
+                if uid != user_id:
+                    continue
+                if currency is not None and cur != currency:
+                    continue
+                if tx_date is not None and not (start <= tx_date <= end):
+                    continue
+                self._drop(key)
+
+
+class FragmentCache(VersionedLRU):
+    """Rendered HTML fragments keyed by (fragment name, database path, user_id)."""
+
+    def __init__(self, max_bytes: int = FRAGMENT_CACHE_MAX_BYTES):
+        super().__init__(max_bytes)
+
+    @staticmethod
+    def key(name: str, db_path, user_id: int):
+        return (name, str(db_path), user_id)
+
+
+chart_cache = ChartCache()
+fragment_cache = FragmentCache()
@@ -0,0 +1,485 @@
+# css_build.py — Builds static/css/app.<hash>.css from the utility classes the app uses.
+#
+# The templates are written with Tailwind class names. Instead of shipping the
+# Tailwind CDN script (which compiles styles in the browser on every page load and
+# leaves the PWA unstyled offline), `flask --app app build-css` scans templates/*.html
+# and static/*.js for class-like tokens and emits a minified stylesheet containing
+# Tailwind's preflight plus a rule for every token it recognises, nothing else.
+# Values follow Tailwind v3's default theme. Unrecognised tokens are ignored, just
+# like Tailwind's own extractor; `build-css --verbose` lists the classes that got a rule.
+# Tokens shaped like a Tailwind utility that still got no rule (bg-purple-500, z-10,
+# dark:...) are reported, and fail `build-css --check`: they would ship unstyled.
+# The file name carries a hash of its bytes and static/css/manifest.json maps
+# css/app.css to it (see assets.py).
+
+import json
+import re
+from pathlib import Path
+
+import assets
+
+ROOT = Path(__file__).parent
+SOURCE_GLOBS = ("templates/*.html", "static/*.js")
+OUTPUT_DIR = "css"
+LOGICAL_NAME = "css/app.css"
+
+PREFLIGHT = """
+*,::before,::after{box-sizing:border-box;border-width:0;border-style:solid;border-color:#e5e7eb}
+html{line-height:1.5;-webkit-text-size-adjust:100%;tab-size:4;font-family:ui-sans-serif,system-ui,sans-serif,"Apple Color Emoji","Segoe UI Emoji","Segoe UI Symbol","Noto Color Emoji";-webkit-tap-highlight-color:transparent}
+body{margin:0;line-height:inherit}
+hr{height:0;color:inherit;border-top-width:1px}
+h1,h2,h3,h4,h5,h6{font-size:inherit;font-weight:inherit}
+a{color:inherit;text-decoration:inherit}
+b,strong{font-weight:bolder}
+code,kbd,samp,pre{font-family:ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,"Liberation Mono","Courier New",monospace;font-size:1em}
+small{font-size:80%}
+table{text-indent:0;border-color:inherit;border-collapse:collapse}
+button,input,optgroup,select,textarea{font-family:inherit;font-size:100%;font-weight:inherit;line-height:inherit;letter-spacing:inherit;color:inherit;margin:0;padding:0}
+button,select{text-transform:none}
+button,input:where([type=button]),input:where([type=reset]),input:where([type=submit]){-webkit-appearance:button;background-color:transparent;background-image:none}
+:-moz-focusring{outline:auto}
+progress{vertical-align:baseline}
+::-webkit-inner-spin-button,::-webkit-outer-spin-button{height:auto}
+[type=search]{-webkit-appearance:textfield;outline-offset:-2px}
+::-webkit-search-decoration{-webkit-appearance:none}
+::-webkit-file-upload-button{-webkit-appearance:button;font:inherit}
+summary{display:list-item}
+blockquote,dl,dd,h1,h2,h3,h4,h5,h6,hr,figure,p,pre{margin:0}
+fieldset{margin:0;padding:0}
+legend{padding:0}
+ol,ul,menu{list-style:none;margin:0;padding:0}
+textarea{resize:vertical}
+input::placeholder,textarea::placeholder{opacity:1;color:#9ca3af}
+button,[role=button]{cursor:pointer}
+:disabled{cursor:default}
+img,svg,video,canvas,audio,iframe,embed,object{display:block;vertical-align:middle}
+img,video{max-width:100%;height:auto}
+[hidden]{display:none}
+"""
+
+# ---- theme (Tailwind v3 defaults) -------------------------------------------
+
+COLORS = {
+    "gray": ["#f9fafb", "#f3f4f6", "#e5e7eb", "#d1d5db", "#9ca3af",
+             "#6b7280", "#4b5563", "#374151", "#1f2937", "#111827", "#030712"],
+    "red": ["#fef2f2", "#fee2e2", "#fecaca", "#fca5a5", "#f87171",
+            "#ef4444", "#dc2626", "#b91c1c", "#991b1b", "#7f1d1d", "#450a0a"],
+    "yellow": ["#fefce8", "#fef9c3", "#fef08a", "#fde047", "#facc15",
+               "#eab308", "#ca8a04", "#a16207", "#854d0e", "#713f12", "#422006"],
+    "green": ["#f0fdf4", "#dcfce7", "#bbf7d0", "#86efac", "#4ade80",
+              "#22c55e", "#16a34a", "#15803d", "#166534", "#14532d", "#052e16"],
+    "blue": ["#eff6ff", "#dbeafe", "#bfdbfe", "#93c5fd", "#60a5fa",
+             "#3b82f6", "#2563eb", "#1d4ed8", "#1e40af", "#1e3a8a", "#172554"],
+}
+SHADES = ["50", "100", "200", "300", "400", "500", "600", "700", "800", "900", "950"]
+NAMED_COLORS = {"white": "#fff", "black": "#000", "transparent": "transparent", "current": "currentColor"}
+
+
+def _rem(n: float) -> str:
+    return "0px" if n == 0 else f"{n / 4:g}rem".replace("0.", ".", 1)
+
+
+SPACING = {"px": "1px"}
+for _n in (0, 0.5, 1, 1.5, 2, 2.5, 3, 3.5, 4, 5, 6, 7, 8, 9, 10, 11, 12, 14, 16,
+           20, 24, 28, 32, 36, 40, 44, 48, 52, 56, 60, 64, 72, 80, 96):
+    SPACING[f"{_n:g}"] = _rem(_n)
+
+FONT_SIZES = {
+    "xs": (".75rem", "1rem"), "sm": (".875rem", "1.25rem"), "base": ("1rem", "1.5rem"),
+    "lg": ("1.125rem", "1.75rem"), "xl": ("1.25rem", "1.75rem"), "2xl": ("1.5rem", "2rem"),
+    "3xl": ("1.875rem", "2.25rem"), "4xl": ("2.25rem", "2.5rem"),
+}
+FONT_WEIGHTS = {"light": "300", "normal": "400", "medium": "500", "semibold": "600", "bold": "700", "extrabold": "800"}
+RADII = {"none": "0px", "sm": ".125rem", "": ".25rem", "md": ".375rem", "lg": ".5rem",
+         "xl": ".75rem", "2xl": "1rem", "3xl": "1.5rem", "full": "9999px"}
+SHADOWS = {
+    "sm": "0 1px 2px 0 rgb(0 0 0/.05)",
+    "": "0 1px 3px 0 rgb(0 0 0/.1),0 1px 2px -1px rgb(0 0 0/.1)",
+    "md": "0 4px 6px -1px rgb(0 0 0/.1),0 2px 4px -2px rgb(0 0 0/.1)",
+    "lg": "0 10px 15px -3px rgb(0 0 0/.1),0 4px 6px -4px rgb(0 0 0/.1)",
+    "none": "0 0 #0000",
+}
+TRACKING = {"tighter": "-.05em", "tight": "-.025em", "normal": "0em", "wide": ".025em", "wider": ".05em", "widest": ".1em"}
+LEADING = {"none": "1", "tight": "1.25", "snug": "1.375", "normal": "1.5", "relaxed": "1.625", "loose": "2"}
+MAX_WIDTHS = {"xs": "20rem", "sm": "24rem", "md": "28rem", "lg": "32rem", "xl": "36rem", "2xl": "42rem",
+              "3xl": "48rem", "full": "100%", "none": "none"}
+SCREENS = {"sm": "640px", "md": "768px", "lg": "1024px"}
+PSEUDO_VARIANTS = ("hover", "focus", "active", "disabled")
+
+CHILDREN = ">:not([hidden])~:not([hidden])"
+
+# What a Tailwind class looks like, supported here or not: used to tell a utility
+# this builder lacks from the words, attributes and code the scan also picks up.
+TAILWIND_VARIANTS = {*SCREENS, *PSEUDO_VARIANTS, "xl", "2xl", "dark", "group-hover", "focus-visible",
+                     "focus-within", "first", "last", "odd", "even", "placeholder", "print", "motion-safe"}
+TAILWIND_PREFIXES = (
+    "m", "mx", "my", "mt", "mr", "mb", "ml", "p", "px", "py", "pt", "pr", "pb", "pl",
+    "w", "h", "min-w", "min-h", "max-w", "max-h", "size", "inset", "inset-x", "inset-y",
+    "top", "right", "bottom", "left", "z", "order", "basis", "grow", "shrink", "flex",
+    "grid-cols", "grid-rows", "col-span", "row-span", "col-start", "col-end", "gap", "gap-x", "gap-y",
+    "space-x", "space-y", "divide", "divide-x", "divide-y", "rounded", "rounded-t", "rounded-r",
+    "rounded-b", "rounded-l", "border", "border-x", "border-y", "border-t", "border-r", "border-b",
+    "border-l", "bg", "from", "via", "to", "text", "font", "leading", "tracking", "decoration",
+    "underline-offset", "indent", "line-clamp", "opacity", "shadow", "outline", "outline-offset",
+    "ring", "ring-offset", "blur", "duration", "delay", "scale", "rotate", "translate-x",
+    "translate-y", "columns", "aspect", "fill", "stroke",
+)
+_TAILWIND_VALUE = re.compile(
+    r"-?\d+(\.\d+)?|\d+/\d+|px|\d?(xs|sm|md|lg|xl)|base|full|auto|screen|none|\[[^\]]+\]"
+    r"|(white|black|transparent|current|[a-z]+-\d{2,3})(/\d+)?"
+)
+
+
+def _color(value: str):
+    """'blue-600' / 'white' / 'red-500/50' -> a CSS color, or None."""
+    value, _, alpha = value.partition("/")
+    if value in NAMED_COLORS and not alpha:
+        return NAMED_COLORS[value]
+    family, _, shade = value.rpartition("-")
+    if family not in COLORS or shade not in SHADES:
+        return None
+    hexcode = COLORS[family][SHADES.index(shade)]
+    if not alpha:
+        return hexcode
+    if not alpha.isdigit() or int(alpha) > 100:
+        return None
+    r, g, b = (int(hexcode[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgb({r} {g} {b}/{int(alpha) / 100:g})"
+
+
+def _length(value: str, extra=None):
+    """Spacing-scale value, a fraction like 1/2, or one of `extra`."""
+    if extra and value in extra:
+        return extra[value]
+    if value in SPACING:
+        return SPACING[value]
+    m = re.fullmatch(r"(\d+)/(\d+)", value)
+    if m and 0 < int(m[1]) < int(m[2]) <= 12:
+        return f"{int(m[1]) / int(m[2]) * 100:g}%"
+    return None
+
+
+def _sides(prop: str, sides: str):
+    return {
+        "": [prop], "x": [f"{prop}-left", f"{prop}-right"], "y": [f"{prop}-top", f"{prop}-bottom"],
+        "t": [f"{prop}-top"], "r": [f"{prop}-right"], "b": [f"{prop}-bottom"], "l": [f"{prop}-left"],
+    }[sides]
+
+
+def _spacing(prop, sides):
+    def rule(value):
+        negative = value.startswith("-")
+        v = _length(value.lstrip("-"), {"auto": "auto"} if prop == "margin" else None)
+        if v is None or (negative and (prop != "margin" or v == "auto")):
+            return None
+        v = f"-{v}" if negative and v != "0px" else v
+        return [("", {p: v for p in _sides(prop, sides)})]
+    return rule
+
+
+def _exact(table):
+    def rule(value):
+        decls = table.get(value)
+        return [("", decls)] if decls else None
+    return rule
+
+
+def _from_theme(prop, table):
+    def rule(value):
+        return [("", {prop: table[value]})] if value in table else None
+    return rule
+
+
+def _colored(prop):
+    def rule(value):
+        c = _color(value)
+        return [("", {prop: c})] if c else None
+    return rule
+
+
+def _border_width(sides, value):
+    width = {"": "1px", "0": "0px", "2": "2px", "4": "4px", "8": "8px"}.get(value)
+    if width is None:
+        return None
+    return [("", {f"border{'-' + s if s else ''}-width": width for s in
+                  {"": [""], "x": ["left", "right"], "y": ["top", "bottom"],
+                   "t": ["top"], "r": ["right"], "b": ["bottom"], "l": ["left"]}[sides]})]
+
+
+def _space(axis, value):
+    v = _length(value)
+    if v is None:
+        return None
+    return [(CHILDREN, {"margin-top" if axis == "y" else "margin-left": v})]
+
+
+def _divide(axis, value):
+    width = {"": "1px", "0": "0px", "2": "2px", "4": "4px"}.get(value)
+    if width is not None:
+        start, end = ("top", "bottom") if axis == "y" else ("left", "right")
+        return [(CHILDREN, {f"border-{start}-width": width, f"border-{end}-width": "0px"})]
+    c = _color(value) if axis == "" else None
+    return [(CHILDREN, {"border-color": c})] if c else None
+
+
+def _ring(value):
+    width = {"": "3px", "0": "0px", "1": "1px", "2": "2px", "4": "4px", "8": "8px"}.get(value)
+    if width is not None:
+        return [("", {
+            "--tw-ring-offset-shadow": "var(--tw-ring-inset,) 0 0 0 var(--tw-ring-offset-width,0px) var(--tw-ring-offset-color,#fff)",
+            "--tw-ring-shadow": f"var(--tw-ring-inset,) 0 0 0 calc({width} + var(--tw-ring-offset-width,0px)) var(--tw-ring-color,rgb(59 130 246/.5))",
+            "box-shadow": "var(--tw-ring-offset-shadow),var(--tw-ring-shadow),var(--tw-shadow,0 0 #0000)",
+        })]
+    c = _color(value)
+    return [("", {"--tw-ring-color": c})] if c else None
+
+
+def _shadow(value):
+    if value not in SHADOWS:
+        return None
+    return [("", {
+        "--tw-shadow": SHADOWS[value],
+        "box-shadow": "var(--tw-ring-offset-shadow,0 0 #0000),var(--tw-ring-shadow,0 0 #0000),var(--tw-shadow)",
+    })]
+
+
+def _font_size(value):
+    if value not in FONT_SIZES:
+        return None
+    size, line_height = FONT_SIZES[value]
+    return [("", {"font-size": size, "line-height": line_height})]
+
+
+def _grid_cols(value):
+    if value.isdigit() and 1 <= int(value) <= 12:
+        return [("", {"grid-template-columns": f"repeat({value},minmax(0,1fr))"})]
+    return None
+
+
+def _col_span(value):
+    if value == "full":
+        return [("", {"grid-column": "1/-1"})]
+    if value.isdigit() and 1 <= int(value) <= 12:
+        return [("", {"grid-column": f"span {value}/span {value}"})]
+    return None
+
+
+STATIC = {
+    "position": {k: {"position": k} for k in ("static", "fixed", "absolute", "relative", "sticky")},
+    "display": {
+        "block": {"display": "block"}, "inline-block": {"display": "inline-block"}, "inline": {"display": "inline"},
+        "flex": {"display": "flex"}, "inline-flex": {"display": "inline-flex"}, "grid": {"display": "grid"},
+        "table": {"display": "table"}, "hidden": {"display": "none"},
+    },
+    "flex": {
+        "flex-1": {"flex": "1 1 0%"}, "flex-auto": {"flex": "1 1 auto"}, "flex-none": {"flex": "none"},
+        "shrink-0": {"flex-shrink": "0"}, "grow": {"flex-grow": "1"},
+    },
+    "flex-layout": {
+        "flex-row": {"flex-direction": "row"}, "flex-col": {"flex-direction": "column"},
+        "flex-wrap": {"flex-wrap": "wrap"}, "flex-nowrap": {"flex-wrap": "nowrap"},
+        "items-start": {"align-items": "flex-start"}, "items-end": {"align-items": "flex-end"},
+        "items-center": {"align-items": "center"}, "items-baseline": {"align-items": "baseline"},
+        "items-stretch": {"align-items": "stretch"},
+        "justify-start": {"justify-content": "flex-start"}, "justify-end": {"justify-content": "flex-end"},
+        "justify-center": {"justify-content": "center"}, "justify-between": {"justify-content": "space-between"},
+        "justify-around": {"justify-content": "space-around"},
+    },
+    "overflow": {
+        "overflow-hidden": {"overflow": "hidden"}, "overflow-auto": {"overflow": "auto"},
+        "overflow-x-auto": {"overflow-x": "auto"},
+        "truncate": {"overflow": "hidden", "text-overflow": "ellipsis", "white-space": "nowrap"},
+        "whitespace-nowrap": {"white-space": "nowrap"}, "break-words": {"overflow-wrap": "break-word"},
+    },
+    "text-align": {f"text-{k}": {"text-align": k} for k in ("left", "center", "right", "justify")},
+    "text-transform": {
+        "uppercase": {"text-transform": "uppercase"}, "lowercase": {"text-transform": "lowercase"},
+        "capitalize": {"text-transform": "capitalize"}, "normal-case": {"text-transform": "none"},
+    },
+    "decoration": {
+        "underline": {"text-decoration-line": "underline"}, "line-through": {"text-decoration-line": "line-through"},
+        "no-underline": {"text-decoration-line": "none"},
+    },
+    "outline": {
+        "outline-none": {"outline": "2px solid transparent", "outline-offset": "2px"},
+        "outline": {"outline-style": "solid"},
+    },
+    "cursor": {"cursor-pointer": {"cursor": "pointer"}, "cursor-not-allowed": {"cursor": "not-allowed"}},
+}
+
+# (family, prefix, rule) in Tailwind's emission order: a later family wins over an
+# earlier one on the same element, exactly as with the Tailwind build.
+UTILITIES = [
+    ("position", None, _exact(STATIC["position"])),
+    ("col-span", "col-span", _col_span),
+    *[("margin", f"m{s}", _spacing("margin", s)) for s in ("", "x", "y", "t", "r", "b", "l")],
+    ("display", None, _exact(STATIC["display"])),
+    ("height", "h", _from_theme("height", {**SPACING, "full": "100%", "screen": "100vh", "auto": "auto"})),
+    ("min-height", "min-h", _from_theme("min-height", {"0": "0px", "full": "100%", "screen": "100vh"})),
+    ("width", "w", lambda v: [("", {"width": w})] if (w := _length(v, {"full": "100%", "screen": "100vw", "auto": "auto"})) else None),
+    ("max-width", "max-w", _from_theme("max-width", MAX_WIDTHS)),
+    ("flex", None, _exact(STATIC["flex"])),
+    ("grid-cols", "grid-cols", _grid_cols),
+    ("flex-layout", None, _exact(STATIC["flex-layout"])),
+    ("gap", "gap", lambda v: [("", {"gap": g})] if (g := _length(v)) else None),
+    ("gap", "gap-x", lambda v: [("", {"column-gap": g})] if (g := _length(v)) else None),
+    ("gap", "gap-y", lambda v: [("", {"row-gap": g})] if (g := _length(v)) else None),
+    ("space", "space-x", lambda v: _space("x", v)),
+    ("space", "space-y", lambda v: _space("y", v)),
+    ("divide", "divide-x", lambda v: _divide("x", v)),
+    ("divide", "divide-y", lambda v: _divide("y", v)),
+    ("divide", "divide", lambda v: _divide("", v)),
+    ("overflow", None, _exact(STATIC["overflow"])),
+    ("rounded", "rounded", _from_theme("border-radius", RADII)),
+    *[("border-width", f"border{'-' + s if s else ''}", lambda v, s=s: _border_width(s, v))
+      for s in ("", "x", "y", "t", "r", "b", "l")],
+    ("border-color", "border", _colored("border-color")),
+    ("background", "bg", _colored("background-color")),
+    *[("padding", f"p{s}", _spacing("padding", s)) for s in ("", "x", "y", "t", "r", "b", "l")],
+    ("text-align", None, _exact(STATIC["text-align"])),
+    ("font-size", "text", _font_size),
+    ("font-weight", "font", _from_theme("font-weight", FONT_WEIGHTS)),
+    ("text-transform", None, _exact(STATIC["text-transform"])),
+    ("leading", "leading", _from_theme("line-height", LEADING)),
+    ("tracking", "tracking", _from_theme("letter-spacing", TRACKING)),
+    ("text-color", "text", _colored("color")),
+    ("decoration", None, _exact(STATIC["decoration"])),
+    ("opacity", "opacity", lambda v: [("", {"opacity": f"{int(v) / 100:g}"})] if v.isdigit() and int(v) <= 100 else None),
+    ("shadow", "shadow", _shadow),
+    ("outline", None, _exact(STATIC["outline"])),
+    ("ring", "ring", _ring),
+    ("cursor", None, _exact(STATIC["cursor"])),
+]
+
+
+def _match(utility: str):
+    """Returns (order, [(selector suffix, declarations)]) for a bare utility, or None."""
+    for order, (_, prefix, rule) in enumerate(UTILITIES):
+        if prefix is None:
+            result = rule(utility)
+        elif utility == prefix:
+            result = rule("")
+        elif utility.startswith(prefix + "-"):
+            result = rule(utility[len(prefix) + 1:])
+        else:
+            continue
+        if result:
+            return order, result
+    return None
+
+
+def _negative_margin(utility: str):
+    # -mt-2 -> ("mt", "-2"): margins are the only negatable utility here.
+    m = re.fullmatch(r"-(m[xytrbl]?)-(.+)", utility)
+    return (m[1], m[2]) if m else None
+
+
+def _escape(cls: str) -> str:
+    return re.sub(r"([^A-Za-z0-9_-])", r"\\\1", cls)
+
+
+def rule_for(token: str):
+    """
+    The CSS for one class token ("mt-4", "focus:ring", "sm:grid-cols-2"), as
+    (sort key, css text); None if the token is not a utility this builder knows.
+    """
+    *variants, utility = token.split(":")
+    screen = None
+    pseudo = []
+    for v in variants:
+        if v in SCREENS and screen is None and not pseudo:
+            screen = v
+        elif v in PSEUDO_VARIANTS and v not in pseudo:
+            pseudo.append(v)
+        else:
+            return None
+
+    neg = _negative_margin(utility)
+    if neg:
+        prefix, value = neg
+        order = next(i for i, u in enumerate(UTILITIES) if u[1] == prefix)
+        parts = UTILITIES[order][2]("-" + value)
+        match = (order, parts) if parts else None
+    else:
+        match = _match(utility)
+    if match is None:
+        return None
+    order, parts = match
+
+    selector = "." + _escape(token) + "".join(f":{p}" for p in pseudo)
+    css = "".join(
+        f"{selector}{suffix}{{{';'.join(f'{k}:{v}' for k, v in decls.items())}}}" for suffix, decls in parts
+    )
+    screen_rank = list(SCREENS).index(screen) + 1 if screen else 0
+    key = (screen_rank, len(pseudo), order, token)
+    return key, (screen, css)
+
+
+def looks_like_utility(token: str) -> bool:
+    """True for tokens shaped like a Tailwind class ("z-10", "bg-purple-500", "dark:p-2")."""
+    *variants, utility = token.split(":")
+    if variants:
+        return all(v in TAILWIND_VARIANTS for v in variants)
+    utility = utility.removeprefix("-")
+    for prefix in TAILWIND_PREFIXES:
+        if utility == prefix and prefix in ("border", "rounded", "shadow", "ring", "outline", "grow", "shrink"):
+            return True
+        if utility.startswith(prefix + "-") and _TAILWIND_VALUE.fullmatch(utility[len(prefix) + 1:]):
+            return True
+    return False
+
+
+def unknown_utilities(tokens) -> list[str]:
+    """Tokens that look like Tailwind utilities but get no rule from this builder."""
+    return sorted(t for t in tokens if looks_like_utility(t) and rule_for(t) is None)
+
+
+def scan_tokens(root: Path = ROOT):
+    """Every class-like token in the template and script sources."""
+    tokens = set()
+    for pattern in SOURCE_GLOBS:
+        for path in sorted(root.glob(pattern)):
+            tokens.update(re.findall(r"[^\s<>\"'`{}()=,;|]+", path.read_text(encoding="utf-8")))
+    return tokens
+
+
+def render_css(tokens) -> tuple[str, list[str]]:
+    """Minified stylesheet for `tokens`, plus the tokens that produced rules."""
+    rules = sorted(r for r in map(rule_for, tokens) if r is not None)
+    out = ["".join(line.strip() for line in PREFLIGHT.splitlines())]
+    open_screen = None
+    for _, (screen, css) in rules:
+        if screen != open_screen:
+            if open_screen:
+                out.append("}")
+            if screen:
+                out.append(f"@media (min-width:{SCREENS[screen]}){{")
+            open_screen = screen
+        out.append(css)
+    if open_screen:
+        out.append("}")
+    return "".join(out) + "\n", [key[-1] for key, _ in rules]
+
+
+def build(root: Path = ROOT, write: bool = True):
+    """
+    Builds the stylesheet. Returns (static-relative path, size in bytes, classes used,
+    changed, unknown utilities). With write=False nothing is touched and `changed`
+    says whether the committed build is stale.
+    """
+    tokens = scan_tokens(root)
+    css, used = render_css(tokens)
+    data = css.encode("utf-8")
+    filename = f"{OUTPUT_DIR}/app.{assets.content_hash(data)}.css"
+    static_dir = root / "static"
+    changed = not (static_dir / filename).exists() or assets.load_manifest().get(LOGICAL_NAME) != filename
+
+    if write and changed:
+        out_dir = static_dir / OUTPUT_DIR
+        out_dir.mkdir(exist_ok=True)
+        for old in out_dir.glob("app.*.css"):
+            old.unlink()
+        (static_dir / filename).write_bytes(data)
+        manifest = {**assets.load_manifest(), LOGICAL_NAME: filename}
+        assets.MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+    return filename, len(data), used, changed, unknown_utilities(tokens)
@@ -1,22 +1,669 @@
+import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack, contextmanager
+from datetime import date, timedelta
 from pathlib import Path
 
-DB_PATH = Path(__file__).with_name("srn_wallet.sqlite3")
+# SRN_DB_PATH lets benchmarks and scripts point the app at a scratch database.
+DB_PATH = Path(os.environ.get("SRN_DB_PATH") or Path(__file__).with_name("srn_wallet.sqlite3"))
+MIGRATIONS_DIR = Path(__file__).with_name("migrations")
 
-def get_conn():
-    conn = sqlite3.connect(DB_PATH, timeout=10)  # wait up to 10s
+# Optional sqlite3 trace callback installed on every new connection
+# (used by diagnostics such as `flask check-query-plans`).
+SQL_TRACE = None
+
+# Optional callable(seconds) told how long each execute/executemany/executescript took
+# (installed by metrics.init_app).
+QUERY_OBSERVER = None
+
+# Connection tuning (override via environment on Render / gunicorn).
+# SRN_DB_POOL=0 falls back to one fresh connection per get_conn() call.
+POOL_CONNECTIONS = os.environ.get("SRN_DB_POOL", "1") != "0"
+CACHE_SIZE_KIB = int(os.environ.get("SRN_DB_CACHE_KIB", "16384"))         # page cache per connection
+MMAP_SIZE = int(os.environ.get("SRN_DB_MMAP_BYTES", str(64 * 1024 * 1024)))  # 0 disables mmap
+SYNCHRONOUS = os.environ.get("SRN_DB_SYNCHRONOUS", "NORMAL")              # NORMAL is safe under WAL
+POOL_MAX = int(os.environ.get("SRN_DB_POOL_MAX", "32"))                   # open connections per thread (LRU)
+
+# Multi-tenant sharding: when set, each user's ledger lives in its own SQLite file
+# under this directory and DB_PATH only holds the users directory. get_conn()
+# routes to the shard of the user bound to the current thread (use_user()).
+SHARD_DIR = Path(os.environ["SRN_SHARD_DIR"]) if os.environ.get("SRN_SHARD_DIR") else None
+
+_local = threading.local()
+_ready_paths = set()  # database files this process has created/migrated already
+_ready_paths_lock = threading.Lock()
+_schema_version = None
+
+
+class _TimedConnection(sqlite3.Connection):
+    """sqlite3 connection that reports statement latency to QUERY_OBSERVER."""
+
+    def execute(self, *args):
+        if QUERY_OBSERVER is None:
+            return super().execute(*args)
+        t0 = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            QUERY_OBSERVER(time.perf_counter() - t0)
+
+    def executemany(self, *args):
+        if QUERY_OBSERVER is None:
+            return super().executemany(*args)
+        t0 = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            QUERY_OBSERVER(time.perf_counter() - t0)
+
+    def executescript(self, *args):
+        if QUERY_OBSERVER is None:
+            return super().executescript(*args)
+        t0 = time.perf_counter()
+        try:
+            return super().executescript(*args)
+        finally:
+            QUERY_OBSERVER(time.perf_counter() - t0)
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, factory=_TimedConnection)  # wait up to 10s
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     conn.execute("PRAGMA journal_mode=WAL;")
     conn.execute("PRAGMA busy_timeout=5000;")  # 5 seconds
+    conn.execute(f"PRAGMA synchronous={SYNCHRONOUS};")
+    conn.execute(f"PRAGMA cache_size=-{int(CACHE_SIZE_KIB)};")
+    conn.execute(f"PRAGMA mmap_size={int(MMAP_SIZE)};")
+    return conn
+
+
+def use_user(user_id):
+    """Binds user_id to this thread (Flask before_request); get_conn() then routes to their shard."""
+    _local.user_id = user_id
+
+
+def shard_path(user_id: int) -> Path:
+    """user_<id>.sqlite3, fanned out over 256 subdirectories to keep directories small."""
+    return SHARD_DIR / f"{user_id % 256:02x}" / f"user_{user_id}.sqlite3"
+
+
+def _db_path_for(user_id):
+    if SHARD_DIR is None or user_id is None:
+        return _ready(DB_PATH)
+    return _ready(shard_path(user_id))
+
+
+def _ready(path):
+    """
+    Creates or migrates the database at path the first time this process uses it.
+    A process forked after init_db() (gunicorn --preload) inherits the set and
+    never checks again.
+    """
+    key = str(path)
+    if key not in _ready_paths:
+        with _ready_paths_lock:
+            if key not in _ready_paths:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+                conn = _connect(path)
+                try:
+                    _init_schema(conn)
+                finally:
+                    conn.close()
+                _ready_paths.add(key)
+    return path
+
+
+def get_conn(user_id=None):
+    """
+    Returns this thread's pooled connection, opening it (and running the PRAGMAs)
+    only the first time. Use it as `with get_conn() as conn:` so the block commits
+    or rolls back; the connection itself stays open for reuse.
+    Without sharding that is always DB_PATH; with SHARD_DIR set it is the shard of
+    user_id (default: the user bound by use_user()), or DB_PATH when no user is bound.
+    The pool keeps at most POOL_MAX connections per thread, closing the least recently used.
+    """
+    return _pooled_conn(_db_path_for(user_id if user_id is not None else getattr(_local, "user_id", None)))
+
+
+def directory_conn():
+    """Connection to DB_PATH (the users directory when sharded), whoever is bound to the thread."""
+    return _pooled_conn(_ready(DB_PATH))
+
+
+def _pooled_conn(path):
+    if POOL_CONNECTIONS:
+        pool = getattr(_local, "pool", None)
+        if pool is None:
+            pool = _local.pool = OrderedDict()
+        key = str(path)
+        conn = pool.get(key)
+        if conn is None:
+            conn = pool[key] = _connect(path)
+            _evict_idle(pool)
+        else:
+            pool.move_to_end(key)
+    else:
+        conn = _connect(path)
+        if not hasattr(_local, "unpooled"):
+            _local.unpooled = []
+        _local.unpooled.append(conn)
+
+    conn.set_trace_callback(SQL_TRACE)
     return conn
 
 
+def _evict_idle(pool):
+    for key in list(pool)[:-1]:
+        if len(pool) <= POOL_MAX:
+            return
+        if not pool[key].in_transaction:
+            pool.pop(key).close()
+
+
+def release_conn():
+    """
+    End-of-request cleanup (Flask teardown_appcontext): rolls back anything a
+    failed request left open on the pooled connections, closes unpooled ones and
+    unbinds the request's user.
+    """
+    for conn in getattr(_local, "pool", {}).values():
+        if conn.in_transaction:
+            conn.rollback()
+    for conn in getattr(_local, "unpooled", []):
+        conn.close()
+    _local.unpooled = []
+    _local.user_id = None
+
+
+def close_pooled_conns():
+    """Closes every pooled connection owned by the current thread."""
+    for conn in getattr(_local, "pool", {}).values():
+        conn.close()
+    _local.pool = OrderedDict()
+
+
+def init_shard(user_id: int, email: str):
+    """
+    Creates the user's row in their own shard (so foreign keys hold there) and seeds
+    the default envelopes the first time only. Idempotent.
+    """
+    with get_conn(user_id) as conn:
+        created = conn.execute(
+            "INSERT OR IGNORE INTO users(id, email, password_hash, is_verified) VALUES (?, ?, '', 1)",
+            (user_id, email)
+        ).rowcount
+        if created:
+            seed_defaults_for_user(user_id, conn)
+
+
+def shard_paths():
+    """Every shard file present under SHARD_DIR."""
+    return sorted(SHARD_DIR.glob("*/user_*.sqlite3")) if SHARD_DIR is not None else []
+
+
 def init_db():
-    from pathlib import Path
-    schema = Path(__file__).with_name("schema.sql").read_text(encoding="utf-8")
-    with get_conn() as conn:
-        conn.executescript(schema)
+    """
+    Creates or migrates DB_PATH now rather than on first use (shards are still
+    initialised on first use by get_conn).
+    """
+    _ready(DB_PATH)
+
+
+def schema_version() -> int:
+    """The newest migration: PRAGMA user_version of an up-to-date database."""
+    global _schema_version
+    if _schema_version is None:
+        _schema_version = max((v for v, _ in _migration_files()), default=0)
+    return _schema_version
+
+
+def _init_schema(conn):
+    """
+    An up-to-date database costs one PRAGMA read. Otherwise every step re-checks
+    user_version under the write lock, so workers starting together against a new
+    or old file never apply the same step twice.
+    """
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= schema_version():
+        return
+    fresh = not conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='transactions'"
+    ).fetchone()
+    if fresh:
+        # schema.sql is the current schema: no migration has anything left to do.
+        schema = Path(__file__).with_name("schema.sql").read_text(encoding="utf-8")
+        _apply_script(conn, schema, schema_version())
+    else:
+        apply_migrations(conn)
+
+
+def _migration_files():
+    """Returns [(version, path)] for migrations/NNNN_name.sql, sorted by version."""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        version = int(path.name.split("_", 1)[0])
+        migrations.append((version, path))
+    return sorted(migrations)
+
+
+def apply_migrations(conn):
+    """
+    Applies every migration newer than PRAGMA user_version, each in its own
+    transaction together with the user_version bump. Returns the new version.
+    """
+    current = conn.execute("PRAGMA user_version").fetchone()[0]
+    for version, path in _migration_files():
+        if version <= current:
+            continue
+        _apply_script(conn, path.read_text(encoding="utf-8"), version)
+        current = version
+    return current
+
+
+def _apply_script(conn, sql: str, version: int):
+    """
+    Runs sql and sets user_version = version in one BEGIN IMMEDIATE transaction,
+    unless another process got the database to that version first.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            conn.rollback()
+            return
+        statement = ""
+        for line in sql.splitlines(keepends=True):
+            statement += line
+            if sqlite3.complete_statement(statement):
+                conn.execute(statement)
+                statement = ""
+        conn.execute(f"PRAGMA user_version = {int(version)}")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+
+
+def apply_balance_delta(conn, user_id: int, category_id: int, currency: str, delta: int):
+    """Adds delta to the running balance. Call inside the same transaction as the ledger INSERT."""
+    apply_balance_deltas(conn, user_id, {(category_id, currency): delta})
+
+
+def apply_balance_deltas(conn, user_id: int, deltas: dict):
+    """Batch form of apply_balance_delta: deltas maps (category_id, currency) -> delta in minor units."""
+    conn.executemany("""
+        INSERT INTO balances(user_id, category_id, currency, amount_cents)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(user_id, category_id, currency)
+        DO UPDATE SET amount_cents = amount_cents + excluded.amount_cents
+    """, [(user_id, category_id, currency, delta) for (category_id, currency), delta in deltas.items()])
+
+
+def apply_daily_totals(conn, user_id: int, totals: dict):
+    """
+    Adds to the daily_totals rollup; totals maps (category_id, currency, day) ->
+    (deposits, withdrawals) in minor units. Call inside the same transaction as the ledger INSERT.
+    """
+    conn.executemany("""
+        INSERT INTO daily_totals(user_id, day, currency, category_id, deposits, withdrawals)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(user_id, day, currency, category_id)
+        DO UPDATE SET deposits = deposits + excluded.deposits,
+                      withdrawals = withdrawals + excluded.withdrawals
+    """, [
+        (user_id, day, currency, category_id, deposits, withdrawals)
+        for (category_id, currency, day), (deposits, withdrawals) in totals.items()
+    ])
+
+
+def daily_totals_pending_before(conn, user_id: int):
+    """Days before the returned date are not rolled up yet (None: the rollup covers everything)."""
+    row = conn.execute(
+        "SELECT pending_before FROM daily_totals_backfill WHERE user_id=?", (user_id,)
+    ).fetchone()
+    return row["pending_before"] if row else None
+
+
+def backfill_daily_totals(conn, user_id: int, chunk_days: int = 92, progress=None):
+    """
+    Rolls up a user's pending history into daily_totals, newest days first, one
+    chunk per transaction: each chunk recomputes its days from raw rows and moves
+    pending_before back, so the backfill can be interrupted and resumed at any point.
+    Returns the number of chunks processed.
+    """
+    chunks = 0
+    while True:
+        before = daily_totals_pending_before(conn, user_id)
+        if before is None:
+            return chunks
+        last_day = (date.fromisoformat(before) - timedelta(days=1)).isoformat()
+        newest = conn.execute(
+            "SELECT MAX(tx_date) AS d FROM transactions WHERE user_id=? AND tx_date < ?", (user_id, before)
+        ).fetchone()["d"]
+        # Archived years have no rows left in the hot table but still need rolling up.
+        for year in archived_years(conn, end=last_day[:4]):
+            newest = max(newest or "", min(f"{year:04d}-12-31", last_day))
+        if newest is None:
+            with conn:
+                conn.execute("DELETE FROM daily_totals_backfill WHERE user_id=?", (user_id,))
+            continue
+        start = (date.fromisoformat(newest) - timedelta(days=chunk_days - 1)).isoformat()
+        with ExitStack() as stack:
+            segments = [
+                (lo, hi, stack.enter_context(ledger_sources(conn, year)))
+                for lo, hi, year in ledger_segments(conn, start, last_day)
+            ]
+            with conn:
+                conn.execute(
+                    "DELETE FROM daily_totals WHERE user_id=? AND day >= ? AND day < ?", (user_id, start, before)
+                )
+                for lo, hi, sources in segments:
+                    for source in sources:
+                        conn.execute(f"""
+                            INSERT INTO daily_totals(user_id, day, currency, category_id, deposits, withdrawals)
+                            SELECT user_id, tx_date, currency, category_id,
+                                   SUM(CASE WHEN type='deposit' THEN amount_cents ELSE 0 END),
+                                   SUM(CASE WHEN type='withdraw' THEN amount_cents ELSE 0 END)
+                            FROM {source}
+                            WHERE user_id=? AND tx_date >= ? AND tx_date <= ?
+                              AND category_id IN (SELECT id FROM categories WHERE user_id=? AND deleted_at IS NULL)
+                            GROUP BY tx_date, currency, category_id
+                            ON CONFLICT(user_id, day, currency, category_id)
+                            DO UPDATE SET deposits = deposits + excluded.deposits,
+                                          withdrawals = withdrawals + excluded.withdrawals
+                        """, (user_id, lo, hi, user_id))
+                conn.execute("UPDATE daily_totals_backfill SET pending_before=? WHERE user_id=?", (start, user_id))
+        chunks += 1
+        if progress:
+            progress(user_id, start, before)
+
+
+def bump_ledger_version(conn, user_id: int):
+    """Marks the user's ledger as changed. Call inside the same transaction as the write."""
+    conn.execute("""
+        INSERT INTO ledger_versions(user_id, version, updated_at)
+        VALUES (?, 1, CAST(strftime('%s', 'now') AS INTEGER))
+        ON CONFLICT(user_id)
+        DO UPDATE SET version = version + 1, updated_at = excluded.updated_at
+    """, (user_id,))
+
+
+def ledger_version(conn, user_id: int):
+    """Returns (version, updated_at unix seconds); (0, None) before the user's first write."""
+    row = conn.execute(
+        "SELECT version, updated_at FROM ledger_versions WHERE user_id=?", (user_id,)
+    ).fetchone()
+    return (row["version"], row["updated_at"]) if row else (0, None)
+
+
+def record_transaction(conn, user_id: int, category_id: int, tx_type: str, amount: int, currency: str,
+                       tx_date: str, note=None, idempotency_key=None):
+    """
+    Atomically stores one deposit/withdraw and its balance delta.
+    Runs in its own BEGIN IMMEDIATE transaction (call it outside any open one), so
+    concurrent writers in other workers queue on SQLite's write lock instead of
+    racing a read-then-write balance check. A withdraw only succeeds if the
+    conditional UPDATE finds enough money in the envelope.
+    Returns "saved", "duplicate" (idempotency_key already stored) or "insufficient".
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        status = write_transaction(conn, user_id, category_id, tx_type, amount, currency, tx_date,
+                                   note, idempotency_key)
+        if status == "saved":
+            conn.commit()
+        else:
+            conn.rollback()
+    except BaseException:
+        conn.rollback()
+        raise
+    return status
+
+
+def record_transactions(conn, user_id: int, entries, idempotency_key=None):
+    """
+    Batch form of record_transaction: entries are (category_id, tx_type, amount,
+    currency, tx_date, note) tuples, written all-or-nothing in one BEGIN IMMEDIATE
+    transaction. Withdrawals are checked with one balances read for every envelope
+    involved (deposits in the same batch count towards them).
+    Returns (status, shortfalls): status is "saved", "duplicate" or "insufficient",
+    shortfalls lists (category_id, currency, available, net change) when insufficient.
+    """
+    keys = [f"{idempotency_key}-{i}" if idempotency_key else None for i in range(len(entries))]
+    deltas = {}
+    daily = {}
+    for category_id, tx_type, amount, currency, tx_date, note in entries:
+        key = (category_id, currency)
+        deltas[key] = deltas.get(key, 0) + (amount if tx_type == "deposit" else -amount)
+        deposits, withdrawals = daily.get((category_id, currency, tx_date), (0, 0))
+        daily[(category_id, currency, tx_date)] = (
+            (deposits + amount, withdrawals) if tx_type == "deposit" else (deposits, withdrawals + amount)
+        )
+    withdrawn = {(category_id, currency) for category_id, tx_type, _, currency, _, _ in entries
+                 if tx_type == "withdraw"}
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if idempotency_key and conn.execute(
+            "SELECT 1 FROM transactions WHERE user_id=? AND idempotency_key=?", (user_id, keys[0])
+        ).fetchone():
+            conn.rollback()
+            return "duplicate", []
+
+        if withdrawn:
+            category_ids = sorted({category_id for category_id, _ in withdrawn})
+            available = {
+                (r["category_id"], r["currency"]): r["amount_cents"]
+                for r in conn.execute(f"""
+                    SELECT category_id, currency, amount_cents FROM balances
+                    WHERE user_id=? AND category_id IN ({", ".join("?" * len(category_ids))})
+                """, (user_id, *category_ids))
+            }
+            shortfalls = [
+                (category_id, currency, available.get((category_id, currency), 0), deltas[(category_id, currency)])
+                for category_id, currency in sorted(withdrawn)
+                if available.get((category_id, currency), 0) + deltas[(category_id, currency)] < 0
+            ]
+            if shortfalls:
+                conn.rollback()
+                return "insufficient", shortfalls
+
+        conn.executemany("""
+            INSERT INTO transactions(user_id, category_id, type, amount_cents, currency, tx_date, note, idempotency_key)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, [(user_id, *entry, key) for entry, key in zip(entries, keys)])
+        apply_balance_deltas(conn, user_id, deltas)
+        apply_daily_totals(conn, user_id, daily)
+        bump_ledger_version(conn, user_id)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return "saved", []
+
+
+def write_transaction(conn, user_id: int, category_id: int, tx_type: str, amount: int, currency: str,
+                      tx_date: str, note=None, idempotency_key=None):
+    """
+    The body of record_transaction, for callers that own the write transaction
+    (group_commit batches many of these under one COMMIT). Writes nothing unless
+    it returns "saved".
+    """
+    if idempotency_key and conn.execute(
+        "SELECT 1 FROM transactions WHERE user_id=? AND idempotency_key=?",
+        (user_id, idempotency_key)
+    ).fetchone():
+        return "duplicate"
+
+    if tx_type == "withdraw":
+        cur = conn.execute("""
+            UPDATE balances SET amount_cents = amount_cents - ?
+            WHERE user_id=? AND category_id=? AND currency=? AND amount_cents >= ?
+        """, (amount, user_id, category_id, currency, amount))
+        if cur.rowcount == 0:
+            return "insufficient"
+    else:
+        apply_balance_delta(conn, user_id, category_id, currency, amount)
+
+    conn.execute("""
+        INSERT INTO transactions(user_id, category_id, type, amount_cents, currency, tx_date, note, idempotency_key)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (user_id, category_id, tx_type, amount, currency, tx_date, note, idempotency_key))
+    apply_daily_totals(conn, user_id, {
+        (category_id, currency, tx_date): (amount, 0) if tx_type == "deposit" else (0, amount)
+    })
+    bump_ledger_version(conn, user_id)
+    return "saved"
+
+
+@contextmanager
+def deferred_indexes(conn, table: str):
+    """
+    Drops the table's secondary indexes for the duration of a bulk load and
+    recreates them afterwards: one sorted index build is far cheaper than
+    maintaining every index row by row. Only for offline/CLI bulk loads.
+    """
+    indexes = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+        (table,)
+    ).fetchall()
+    with conn:
+        for r in indexes:
+            conn.execute(f'DROP INDEX IF EXISTS "{r["name"]}"')
+    try:
+        yield
+    finally:
+        with conn:
+            for r in indexes:
+                conn.execute(r["sql"].replace("CREATE INDEX", "CREATE INDEX IF NOT EXISTS", 1))
+
+
+def archive_dir(path) -> Path:
+    """Where the yearly archive files of the database at path live: <name>_archive/ next to it."""
+    path = Path(path)
+    return path.with_name(f"{path.stem}_archive")
+
+
+def archive_path(conn, year: int) -> Path:
+    """<name>_archive/<year>.sqlite3 next to the database file conn has open as main."""
+    main = next(r["file"] for r in conn.execute("PRAGMA database_list") if r["name"] == "main")
+    return archive_dir(main) / f"{int(year)}.sqlite3"
+
+
+def archived_years(conn, start=None, end=None):
+    """Years (optionally start..end, as ints or "YYYY") whose transactions live in archive files, oldest first."""
+    return [r["year"] for r in conn.execute(
+        "SELECT year FROM ledger_archives WHERE year >= ? AND year <= ? ORDER BY year",
+        (int(start or 0), int(end or 9999))
+    )]
+
+
+def _year_of(day, default: str) -> str:
+    """The "YYYY" prefix of an ISO date; default when day is None or does not start with one."""
+    return day[:4] if day and day[:4].isdigit() else default
+
+
+@contextmanager
+def attached_archive(conn, year: int, create: bool = False):
+    """
+    ATTACHes the year's archive file as archive_<year> for the duration of the
+    block and yields that schema name (already attached: left as it is). Must not
+    be entered inside a transaction; SQLite refuses ATTACH and DETACH there.
+    """
+    schema = f"archive_{int(year)}"
+    if any(r["name"] == schema for r in conn.execute("PRAGMA database_list")):
+        yield schema
+        return
+    path = archive_path(conn, year)
+    if not create and not path.exists():
+        raise FileNotFoundError(f"Archive for {year} is registered but missing: {path}")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn.execute(f"ATTACH DATABASE ? AS {schema}", (str(path),))
+    try:
+        yield schema
+    finally:
+        conn.execute(f"DETACH DATABASE {schema}")
+
+
+def ledger_segments(conn, start=None, end=None):
+    """
+    Splits the ISO date range start..end (None: open-ended) into consecutive
+    (lo, hi, year) ranges, oldest first, each reaching into at most one archived
+    year (year is None for the range that only the hot table covers).
+    """
+    segments = []
+    lo = start
+    for year in archived_years(conn, _year_of(start, "0"), _year_of(end, "9999")):
+        segments.append((lo, f"{year:04d}-12-31" if end is None else min(f"{year:04d}-12-31", end), year))
+        lo = f"{year + 1:04d}-01-01"
+    if lo is None or end is None or lo <= end:
+        segments.append((lo, end, None))
+    return segments
+
+
+@contextmanager
+def ledger_sources(conn, year=None):
+    """
+    Yields the tables holding one ledger_segments() range: the hot transactions
+    table, plus the year's archive attached for the duration of the block. Hot
+    rows may be dated in an archived year too (back-dated entries, imports), so
+    readers always combine both.
+    """
+    if year is None:
+        yield ["transactions"]
+        return
+    with attached_archive(conn, year) as schema:
+        yield ["transactions", f"{schema}.transactions"]
+
+
+# Archived rows left the transactions table; their net per envelope and currency
+# is carried forward in opening_balances.
+_LEDGER_BALANCES_SQL = """
+    SELECT user_id, category_id, currency, SUM(amount_cents) AS amount_cents
+    FROM (
+        SELECT user_id, category_id, currency,
+               CASE WHEN type='deposit' THEN amount_cents ELSE -amount_cents END AS amount_cents
+        FROM transactions
+        UNION ALL
+        SELECT user_id, category_id, currency, amount_cents FROM opening_balances
+    )
+    WHERE category_id NOT IN (SELECT id FROM categories WHERE deleted_at IS NOT NULL)
+    GROUP BY user_id, category_id, currency
+"""
+
+
+def rebuild_balances(conn):
+    """Recomputes the balances table from transactions (and the opening balances of archived years)."""
+    conn.execute("DELETE FROM balances")
+    conn.execute(f"INSERT INTO balances(user_id, category_id, currency, amount_cents) {_LEDGER_BALANCES_SQL}")
+    # Displayed balances may have changed: invalidate every user's cached pages.
+    conn.execute("UPDATE ledger_versions SET version = version + 1, updated_at = CAST(strftime('%s', 'now') AS INTEGER)")
+
+
+def balance_drift(conn):
+    """
+    Compares the balances table with a fresh aggregation of transactions.
+    Returns a list of (user_id, category_id, currency, stored, expected) rows that disagree
+    (amounts in minor units; integer sums, so any difference is real drift).
+    """
+    expected = {
+        (r["user_id"], r["category_id"], r["currency"]): r["amount_cents"] or 0
+        for r in conn.execute(_LEDGER_BALANCES_SQL).fetchall()
+    }
+    stored = {
+        (r["user_id"], r["category_id"], r["currency"]): r["amount_cents"] or 0
+        for r in conn.execute("SELECT user_id, category_id, currency, amount_cents FROM balances").fetchall()
+    }
+
+    drift = []
+    for key in sorted(set(expected) | set(stored)):
+        have = stored.get(key, 0)
+        want = expected.get(key, 0)
+        if have != want:
+            drift.append((*key, have, want))
+    return drift
 
 def seed_defaults_for_user(user_id: int, conn=None):
     defaults = ["Health", "Shopping", "Transportation", "Car Accessories", "Entertainment", "Personal"]
@@ -0,0 +1,114 @@
+# group_commit.py — Optional group commit for deposit/withdraw inserts.
+#
+# With SRN_GROUP_COMMIT=1, save_tx hands its write to one background writer thread
+# per worker process instead of committing on its own. The writer takes every
+# request that queued up while the previous batch was committing (plus any arriving
+# within SRN_GROUP_COMMIT_MS, default 0: no added latency) and applies them in a single
+# BEGIN IMMEDIATE ... COMMIT (one WAL sync for the whole batch), each inside its own
+# SAVEPOINT so one failing request never takes the others down. Every request still
+# blocks until the COMMIT containing its row has returned, so a "Saved." reply means
+# the same as before.
+
+import os
+import queue
+import threading
+import time
+
+import db
+import metrics
+from background import ProcessThread
+
+ENABLED = os.environ.get("SRN_GROUP_COMMIT", "0") == "1"
+WINDOW_SECONDS = float(os.environ.get("SRN_GROUP_COMMIT_MS", "0")) / 1000
+MAX_BATCH = int(os.environ.get("SRN_GROUP_COMMIT_MAX", "256"))
+WAIT_TIMEOUT = 30
+
+BATCH_SIZE = metrics.register(metrics.Histogram(
+    "srn_group_commit_batch_size", "Transactions committed per group commit.", metrics.QUERY_COUNT_BUCKETS,
+))
+
+
+class _Job:
+    __slots__ = ("args", "done", "status", "error")
+
+    def __init__(self, args):
+        self.args = args
+        self.done = threading.Event()
+        self.status = None
+        self.error = None
+
+
+class GroupCommitWriter(ProcessThread):
+    thread_name = "srn-group-commit"
+
+    def __init__(self, window: float = WINDOW_SECONDS, max_batch: int = MAX_BATCH):
+        super().__init__()
+        self.window = window
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+
+    def submit(self, user_id: int, category_id: int, tx_type: str, amount: int, currency: str,
+               tx_date: str, note=None, idempotency_key=None):
+        """Same contract as db.record_transaction; returns once the row is committed."""
+        self._ensure_thread()
+        job = _Job((user_id, category_id, tx_type, amount, currency, tx_date, note, idempotency_key))
+        self._queue.put(job)
+        if not job.done.wait(WAIT_TIMEOUT):
+            raise TimeoutError("group commit writer did not answer")
+        if job.error is not None:
+            raise job.error
+        return job.status
+
+    def _reset(self):
+        self._queue = queue.Queue()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._commit(batch)
+
+    def _commit(self, batch):
+        try:
+            self._commit_by_shard(batch)
+        finally:
+            # Like a request's teardown: closes unpooled connections (SRN_DB_POOL=0).
+            db.release_conn()
+
+    def _commit_by_shard(self, batch):
+        # Sharded deployments: one transaction per shard touched by the batch.
+        by_path = {}
+        for job in batch:
+            by_path.setdefault(str(db.shard_path(job.args[0])) if db.SHARD_DIR else "", []).append(job)
+
+        for jobs in by_path.values():
+            conn = None
+            try:
+                conn = db.get_conn(jobs[0].args[0])
+                conn.execute("BEGIN IMMEDIATE")
+                for i, job in enumerate(jobs):
+                    conn.execute(f"SAVEPOINT job{i}")
+                    try:
+                        job.status = db.write_transaction(conn, *job.args)
+                    except Exception as e:  # this request only
+                        conn.execute(f"ROLLBACK TO job{i}")
+                        job.error = e
+                    conn.execute(f"RELEASE job{i}")
+                conn.commit()
+            except Exception as e:
+                if conn is not None and conn.in_transaction:
+                    conn.rollback()
+                for job in jobs:
+                    job.status, job.error = None, e
+            BATCH_SIZE.observe(len(jobs))
+            for job in jobs:
+                job.done.set()
+
+
+writer = GroupCommitWriter()
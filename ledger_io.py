@@ -0,0 +1,183 @@
+# ledger_io.py — Streaming export and bulk import of transactions (CSV / JSONL).
+#
+# Export streams the ledger from its cursors and yields text chunks, so memory stays
+# constant however many years of history there are (archived years are merged in
+# from their files one year at a time). Import validates each row with the same
+# rules as save_tx (the caller passes app.validate_tx_fields) and writes in batched
+# executemany transactions, keeping the balances and daily_totals tables in step.
+
+import csv
+import heapq
+import io
+import json
+from contextlib import ExitStack, closing
+from itertools import islice
+
+from db import apply_balance_deltas, apply_daily_totals, bump_ledger_version, ledger_segments, ledger_sources
+from money import format_amount
+
+EXPORT_COLUMNS = ["id", "tx_date", "type", "amount", "currency", "category", "note", "created_at"]
+EXPORT_BATCH = 1000
+IMPORT_BATCH = 10000
+FORMATS = ("csv", "jsonl")
+
+
+def _export_rows(conn, user_id: int):
+    for lo, hi, year in ledger_segments(conn):
+        with ledger_sources(conn, year) as sources, ExitStack() as stack:
+            cursors = [stack.enter_context(closing(conn.execute(f"""
+                SELECT t.id, t.tx_date, t.type, t.amount_cents, t.currency,
+                       c.name AS category, t.note, t.created_at
+                FROM {source} t
+                JOIN categories c ON c.id = t.category_id AND c.deleted_at IS NULL
+                WHERE t.user_id=? AND t.tx_date >= ? AND t.tx_date <= ?
+                ORDER BY t.tx_date ASC, t.id ASC
+            """, (user_id, lo or "0000-01-01", hi or "9999-12-31")))) for source in sources]
+            # Hot rows dated in an archived year merge into place; a batch mid-move is in both.
+            last_id = None
+            for r in heapq.merge(*cursors, key=lambda r: (r["tx_date"], r["id"])):
+                if r["id"] != last_id:
+                    last_id = r["id"]
+                    yield r
+
+
+def _export_batches(conn, user_id: int):
+    rows = _export_rows(conn, user_id)
+    while True:
+        batch = list(islice(rows, EXPORT_BATCH))
+        if not batch:
+            return
+        # Exports carry exact decimal strings in major units ("12.50"), like the import format.
+        yield [
+            (r["id"], r["tx_date"], r["type"], format_amount(r["amount_cents"], r["currency"]),
+             r["currency"], r["category"], r["note"], r["created_at"])
+            for r in batch
+        ]
+
+
+def export_csv(conn, user_id: int):
+    """Yields the user's ledger as CSV text, one chunk per EXPORT_BATCH rows."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    for batch in _export_batches(conn, user_id):
+        writer.writerows(batch)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+def export_jsonl(conn, user_id: int):
+    """Yields the user's ledger as JSON Lines, one chunk per EXPORT_BATCH rows."""
+    for batch in _export_batches(conn, user_id):
+        yield "".join(json.dumps(dict(zip(EXPORT_COLUMNS, r)), ensure_ascii=False) + "\n" for r in batch)
+
+
+def read_records(stream, fmt: str):
+    """Yields (line_no, dict) from a text stream in csv or jsonl format."""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_no, record if isinstance(record, dict) else {}
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+
+def _text(value):
+    return "" if value is None else str(value).strip()
+
+
+def import_transactions(conn, user_id: int, records, validate, batch_size: int = IMPORT_BATCH,
+                        dry_run: bool = False, max_errors: int = 100):
+    """
+    Imports (line_no, record) pairs for user_id. Records need tx_date, type, amount,
+    currency and category (by name; missing categories are created), note is optional.
+    Invalid rows are skipped and reported. Returns a summary dict.
+    """
+    categories = {
+        r["name"].lower(): r["id"]
+        for r in conn.execute(
+            "SELECT id, name FROM categories WHERE user_id=? AND deleted_at IS NULL", (user_id,)
+        ).fetchall()
+    }
+    summary = {"imported": 0, "skipped": 0, "categories_created": 0, "errors": []}
+
+    def reject(line_no, message):
+        summary["skipped"] += 1
+        if len(summary["errors"]) < max_errors:
+            summary["errors"].append((line_no, message))
+
+    pending = []
+    deltas = {}
+    daily = {}
+
+    def flush():
+        if not pending:
+            return
+        if not dry_run:
+            with conn:
+                conn.executemany("""
+                    INSERT INTO transactions(user_id, category_id, type, amount_cents, currency, tx_date, note)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, pending)
+                apply_balance_deltas(conn, user_id, deltas)
+                apply_daily_totals(conn, user_id, daily)
+                bump_ledger_version(conn, user_id)
+        summary["imported"] += len(pending)
+        pending.clear()
+        deltas.clear()
+        daily.clear()
+
+    for line_no, record in records:
+        tx_type = _text(record.get("type"))
+        currency = _text(record.get("currency")).upper()
+        tx_date = _text(record.get("tx_date"))
+        try:
+            amount = validate(tx_type, currency, _text(record.get("amount")), tx_date)
+        except ValueError as e:
+            reject(line_no, str(e))
+            continue
+
+        name = " ".join(_text(record.get("category")).split())
+        if not name or len(name) > 40:
+            reject(line_no, "Category name is required (max 40).")
+            continue
+
+        category_id = categories.get(name.lower())
+        if category_id is None:
+            if dry_run:
+                category_id = -len(categories) - 1
+            else:
+                with conn:
+                    category_id = conn.execute(
+                        "INSERT INTO categories(user_id, name, is_default) VALUES (?, ?, 0)",
+                        (user_id, name)
+                    ).lastrowid
+                    bump_ledger_version(conn, user_id)
+            categories[name.lower()] = category_id
+            summary["categories_created"] += 1
+
+        note = _text(record.get("note")) or None
+        pending.append((user_id, category_id, tx_type, amount, currency, tx_date, note))
+        key = (category_id, currency)
+        deltas[key] = deltas.get(key, 0) + (amount if tx_type == "deposit" else -amount)
+        day_key = (category_id, currency, tx_date)
+        deposits, withdrawals = daily.get(day_key, (0, 0))
+        daily[day_key] = (deposits + amount, withdrawals) if tx_type == "deposit" else (deposits, withdrawals + amount)
+
+        if len(pending) >= batch_size:
+            flush()
+
+    flush()
+    return summary
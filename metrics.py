@@ -0,0 +1,163 @@
+# metrics.py — In-process hot-path instrumentation exported in Prometheus text format.
+#
+# Per-endpoint request latency, SQL query count/latency per request (observed by the
+# connection wrapper in db.py), chart render time and chart cache hit rates.
+# Everything lives in this process's memory: under gunicorn each worker reports its
+# own numbers (scrape with a per-worker target or aggregate by instance).
+
+import threading
+import time
+
+from flask import request
+
+import db
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 250)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labelvalues):
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labelvalues, series in items:
+            base = _labels(self.labelnames, labelvalues)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le=bound)} {count}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, labelvalues, le='+Inf')} {series[-2]}")
+            lines.append(f"{self.name}_count{base} {series[-2]}")
+            lines.append(f"{self.name}_sum{base} {series[-1]:.6f}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues, amount=1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for labelvalues, value in items:
+            lines.append(f"{self.name}{_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Gauge:
+    """Read at scrape time from a callback, so the hot path pays nothing."""
+
+    def __init__(self, name: str, help_text: str, read, kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.read = read
+        self.kind = kind
+
+    def render(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}", f"{self.name} {self.read()}"]
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+REQUEST_SECONDS = Histogram(
+    "srn_http_request_duration_seconds", "Request latency by Flask endpoint.",
+    LATENCY_BUCKETS, ("endpoint", "method"),
+)
+REQUESTS_TOTAL = Counter(
+    "srn_http_requests_total", "Requests by Flask endpoint and status.", ("endpoint", "method", "status"),
+)
+SQL_QUERY_SECONDS = Histogram(
+    "srn_sql_query_duration_seconds", "SQLite statement latency by Flask endpoint.",
+    LATENCY_BUCKETS, ("endpoint",),
+)
+SQL_QUERIES_PER_REQUEST = Histogram(
+    "srn_sql_queries_per_request", "SQLite statements executed per request.",
+    QUERY_COUNT_BUCKETS, ("endpoint",),
+)
+CHART_RENDER_SECONDS = Histogram(
+    "srn_chart_render_seconds", "matplotlib donut render time.", LATENCY_BUCKETS,
+)
+
+_registry = [REQUEST_SECONDS, REQUESTS_TOTAL, SQL_QUERY_SECONDS, SQL_QUERIES_PER_REQUEST, CHART_RENDER_SECONDS]
+_local = threading.local()
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def observe_query(seconds: float):
+    """db.QUERY_OBSERVER hook: called once per execute/executemany/executescript."""
+    endpoint = getattr(_local, "endpoint", None)
+    if endpoint is None:
+        endpoint = "_background"
+    else:
+        _local.queries += 1
+    SQL_QUERY_SECONDS.observe(seconds, endpoint)
+
+
+def _start_request():
+    _local.endpoint = request.endpoint or "_unmatched"
+    _local.queries = 0
+    _local.started = time.perf_counter()
+
+
+def _finish_request(response):
+    endpoint = getattr(_local, "endpoint", None)
+    if endpoint is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - _local.started, endpoint, request.method)
+        REQUESTS_TOTAL.inc(endpoint, request.method, response.status_code)
+        SQL_QUERIES_PER_REQUEST.observe(_local.queries, endpoint)
+        _local.endpoint = None
+    return response
+
+
+def init_app(app):
+    """Installs the timing hooks; call before any other before_request handler is registered."""
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    db.QUERY_OBSERVER = observe_query
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,17 @@
+-- Databases created before the balances table existed: create and fill it from the ledger.
+CREATE TABLE IF NOT EXISTS balances (
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  amount REAL NOT NULL DEFAULT 0,
+  PRIMARY KEY(user_id, category_id, currency),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+DELETE FROM balances;
+INSERT INTO balances(user_id, category_id, currency, amount)
+SELECT user_id, category_id, currency,
+       SUM(CASE WHEN type='deposit' THEN amount ELSE -amount END)
+FROM transactions
+GROUP BY user_id, category_id, currency;
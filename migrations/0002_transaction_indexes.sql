@@ -0,0 +1,19 @@
+-- Access paths used by app.py routes.
+
+-- Per-envelope balances / rebuilds: WHERE user_id=? AND category_id=? [AND currency=?]
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_currency
+  ON transactions(user_id, category_id, currency);
+
+-- /transactions history: WHERE user_id=? ORDER BY tx_date DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+  ON transactions(user_id, tx_date, id);
+
+-- /reports: WHERE user_id=? AND currency=? AND tx_date BETWEEN ... GROUP BY type (covering)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_currency_date
+  ON transactions(user_id, currency, tx_date, type, amount);
+
+-- ON DELETE CASCADE from categories looks children up by category_id alone.
+CREATE INDEX IF NOT EXISTS idx_transactions_category
+  ON transactions(category_id);
+CREATE INDEX IF NOT EXISTS idx_balances_category
+  ON balances(category_id);
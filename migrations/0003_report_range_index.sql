@@ -0,0 +1,6 @@
+-- Reports aggregate every currency in one pass over a date range, so the covering
+-- index leads with (user_id, tx_date) instead of an equality on currency.
+DROP INDEX IF EXISTS idx_transactions_user_currency_date;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_report
+  ON transactions(user_id, tx_date, currency, type, category_id, amount);
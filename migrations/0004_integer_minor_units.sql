@@ -0,0 +1,70 @@
+-- Move money from REAL to exact integer minor units (amount_cents).
+-- Every currency in money.CURRENCY_SCALE has scale 2 at this version, hence * 100.
+
+CREATE TABLE transactions_new (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  type TEXT NOT NULL CHECK(type IN ('deposit','withdraw')),
+  amount_cents INTEGER NOT NULL CHECK(amount_cents > 0),
+  currency TEXT NOT NULL,
+  tx_date TEXT NOT NULL,
+  note TEXT,
+  created_at TEXT NOT NULL DEFAULT (datetime('now')),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+-- Sub-cent legacy amounts round up to one cent so the CHECK still holds.
+INSERT INTO transactions_new(id, user_id, category_id, type, amount_cents, currency, tx_date, note, created_at)
+SELECT id, user_id, category_id, type, MAX(CAST(ROUND(amount * 100) AS INTEGER), 1), currency, tx_date, note, created_at
+FROM transactions;
+
+-- Rounding row by row can shift an envelope's net by a few cents (5 x 10.333 in and
+-- 51.665 out nets 0.00 but rounds to -0.02). Where it does, one entry on the
+-- envelope's last date brings it back to its legacy net rounded once; the note
+-- marks it, so the adjustment shows in the ledger and exports.
+INSERT INTO transactions_new(user_id, category_id, type, amount_cents, currency, tx_date, note)
+SELECT user_id, category_id, CASE WHEN diff > 0 THEN 'deposit' ELSE 'withdraw' END,
+       ABS(diff), currency, last_date, 'Rounding adjustment (conversion to cents)'
+FROM (
+  SELECT t.user_id, t.category_id, t.currency, MAX(t.tx_date) AS last_date,
+         CAST(ROUND(SUM(CASE WHEN t.type='deposit' THEN t.amount ELSE -t.amount END) * 100) AS INTEGER)
+         - SUM(CASE WHEN n.type='deposit' THEN n.amount_cents ELSE -n.amount_cents END) AS diff
+  FROM transactions t
+  JOIN transactions_new n ON n.id = t.id
+  GROUP BY t.user_id, t.category_id, t.currency
+)
+WHERE diff <> 0;
+
+DROP TABLE transactions;
+ALTER TABLE transactions_new RENAME TO transactions;
+
+CREATE INDEX idx_transactions_user_category_currency
+  ON transactions(user_id, category_id, currency);
+CREATE INDEX idx_transactions_user_date
+  ON transactions(user_id, tx_date, id);
+CREATE INDEX idx_transactions_user_date_report
+  ON transactions(user_id, tx_date, currency, type, category_id, amount_cents);
+CREATE INDEX idx_transactions_category
+  ON transactions(category_id);
+
+-- Balances are derived data: recreate them exactly from the converted ledger.
+DROP TABLE balances;
+CREATE TABLE balances (
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  amount_cents INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY(user_id, category_id, currency),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+CREATE INDEX idx_balances_category
+  ON balances(category_id);
+
+INSERT INTO balances(user_id, category_id, currency, amount_cents)
+SELECT user_id, category_id, currency,
+       SUM(CASE WHEN type='deposit' THEN amount_cents ELSE -amount_cents END)
+FROM transactions
+GROUP BY user_id, category_id, currency;
@@ -0,0 +1,6 @@
+-- Client-generated key per submitted form, so a retried or double-tapped
+-- deposit/withdraw (or an offline save replayed by the service worker) is stored once.
+ALTER TABLE transactions ADD COLUMN idempotency_key TEXT;
+
+CREATE UNIQUE INDEX idx_transactions_idempotency
+  ON transactions(user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
@@ -0,0 +1,11 @@
+-- Per-user ledger version, bumped in the same transaction as every write to
+-- transactions/categories. Pages use it for ETag/Last-Modified and fragment caching.
+CREATE TABLE IF NOT EXISTS ledger_versions (
+  user_id INTEGER PRIMARY KEY,
+  version INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL,  -- unix seconds of the last write
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+INSERT OR IGNORE INTO ledger_versions(user_id, version, updated_at)
+SELECT id, 1, CAST(strftime('%s', 'now') AS INTEGER) FROM users;
@@ -0,0 +1,27 @@
+-- Per-day rollup of the ledger for date-range reports, maintained on every insert
+-- (db.apply_daily_totals). Existing history is rolled up by `flask backfill-daily-totals`;
+-- until then daily_totals_backfill marks it pending and reports read raw rows for it.
+CREATE TABLE IF NOT EXISTS daily_totals (
+  user_id INTEGER NOT NULL,
+  day TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  category_id INTEGER NOT NULL,
+  deposits INTEGER NOT NULL DEFAULT 0,     -- minor units
+  withdrawals INTEGER NOT NULL DEFAULT 0,  -- minor units
+  PRIMARY KEY(user_id, day, currency, category_id),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_daily_totals_category
+  ON daily_totals(category_id);
+
+-- Days before pending_before are not rolled up yet for that user (no row: fully covered).
+CREATE TABLE IF NOT EXISTS daily_totals_backfill (
+  user_id INTEGER PRIMARY KEY,
+  pending_before TEXT NOT NULL,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+INSERT OR IGNORE INTO daily_totals_backfill(user_id, pending_before)
+SELECT DISTINCT user_id, '9999-12-31' FROM transactions;
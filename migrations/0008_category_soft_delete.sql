@@ -0,0 +1,8 @@
+-- Soft-deleted envelopes: delete_category only stamps deleted_at (and frees the name),
+-- and every read skips such rows. Their transactions and daily_totals rows are then
+-- removed in small batches by category_purge.py, which deletes the category last.
+ALTER TABLE categories ADD COLUMN deleted_at TEXT;
+
+-- Reports exclude a user's deleted envelopes; the purger lists every pending one.
+CREATE INDEX IF NOT EXISTS idx_categories_deleted
+  ON categories(user_id) WHERE deleted_at IS NOT NULL;
@@ -0,0 +1,22 @@
+-- Hot/cold ledger: closed years of transactions move to one SQLite file per year
+-- (see archive.py). The hot file keeps balances and daily_totals untouched, plus
+-- one carry-forward row per envelope and currency holding the net of every moved
+-- row, so the balances can still be checked against what is left here.
+CREATE TABLE IF NOT EXISTS ledger_archives (
+  year INTEGER PRIMARY KEY,
+  rows INTEGER NOT NULL DEFAULT 0,  -- transactions in the year's file after the last run
+  archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+CREATE TABLE IF NOT EXISTS opening_balances (
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  amount_cents INTEGER NOT NULL DEFAULT 0,  -- minor units: net of the archived rows
+  PRIMARY KEY(user_id, category_id, currency),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_opening_balances_category
+  ON opening_balances(category_id);
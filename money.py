@@ -0,0 +1,60 @@
+# money.py — Exact money handling: amounts are stored as integers in minor units.
+#
+# Each currency has a scale (number of decimal places, per ISO 4217). The ledger,
+# balances and report sums are all integers in minor units, so SQLite SUMs are exact
+# and comparisons need no epsilon. Convert only at the edges: parse user input with
+# parse_amount() and display with format_amount() / to_major().
+
+from decimal import Decimal, InvalidOperation
+
+CURRENCY_SCALE = {
+    "USD": 2,
+    "EUR": 2,
+    "TRY": 2,
+    "LBP": 2,
+}
+
+CURRENCIES = list(CURRENCY_SCALE)
+
+# Largest single amount accepted, in major units (LBP and TRY get room for their
+# smaller units). At these sizes a balance or report sum needs over 90,000
+# maximal entries (over 90 million for USD) before it leaves SQLite's int64.
+CURRENCY_MAX = {
+    "USD": 10 ** 9,
+    "EUR": 10 ** 9,
+    "TRY": 10 ** 10,
+    "LBP": 10 ** 12,
+}
+
+
+def parse_amount(raw, currency: str) -> int:
+    """
+    Parses a decimal string ("10.5") into minor units for currency.
+    Raises ValueError if it is not a finite number, has more decimals than the
+    currency allows or is larger than CURRENCY_MAX.
+    """
+    scale = CURRENCY_SCALE[currency]
+    try:
+        value = Decimal(str(raw).strip())
+    except InvalidOperation:
+        raise ValueError("not a number")
+    if not value.is_finite():
+        raise ValueError("not a number")
+    if abs(value) > CURRENCY_MAX[currency]:
+        raise ValueError(f"at most {CURRENCY_MAX[currency]:,}")
+
+    minor = value.scaleb(scale)
+    if minor != minor.to_integral_value():
+        raise ValueError(f"at most {scale} decimal places")
+    return int(minor)
+
+
+def to_major(minor: int, currency: str) -> float:
+    """Minor units -> float in major units (for JSON and charts only, never for arithmetic)."""
+    return minor / 10 ** CURRENCY_SCALE.get(currency, 2)
+
+
+def format_amount(minor, currency: str) -> str:
+    """Exact "1234.50"-style rendering of a minor-unit amount."""
+    scale = CURRENCY_SCALE.get(currency, 2)
+    return f"{Decimal(int(minor or 0)).scaleb(-scale):.{scale}f}"
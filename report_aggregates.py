@@ -0,0 +1,103 @@
+# report_aggregates.py — Income/expense aggregation for reports in a single pass.
+#
+# One GROUP BY over the date range yields the totals for every currency plus any
+# per-category and per-period breakdowns, so adding currencies or report widgets
+# never adds another scan. The pass reads the daily_totals rollup (at most one row
+# per day, currency and envelope, however many transactions that day had); raw
+# transactions are only read for days the rollup does not cover yet (see
+# db.backfill_daily_totals), attaching the archive file of any archived year in
+# that range. Only live envelopes count: deleted ones (purged or not) are left out.
+
+from datetime import date, timedelta
+
+from db import daily_totals_pending_before, ledger_segments, ledger_sources
+
+PERIOD_BUCKETS = {
+    "day": "{day}",
+    "week": "strftime('%Y-W%W', {day})",
+    "month": "substr({day}, 1, 7)",
+}
+
+
+def _empty_totals(currencies):
+    return {c: {"income": 0, "expense": 0} for c in currencies}
+
+
+def _grouped_sql(source: str, day_col: str, income: str, expense: str, by_category: bool, period, n_currencies):
+    group_cols = ["currency"]
+    if by_category:
+        group_cols.append("category_id")
+    if period is not None:
+        group_cols.append(f"{PERIOD_BUCKETS[period].format(day=day_col)} AS bucket")
+    return f"""
+        SELECT {", ".join(group_cols)}, SUM({income}) AS income, SUM({expense}) AS expense
+        FROM {source}
+        WHERE user_id = ?
+          AND {day_col} >= ?
+          AND {day_col} <= ?
+          AND currency IN ({", ".join("?" * n_currencies)})
+          AND category_id IN (SELECT id FROM categories WHERE user_id = ? AND deleted_at IS NULL)
+        GROUP BY {", ".join(str(i + 1) for i in range(len(group_cols)))}
+    """
+
+
+def aggregate_reports(conn, user_id: int, start: str, end: str, currencies,
+                      by_category: bool = False, period: str | None = None):
+    """
+    Returns {"totals": {currency: {"income", "expense"}},              # minor units
+             "by_category": {category_id: {currency: {...}}},   # when by_category
+             "by_period": {bucket: {currency: {...}}}}          # when period is day/week/month
+    computed from one grouped query over [start, end] (more while a backfill is pending).
+    """
+    if period is not None and period not in PERIOD_BUCKETS:
+        raise ValueError(f"Unknown report period: {period}")
+
+    currencies = list(currencies)
+    queries = []  # (sql, lo, hi, archived year or None)
+    pending_before = daily_totals_pending_before(conn, user_id)
+    rollup_start = start if pending_before is None else max(start, pending_before)
+    if rollup_start <= end:
+        queries.append((
+            _grouped_sql("daily_totals", "day", "deposits", "withdrawals", by_category, period, len(currencies)),
+            rollup_start, end, None,
+        ))
+    if pending_before is not None and start < pending_before:
+        raw_end = min(end, (date.fromisoformat(pending_before) - timedelta(days=1)).isoformat())
+        for lo, hi, year in ledger_segments(conn, start, raw_end):
+            queries.append((
+                _grouped_sql(
+                    "{source}", "tx_date",
+                    "CASE WHEN type='deposit' THEN amount_cents ELSE 0 END",
+                    "CASE WHEN type='withdraw' THEN amount_cents ELSE 0 END",
+                    by_category, period, len(currencies),
+                ),
+                lo, hi, year,
+            ))
+
+    result = {"totals": _empty_totals(currencies)}
+    if by_category:
+        result["by_category"] = {}
+    if period is not None:
+        result["by_period"] = {}
+
+    for sql, lo, hi, year in queries:
+        with ledger_sources(conn, year) as sources:
+            rows = [r for source in sources
+                    for r in conn.execute(sql.replace("{source}", source), (user_id, lo, hi, *currencies, user_id))]
+        for r in rows:
+            cur = r["currency"]
+            income = r["income"] or 0
+            expense = r["expense"] or 0
+
+            targets = [result["totals"]]
+            if by_category:
+                targets.append(result["by_category"].setdefault(r["category_id"], _empty_totals(currencies)))
+            if period is not None:
+                targets.append(result["by_period"].setdefault(r["bucket"], _empty_totals(currencies)))
+            for t in targets:
+                t[cur]["income"] += income
+                t[cur]["expense"] += expense
+
+    if period is not None:
+        result["by_period"] = dict(sorted(result["by_period"].items()))
+    return result
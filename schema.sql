@@ -1,3 +1,6 @@
+-- Full current schema, used to create fresh databases (stamped with the latest
+-- migration version). Existing databases are upgraded by migrations/ instead.
+
 PRAGMA foreign_keys = ON;
 
 CREATE TABLE IF NOT EXISTS categories (
@@ -5,6 +8,7 @@ CREATE TABLE IF NOT EXISTS categories (
   user_id INTEGER NOT NULL,
   name TEXT NOT NULL,
   is_default INTEGER NOT NULL DEFAULT 1,
+  deleted_at TEXT,  -- soft-deleted, rows purged in the background (see migrations/0008)
   FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
   UNIQUE(user_id, name)
 );
@@ -14,15 +18,28 @@ CREATE TABLE IF NOT EXISTS transactions (
   user_id INTEGER NOT NULL,
   category_id INTEGER NOT NULL,
   type TEXT NOT NULL CHECK(type IN ('deposit','withdraw')),
-  amount REAL NOT NULL CHECK(amount > 0),
+  amount_cents INTEGER NOT NULL CHECK(amount_cents > 0),  -- minor units, see money.CURRENCY_SCALE
   currency TEXT NOT NULL,
   tx_date TEXT NOT NULL,
   note TEXT,
+  idempotency_key TEXT,  -- one stored row per submitted form (see migrations/0005)
   created_at TEXT NOT NULL DEFAULT (datetime('now')),
   FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
   FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
 );
 
+-- Running balance per envelope and currency, maintained alongside every
+-- INSERT into transactions so reads never re-aggregate the whole ledger.
+CREATE TABLE IF NOT EXISTS balances (
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  amount_cents INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY(user_id, category_id, currency),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
 CREATE TABLE IF NOT EXISTS users (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   email TEXT NOT NULL UNIQUE,
@@ -33,3 +50,81 @@ CREATE TABLE IF NOT EXISTS users (
   created_at TEXT NOT NULL DEFAULT (datetime('now'))
 );
 
+-- Per-user ledger version, bumped with every write to transactions/categories
+-- (ETag/Last-Modified and fragment cache keys; see db.bump_ledger_version).
+CREATE TABLE IF NOT EXISTS ledger_versions (
+  user_id INTEGER PRIMARY KEY,
+  version INTEGER NOT NULL,
+  updated_at INTEGER NOT NULL,  -- unix seconds of the last write
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Per-day rollup for date-range reports, maintained on every insert
+-- (see migrations/0007 and db.apply_daily_totals).
+CREATE TABLE IF NOT EXISTS daily_totals (
+  user_id INTEGER NOT NULL,
+  day TEXT NOT NULL,
+  currency TEXT NOT NULL,
+  category_id INTEGER NOT NULL,
+  deposits INTEGER NOT NULL DEFAULT 0,     -- minor units
+  withdrawals INTEGER NOT NULL DEFAULT 0,  -- minor units
+  PRIMARY KEY(user_id, day, currency, category_id),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+) WITHOUT ROWID;
+
+-- Days before pending_before are not rolled up yet for that user (no row: fully covered).
+CREATE TABLE IF NOT EXISTS daily_totals_backfill (
+  user_id INTEGER PRIMARY KEY,
+  pending_before TEXT NOT NULL,
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE
+);
+
+-- Years whose transactions were moved to archive files (see archive.py).
+CREATE TABLE IF NOT EXISTS ledger_archives (
+  year INTEGER PRIMARY KEY,
+  rows INTEGER NOT NULL DEFAULT 0,  -- transactions in the year's file after the last run
+  archived_at TEXT NOT NULL DEFAULT (datetime('now'))
+);
+
+-- Carry-forward of archived rows per envelope and currency: balances equal
+-- opening_balances plus what is left in transactions (see migrations/0009).
+CREATE TABLE IF NOT EXISTS opening_balances (
+  user_id INTEGER NOT NULL,
+  category_id INTEGER NOT NULL,
+  currency TEXT NOT NULL,
+  amount_cents INTEGER NOT NULL DEFAULT 0,  -- minor units: net of the archived rows
+  PRIMARY KEY(user_id, category_id, currency),
+  FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,
+  FOREIGN KEY(category_id) REFERENCES categories(id) ON DELETE CASCADE
+);
+
+-- Per-envelope balances / rebuilds: WHERE user_id=? AND category_id=? [AND currency=?]
+CREATE INDEX IF NOT EXISTS idx_transactions_user_category_currency
+  ON transactions(user_id, category_id, currency);
+
+-- /transactions history: WHERE user_id=? ORDER BY tx_date DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date
+  ON transactions(user_id, tx_date, id);
+
+-- /reports: all currencies over a date range in one pass (covering)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_report
+  ON transactions(user_id, tx_date, currency, type, category_id, amount_cents);
+
+-- ON DELETE CASCADE from categories looks children up by category_id alone.
+CREATE INDEX IF NOT EXISTS idx_transactions_category
+  ON transactions(category_id);
+CREATE INDEX IF NOT EXISTS idx_balances_category
+  ON balances(category_id);
+CREATE INDEX IF NOT EXISTS idx_daily_totals_category
+  ON daily_totals(category_id);
+CREATE INDEX IF NOT EXISTS idx_opening_balances_category
+  ON opening_balances(category_id);
+
+-- Reports exclude a user's deleted envelopes; the purger lists every pending one.
+CREATE INDEX IF NOT EXISTS idx_categories_deleted
+  ON categories(user_id) WHERE deleted_at IS NOT NULL;
+
+-- De-duplicates retried / double-submitted deposit and withdraw forms
+CREATE UNIQUE INDEX IF NOT EXISTS idx_transactions_idempotency
+  ON transactions(user_id, idempotency_key) WHERE idempotency_key IS NOT NULL;
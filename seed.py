@@ -1,55 +1,167 @@
-from db import get_db
-
-def seed_initial_data():
-    db = get_db()
-
-    # 1) Demo user (temporary)
-    db.execute("INSERT OR IGNORE INTO users (id, name) VALUES (1, ?)", ("Sirine",))
-
-    # 2) Currencies
-    currencies = [
-        ("USD", "$"),
-        ("TRY", "₺"),
-        ("EUR", "€"),
-        ("LBP","LBP")
-    ]
-    for code, symbol in currencies:
-        db.execute(
-            "INSERT OR IGNORE INTO currencies (code, symbol) VALUES (?, ?)",
-            (code, symbol),
-        )
+# seed.py — Synthetic ledger generator for realistic data volumes.
+#
+# Fills the database (srn_wallet.sqlite3, or SRN_DB_PATH / --db) for the single
+# local user with envelopes and a chronologically consistent history:
+# - currencies weighted USD > EUR ~ TRY > LBP, amounts log-normal around a typical
+#   spend per currency;
+# - spending every day (more at weekends), envelope top-ups mostly on paydays
+#   (1st and 15th), a few popular envelopes taking most of the traffic;
+# - no envelope ever goes negative (a withdrawal larger than the balance becomes a top-up).
+# Usage: python seed.py [--transactions 100000] [--categories 30] [--years 3] [--seed 42] [--db PATH]
+
+import argparse
+import math
+import os
+import random
+import time
+from bisect import bisect
+from datetime import date, timedelta
+from itertools import accumulate
+
+CURRENCY_WEIGHTS = {"USD": 0.50, "EUR": 0.20, "TRY": 0.20, "LBP": 0.10}
+
+# Median withdrawal in major units; deposits are a multiple of it.
+TYPICAL_SPEND = {"USD": 25, "EUR": 22, "TRY": 800, "LBP": 1_500_000}
 
-    # 3) Default categories (user_id NULL, is_default=1)
-    # We'll store 3 columns for names (simple approach for now)
-    # So we need to modify schema first -> we’ll do it here cleanly:
-    # BUT since schema already exists, we will keep names as English for Milestone 2,
-    # and handle i18n labels in Milestone 10 without changing DB yet.
-
-    default_expense = ["Food", "Transport", "Rent", "Shopping", "Health", "Bills", "Other"]
-    default_income = ["Salary", "Freelance", "Gift", "Other Income"]
-
-    for name in default_expense:
-        db.execute(
-            """
-            INSERT INTO categories (user_id, name, kind, is_default)
-            SELECT NULL, ?, 'expense', 1
-            WHERE NOT EXISTS (
-              SELECT 1 FROM categories WHERE user_id IS NULL AND name = ? AND kind='expense'
-            )
-            """,
-            (name, name),
+NOTES = ["groceries", "fuel", "pharmacy", "gift", "dinner out", "taxi", "refund", "cash top-up"]
+INSERT_BATCH = 10000
+
+
+def _envelopes(conn, user_id: int, count: int):
+    """Returns the user's category ids, creating "Envelope N" rows until there are count."""
+    ids = [r["id"] for r in conn.execute(
+        "SELECT id FROM categories WHERE user_id=? AND deleted_at IS NULL ORDER BY is_default DESC, id", (user_id,)
+    )]
+    n = 1
+    while len(ids) < count:
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO categories(user_id, name, is_default) VALUES (?, ?, 0)",
+            (user_id, f"Envelope {n}")
         )
+        if cur.rowcount:
+            ids.append(cur.lastrowid)
+        n += 1
+    return ids[:count]
+
+
+def generate_rows(rnd, category_ids, transactions: int, start: date, end: date, balances: dict):
+    """
+    Yields (category_id, type, amount_cents, currency, tx_date, note) in date order.
+    balances maps (category_id, currency) -> minor units and is updated as rows are made.
+    """
+    from money import CURRENCY_SCALE
+
+    days = (end - start).days + 1
+    day_weights = list(accumulate(1.4 if (start + timedelta(d)).weekday() >= 5 else 1.0 for d in range(days)))
+    cat_weights = list(accumulate(1 / (rank + 1) for rank in range(len(category_ids))))  # Zipf-like
+    currencies = list(CURRENCY_WEIGHTS)
+    cur_weights = list(accumulate(CURRENCY_WEIGHTS.values()))
+
+    def pick(items, cum):
+        return items[min(bisect(cum, rnd.random() * cum[-1]), len(items) - 1)]
+
+    offsets = sorted(min(bisect(day_weights, rnd.random() * day_weights[-1]), days - 1) for _ in range(transactions))
+    for offset in offsets:
+        tx_day = start + timedelta(offset)
+        category_id = pick(category_ids, cat_weights)
+        currency = pick(currencies, cur_weights)
+        scale = CURRENCY_SCALE[currency]
+
+        spend = rnd.lognormvariate(math.log(TYPICAL_SPEND[currency]), 0.9)
+        payday = tx_day.day in (1, 15)
+        tx_type = "deposit" if rnd.random() < (0.6 if payday else 0.12) else "withdraw"
+        key = (category_id, currency)
+        amount = max(int(round(spend * 10 ** scale)), 1)
+        if currency == "LBP":
+            amount = max(amount // 100_000 * 100_000, 100_000)  # LBP is handled in round thousands
+        if tx_type == "withdraw" and amount > balances.get(key, 0):
+            tx_type = "deposit"
+        if tx_type == "deposit":
+            amount *= rnd.randint(4, 12)
+
+        balances[key] = balances.get(key, 0) + (amount if tx_type == "deposit" else -amount)
+        note = rnd.choice(NOTES) if rnd.random() < 0.2 else None
+        yield category_id, tx_type, amount, currency, tx_day.isoformat(), note
 
-    for name in default_income:
-        db.execute(
-            """
-            INSERT INTO categories (user_id, name, kind, is_default)
-            SELECT NULL, ?, 'income', 1
-            WHERE NOT EXISTS (
-              SELECT 1 FROM categories WHERE user_id IS NULL AND name = ? AND kind='income'
-            )
-            """,
-            (name, name),
+
+def generate(conn, user_id: int, transactions: int = 100000, categories: int = 30, years: float = 3,
+             seed: int = 42, end: date | None = None):
+    """
+    Appends a synthetic history to user_id's ledger and brings balances up to date.
+    Returns a summary dict.
+    """
+    from db import backfill_daily_totals, bump_ledger_version, deferred_indexes, rebuild_balances
+
+    rnd = random.Random(seed)
+    end = end or date.today()
+    start = end - timedelta(days=max(int(years * 365), 1) - 1)
+
+    with conn:
+        category_ids = _envelopes(conn, user_id, categories)
+    balances = {
+        (r["category_id"], r["currency"]): r["amount_cents"]
+        for r in conn.execute("SELECT category_id, currency, amount_cents FROM balances WHERE user_id=?", (user_id,))
+    }
+
+    t0 = time.perf_counter()
+    rows = generate_rows(rnd, category_ids, transactions, start, end, balances)
+    with deferred_indexes(conn, "transactions"):
+        batch = []
+        for row in rows:
+            batch.append((user_id, *row))
+            if len(batch) >= INSERT_BATCH:
+                _insert(conn, batch)
+        _insert(conn, batch)
+    with conn:
+        rebuild_balances(conn)
+        bump_ledger_version(conn, user_id)
+        # Bulk rows bypass the incremental rollup: roll the whole history up again.
+        conn.execute(
+            "INSERT OR REPLACE INTO daily_totals_backfill(user_id, pending_before) VALUES (?, '9999-12-31')",
+            (user_id,)
         )
+    backfill_daily_totals(conn, user_id)
+
+    return {
+        "transactions": transactions,
+        "categories": len(category_ids),
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "seconds": round(time.perf_counter() - t0, 2),
+    }
+
+
+def _insert(conn, batch):
+    if not batch:
+        return
+    with conn:
+        conn.executemany("""
+            INSERT INTO transactions(user_id, category_id, type, amount_cents, currency, tx_date, note)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, batch)
+    batch.clear()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fill the wallet database with a synthetic ledger.")
+    ap.add_argument("--transactions", type=int, default=100000)
+    ap.add_argument("--categories", type=int, default=30)
+    ap.add_argument("--years", type=float, default=3)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--db", help="Database file (default: SRN_DB_PATH or srn_wallet.sqlite3)")
+    args = ap.parse_args()
+
+    if args.db:
+        os.environ["SRN_DB_PATH"] = args.db
+
+    import app as wallet  # the schema is created/migrated on first connection
+    from db import get_conn
+
+    uid = wallet.ensure_single_user()
+    summary = generate(get_conn(), uid, args.transactions, args.categories, args.years, args.seed)
+    print(f"{summary['transactions']:,} transactions over {summary['categories']} envelopes "
+          f"({summary['from']} .. {summary['to']}) in {summary['seconds']}s -> {wallet.db.DB_PATH}")
+
 
-    db.commit()
+if __name__ == "__main__":
+    main()
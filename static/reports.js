@@ -0,0 +1,48 @@
+// reports.js — draws the Income vs Expenses donuts in the browser (no matplotlib round trip).
+// Each <svg class="js-donut" data-income data-expense> gets two ring segments and a legend.
+
+(function () {
+  const SVG_NS = "http://www.w3.org/2000/svg";
+  const RADIUS = 15.915; // circumference of 100 -> dash lengths are percentages
+  const COLORS = { income: "#16a34a", expense: "#dc2626" };
+
+  function el(name, attrs) {
+    const node = document.createElementNS(SVG_NS, name);
+    for (const [k, v] of Object.entries(attrs)) node.setAttribute(k, v);
+    return node;
+  }
+
+  function drawDonut(svg) {
+    const income = parseFloat(svg.dataset.income) || 0;
+    const expense = parseFloat(svg.dataset.expense) || 0;
+    const total = income + expense;
+    if (total <= 0) return;
+
+    const incomePct = (income / total) * 100;
+    const segments = [
+      { pct: incomePct, color: COLORS.income, offset: 25 },
+      { pct: 100 - incomePct, color: COLORS.expense, offset: 25 - incomePct },
+    ];
+
+    svg.appendChild(el("circle", {
+      cx: 21, cy: 21, r: RADIUS, fill: "transparent", stroke: "#f3f4f6", "stroke-width": 6,
+    }));
+    for (const s of segments) {
+      if (s.pct <= 0) continue;
+      svg.appendChild(el("circle", {
+        cx: 21, cy: 21, r: RADIUS, fill: "transparent",
+        stroke: s.color, "stroke-width": 6,
+        "stroke-dasharray": `${s.pct} ${100 - s.pct}`,
+        "stroke-dashoffset": s.offset,
+      }));
+    }
+
+    const label = el("text", {
+      x: 21, y: 22.5, "text-anchor": "middle", "font-size": 4, "font-weight": 600, fill: "#111827",
+    });
+    label.textContent = `${incomePct.toFixed(1)}% / ${(100 - incomePct).toFixed(1)}%`;
+    svg.appendChild(label);
+  }
+
+  document.querySelectorAll("svg.js-donut").forEach(drawDonut);
+})();
@@ -1,7 +1,259 @@
+// sw.js — Offline-first service worker for SRN Wallet.
+//
+// - Precaches the app shell (pages, stylesheet, scripts, manifest, icons) on install.
+// - Home and Transactions are served stale-while-revalidate: instant from cache,
+//   refreshed in the background. Any POST, and any navigation answered with a
+//   redirect (the server's flash-and-redirect pattern), drops those cached pages
+//   first, so the page it lands on comes from the network with its flash message.
+// - Other pages are network-first with a cache fallback; static assets cache-first.
+// - Deposit/withdraw POSTs to /category/<id>/save that fail for lack of network are
+//   queued in IndexedDB and replayed in order (Background Sync where available,
+//   otherwise on the next page load / when the browser comes back online). Only a
+//   2xx reply counts as synced; saves the server rejects (4xx) leave the queue and
+//   are reported to the page, anything else stays queued for the next replay.
+//
+// Served from /sw.js (see app.service_worker) so its scope covers the whole app. The
+// BUILD line below is replaced there with the current content-hashed asset URLs, so a
+// new build is a new worker and its activation drops caches from the previous one.
+
+const BUILD = { version: "dev", assets: [] };
+const CACHE_VERSION = `srn-v1-${BUILD.version}`;
+const SHELL_CACHE = `${CACHE_VERSION}-shell`;
+const PAGE_CACHE = `${CACHE_VERSION}-pages`;
+
+const SHELL_URLS = [
+  "/",
+  "/transactions",
+  "/static/manifest.webmanifest",
+  "/static/icons/icon-192.png",
+  ...BUILD.assets,
+];
+
+const SWR_PATHS = new Set(["/", "/transactions"]);
+const NEVER_CACHE = [/^\/api\//, /^\/export\//, /^\/metrics$/, /^\/healthz$/, /^\/readyz$/, /^\/sw\.js$/];
+const SAVE_PATH = /^\/category\/\d+\/save$/;
+
+const DB_NAME = "srn-wallet";
+const OUTBOX = "outbox";
+const SYNC_TAG = "srn-replay-outbox";
+
+// ---- install / activate --------------------------------------------------
+
 self.addEventListener("install", (event) => {
-  self.skipWaiting();
+  event.waitUntil((async () => {
+    const cache = await caches.open(SHELL_CACHE);
+    await cache.addAll(SHELL_URLS);
+    await self.skipWaiting();
+  })());
 });
 
 self.addEventListener("activate", (event) => {
-  self.clients.claim();
+  event.waitUntil((async () => {
+    const keys = await caches.keys();
+    await Promise.all(keys.filter((k) => !k.startsWith(CACHE_VERSION)).map((k) => caches.delete(k)));
+    await self.clients.claim();
+    await replayOutbox();
+  })());
 });
+
+// ---- fetch routing -------------------------------------------------------
+
+self.addEventListener("fetch", (event) => {
+  const req = event.request;
+  const url = new URL(req.url);
+
+  if (req.method === "POST" && url.origin === self.location.origin) {
+    event.respondWith(SAVE_PATH.test(url.pathname) ? saveOrQueue(req) : postThrough(req));
+    return;
+  }
+  if (req.method !== "GET") return;
+
+  if (url.origin !== self.location.origin) return;
+  if (NEVER_CACHE.some((re) => re.test(url.pathname))) return;
+
+  if (url.pathname.startsWith("/static/")) {
+    event.respondWith(cacheFirst(req, SHELL_CACHE));
+  } else if (req.mode === "navigate" && SWR_PATHS.has(url.pathname)) {
+    event.respondWith(staleWhileRevalidate(event, req));
+  } else {
+    event.respondWith(networkFirst(req));
+  }
+
+  // Any page load is a good moment to flush writes queued while offline.
+  if (req.mode === "navigate") event.waitUntil(replayOutbox());
+});
+
+async function cacheFirst(req, cacheName) {
+  const cached = await caches.match(req);
+  if (cached) return cached;
+  const resp = await fetch(req);
+  if (resp.ok) {
+    const cache = await caches.open(cacheName);
+    cache.put(req, resp.clone());
+  }
+  return resp;
+}
+
+async function staleWhileRevalidate(event, req) {
+  const cache = await caches.open(PAGE_CACHE);
+  const key = new URL(req.url).pathname;
+  // Only pages this cache got from a refresh: the install-time shell copy is
+  // never served in place of the network, only when the network is down.
+  const cached = await cache.match(key);
+  const refresh = fetch(req.url, { credentials: "same-origin", cache: "no-cache" }).then((resp) => {
+    if (resp.ok && !resp.redirected && !/no-store/.test(resp.headers.get("Cache-Control") || "")) {
+      cache.put(key, resp.clone());
+    }
+    return resp;
+  });
+  if (cached) {
+    event.waitUntil(refresh.catch(() => {}));
+    return cached;
+  }
+  return refresh.catch(async (e) => (await caches.match(key)) || Promise.reject(e));
+}
+
+async function networkFirst(req) {
+  const cache = await caches.open(PAGE_CACHE);
+  try {
+    const resp = await fetch(req);
+    if (resp.type === "opaqueredirect" || resp.redirected) {
+      await dropCachedPages();
+    } else if (resp.ok && req.mode === "navigate") {
+      cache.put(req, resp.clone());
+    }
+    return resp;
+  } catch (e) {
+    const cached = (await cache.match(req)) || (await caches.match(req, { ignoreSearch: true }));
+    if (cached) return cached;
+    if (req.mode === "navigate") return (await caches.match("/")) || Response.error();
+    throw e;
+  }
+}
+
+function dropCachedPages() {
+  return caches.open(PAGE_CACHE).then((cache) => Promise.all([...SWR_PATHS].map((path) => cache.delete(path))));
+}
+
+// ---- writes --------------------------------------------------------------
+
+async function postThrough(req) {
+  // Add/delete envelope, /allocate, /import: the cached pages are stale once the
+  // server has the write, and the redirect that follows carries a flash message.
+  const resp = await fetch(req);
+  await dropCachedPages();
+  return resp;
+}
+
+async function saveOrQueue(req) {
+  const body = await req.clone().text();
+  try {
+    const resp = await fetch(req);
+    // Saved online: the cached pages are now stale, drop them so the next visit refreshes.
+    await dropCachedPages();
+    return resp;
+  } catch (e) {
+    await outboxAdd({
+      url: req.url,
+      body,
+      contentType: req.headers.get("Content-Type") || "application/x-www-form-urlencoded",
+      queuedAt: Date.now(),
+    });
+    if (self.registration.sync) {
+      try {
+        await self.registration.sync.register(SYNC_TAG);
+      } catch (err) {
+        // Background Sync unavailable; replay happens on the next navigation.
+      }
+    }
+    return Response.redirect("/?queued=1", 303);
+  }
+}
+
+self.addEventListener("sync", (event) => {
+  if (event.tag === SYNC_TAG) event.waitUntil(replayOutbox());
+});
+
+self.addEventListener("message", (event) => {
+  if (event.data === "replay-outbox") event.waitUntil(replayOutbox());
+});
+
+let replaying = null;
+
+function replayOutbox() {
+  // One replay at a time, so a queued entry is never sent twice concurrently.
+  if (!replaying) replaying = doReplay().finally(() => { replaying = null; });
+  return replaying;
+}
+
+async function doReplay() {
+  let sent = 0;
+  const rejected = [];
+  for (const entry of await outboxAll()) {
+    let resp;
+    try {
+      // With the replay header, save_tx answers 201/200 (saved, or already saved)
+      // or 4xx with a message instead of redirecting with a flash.
+      resp = await fetch(entry.url, {
+        method: "POST",
+        body: entry.body,
+        headers: { "Content-Type": entry.contentType, "X-SRN-Replay": "1" },
+        credentials: "same-origin",
+        redirect: "manual",
+      });
+    } catch (e) {
+      break; // Still offline: keep this entry and everything after it, in order.
+    }
+    if (resp.ok) {
+      sent += 1;
+    } else if (resp.status >= 400 && resp.status < 500) {
+      // Insufficient funds, an envelope deleted meanwhile, invalid input: a retry
+      // would fail the same way, so it leaves the queue and the user is told.
+      const reply = await resp.json().catch(() => ({}));
+      rejected.push(reply.message || `HTTP ${resp.status}`);
+    } else {
+      // 5xx, or a redirect (e.g. to a sign-in page): not saved yet, retry later in order.
+      break;
+    }
+    await outboxDelete(entry.id);
+  }
+  if (sent || rejected.length) {
+    await dropCachedPages();
+    for (const client of await self.clients.matchAll()) {
+      client.postMessage({ type: "outbox-replayed", sent, rejected });
+    }
+  }
+}
+
+// ---- IndexedDB helpers ---------------------------------------------------
+
+function openDb() {
+  return new Promise((resolve, reject) => {
+    const open = indexedDB.open(DB_NAME, 1);
+    open.onupgradeneeded = () => open.result.createObjectStore(OUTBOX, { keyPath: "id", autoIncrement: true });
+    open.onsuccess = () => resolve(open.result);
+    open.onerror = () => reject(open.error);
+  });
+}
+
+async function withStore(mode, fn) {
+  const db = await openDb();
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(OUTBOX, mode);
+    const result = fn(tx.objectStore(OUTBOX));
+    tx.oncomplete = () => resolve(result && "result" in result ? result.result : undefined);
+    tx.onerror = () => reject(tx.error);
+  });
+}
+
+function outboxAdd(entry) {
+  return withStore("readwrite", (store) => store.add(entry));
+}
+
+function outboxAll() {
+  return withStore("readonly", (store) => store.getAll());
+}
+
+function outboxDelete(id) {
+  return withStore("readwrite", (store) => store.delete(id));
+}
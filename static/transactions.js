@@ -0,0 +1,69 @@
+// transactions.js — infinite scroll for /transactions using the keyset-paginated JSON API.
+// Without JS the "Load more" link still works as a plain next-page link.
+
+(function () {
+  const more = document.getElementById("tx-more");
+  const list = document.getElementById("tx-list");
+  if (!more || !list) return;
+
+  let cursor = more.dataset.cursor;
+  let loading = false;
+
+  function div(className, text) {
+    const node = document.createElement("div");
+    if (className) node.className = className;
+    if (text !== undefined) node.textContent = text;
+    return node;
+  }
+
+  function card(r) {
+    const deposit = r.type === "deposit";
+    const outer = div("bg-white rounded-2xl border p-4");
+    const row = div("flex items-start justify-between");
+
+    const left = div();
+    left.appendChild(div("font-semibold", r.category_name));
+    left.appendChild(div("text-xs text-gray-500", r.tx_date));
+    if (r.note) left.appendChild(div("text-sm text-gray-700 mt-1", r.note));
+
+    const right = div("text-right");
+    right.appendChild(div(
+      "font-bold " + (deposit ? "text-green-700" : "text-red-700"),
+      `${deposit ? "+" : "-"} ${Number(r.amount).toFixed(2)} ${r.currency}`
+    ));
+    right.appendChild(div("text-xs text-gray-500", r.type));
+
+    row.appendChild(left);
+    row.appendChild(right);
+    outer.appendChild(row);
+    return outer;
+  }
+
+  async function loadMore() {
+    if (loading || !cursor) return;
+    loading = true;
+    try {
+      const url = new URL(more.dataset.api, window.location.origin);
+      url.searchParams.set("cursor", cursor);
+      const resp = await fetch(url, { headers: { Accept: "application/json" } });
+      if (!resp.ok) return;
+      const page = await resp.json();
+      page.rows.forEach((r) => list.appendChild(card(r)));
+      cursor = page.next_cursor;
+      if (!cursor) more.remove();
+    } finally {
+      loading = false;
+    }
+  }
+
+  more.addEventListener("click", (event) => {
+    event.preventDefault();
+    loadMore();
+  });
+
+  if ("IntersectionObserver" in window) {
+    new IntersectionObserver((entries) => {
+      if (entries.some((e) => e.isIntersecting)) loadMore();
+    }, { rootMargin: "400px" }).observe(more);
+  }
+})();